@@ -1,6 +1,8 @@
 import os
-import subprocess
-import shutil
+
+from ffmpeg_runner import run_ffmpeg
+from workspace import atomic_output, input_path, escape_filter_path
+from run_report import run_report
 
 def add_ass_subtitles(video_dir="/input_videos", subtitle_dir="/input_subtitles", output_dir="/output"):
     """ASSマーカー字幕を動画に合成"""
@@ -8,8 +10,6 @@ def add_ass_subtitles(video_dir="/input_videos", subtitle_dir="/input_subtitles"
     print("🎬 ASSマーカー字幕を動画に合成")
     
     os.makedirs(output_dir, exist_ok=True)
-    work_dir = "/tmp/ass_subtitle_work"
-    os.makedirs(work_dir, exist_ok=True)
     
     processed_count = 0
     
@@ -28,45 +28,35 @@ def add_ass_subtitles(video_dir="/input_videos", subtitle_dir="/input_subtitles"
             try:
                 print(f"\n🎬 処理中: {video_filename}")
                 
-                # 安全なファイル名を生成
-                safe_name = f"video_{hash(base_name) % 10000:04d}"
-                work_video = os.path.join(work_dir, f"{safe_name}.mp4")
-                work_subtitle = os.path.join(work_dir, f"{safe_name}.ass")
-                
-                # ファイルをコピー
-                shutil.copy2(video_path, work_video)
-                shutil.copy2(subtitle_path, work_subtitle)
-                
                 # 出力ファイル名
                 output_path = os.path.join(output_dir, f"{base_name}_ass_subtitled.mp4")
                 
                 # FFmpegコマンド実行（ASSフィルター使用）
-                cmd = [
-                    'ffmpeg', '-y',
-                    '-i', work_video,
-                    '-vf', f"ass={work_subtitle}",
-                    '-c:a', 'copy',
-                    '-c:v', 'libx264',
-                    '-preset', 'medium',
-                    '-crf', '23',
-                    output_path
-                ]
-                
-                print(f"  🔄 ASSマーカー字幕を合成中...")
-                result = subprocess.run(cmd, capture_output=True, text=True, cwd=work_dir)
+                # 動画・字幕ともコピーせず元のファイルを直接読む（パスはフィルタ用にエスケープ）
+                # 一時ファイルに書き出し、成功したら出力先に置き換える
+                with atomic_output(output_path) as output:
+                    cmd = [
+                        'ffmpeg', '-y',
+                        '-i', input_path(video_path),
+                        '-vf', f"ass={escape_filter_path(subtitle_path)}",
+                        '-c:a', 'copy',
+                        '-c:v', 'libx264',
+                        '-preset', 'medium',
+                        '-crf', '23',
+                        output.path
+                    ]
                 
-                if result.returncode == 0:
-                    size = os.path.getsize(output_path)
-                    print(f"  ✅ 成功: {base_name}_ass_subtitled.mp4")
-                    print(f"  📊 サイズ: {size / (1024*1024):.1f} MB")
-                    processed_count += 1
-                else:
-                    print(f"  ❌ エラー: {result.stderr}")
+                    print(f"  🔄 ASSマーカー字幕を合成中...")
+                    result = run_ffmpeg(cmd, label=f"{base_name}_ass_subtitled.mp4")
                 
-                # クリーンアップ
-                for temp_file in [work_video, work_subtitle]:
-                    if os.path.exists(temp_file):
-                        os.remove(temp_file)
+                    if result.returncode == 0:
+                        output.commit()
+                        size = os.path.getsize(output_path)
+                        print(f"  ✅ 成功: {base_name}_ass_subtitled.mp4")
+                        print(f"  📊 サイズ: {size / (1024*1024):.1f} MB")
+                        processed_count += 1
+                    else:
+                        print(f"  ❌ エラー: {result.stderr}")
                         
             except Exception as e:
                 print(f"  ❌ エラー: {e}")
@@ -74,4 +64,5 @@ def add_ass_subtitles(video_dir="/input_videos", subtitle_dir="/input_subtitles"
     print(f"\n🎉 {processed_count}個のASSマーカー字幕付き動画を作成")
 
 if __name__ == "__main__":
-    add_ass_subtitles()
+    with run_report('add_subtitles_ass'):
+        add_ass_subtitles()
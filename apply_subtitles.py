@@ -1,13 +1,30 @@
 import os
-import subprocess
 import shutil
 import glob
 from pathlib import Path
 import sys
 import re
+from contextlib import ExitStack
 
-def apply_subtitles_to_videos(video_dir="/input_videos", subtitle_dir="/input_subtitles", output_dir="/output"):
-   """字幕を動画に自動合成（マーカー保持版・背景対応）"""
+from render_cache import RenderCache, cache_enabled, make_cache_key, record_render, last_render, video_identity
+from incremental_render import incremental_enabled, incremental_rerender
+from ffmpeg_runner import run_ffmpeg
+from encoding_profiles import parse_encoding_args, is_deadline_mode, encoding_key, resolve_encoder_args, write_encoding_log
+from workspace import make_work_dir, work_file, atomic_output, input_path, escape_filter_path
+from run_report import run_report, stage
+from subtitle_logging import get_logger
+from subtitle_index import SubtitleIndex, find_pairs_file
+from style_presets import color_to_bgr, with_alpha, position_to_alignment, parse_preset_args
+from subtitle_cues import load_ass_header
+
+log = get_logger('apply_subtitles')
+
+def apply_subtitles_to_videos(video_dir="/input_videos", subtitle_dir="/input_subtitles", output_dir="/output",
+                              pairs_path=None):
+   """字幕を動画に自動合成（マーカー保持版・背景対応）
+
+   pairs_path: 動画と字幕の対応付けファイル（省略時は字幕ディレクトリの subtitle_pairs.json があれば使う）
+   """
    
    print("🎬 字幕を動画に自動合成（マーカー保持版・背景対応）")
    print(f"📁 動画ディレクトリ: {video_dir}")
@@ -17,17 +34,23 @@ def apply_subtitles_to_videos(video_dir="/input_videos", subtitle_dir="/input_su
    # コマンドライン引数から追加のスタイルパラメータを取得
    style_args = parse_style_args()
    
+   # スタイルプリセット（--preset youtube,news のように複数指定すると1回のデコードで全部書き出す）
+   presets = parse_preset_args()
+   if presets:
+       print(f"🎨 スタイルプリセット: {', '.join(preset.name for preset in presets)}")
+   
+   # エンコードプロファイル / deadlineモード（--encoding-profile, --target-time, --target-size）
+   encoding_options = parse_encoding_args()
+   
    os.makedirs(output_dir, exist_ok=True)
-   work_dir = "/tmp/subtitle_merge_work"
-   os.makedirs(work_dir, exist_ok=True)
    
    # 動画ファイル検索
    video_files = []
    video_extensions = ['.mp4', '.avi', '.mkv', '.mov', '.wmv']
    
    for ext in video_extensions:
-       files = glob.glob(os.path.join(video_dir, f"*{ext}"))
-       files.extend(glob.glob(os.path.join(video_dir, f"*{ext.upper()}")))
+       files = glob.glob(os.path.join(glob.escape(video_dir), f"*{ext}"))
+       files.extend(glob.glob(os.path.join(glob.escape(video_dir), f"*{ext.upper()}")))
        video_files.extend(files)
    
    if not video_files:
@@ -39,7 +62,7 @@ def apply_subtitles_to_videos(video_dir="/input_videos", subtitle_dir="/input_su
    subtitle_extensions = ['.ass', '.srt']
    
    for ext in subtitle_extensions:
-       files = glob.glob(os.path.join(subtitle_dir, f"*{ext}"))
+       files = glob.glob(os.path.join(glob.escape(subtitle_dir), f"*{ext}"))
        subtitle_files.extend(files)
    
    if not subtitle_files:
@@ -49,109 +72,166 @@ def apply_subtitles_to_videos(video_dir="/input_videos", subtitle_dir="/input_su
    print(f"\n📹 動画ファイル: {len(video_files)}個")
    print(f"📝 字幕ファイル: {len(subtitle_files)}個")
    
+   # 字幕をベース名で索引しておく（動画ごとに全字幕を調べ直さない）
+   pairs_path = pairs_path or find_pairs_file(subtitle_dir)
+   if pairs_path:
+       print(f"📋 対応付けファイル: {pairs_path}")
+   subtitle_index = SubtitleIndex(subtitle_files, pairs_path)
+   
    processed_count = 0
    
-   # 動画と字幕のマッチング処理
-   for video_file in video_files:
-       video_filename = os.path.basename(video_file)
-       base_name = os.path.splitext(video_filename)[0]
+   # 実行ごとに専用の作業ディレクトリを使う（同時に複数実行しても一時ファイルが衝突しない）
+   work_dir = make_work_dir('subtitle_merge_')
+   try:
+      # 動画と字幕のマッチング処理
+      for video_file in video_files:
+          video_filename = os.path.basename(video_file)
+          base_name = os.path.splitext(video_filename)[0]
        
-       # 対応する字幕ファイルを探す
-       matching_subtitles = find_matching_subtitles(base_name, subtitle_files)
+          # 対応する字幕ファイルを探す
+          matching_subtitles = subtitle_index.match(video_filename)
        
-       if not matching_subtitles:
-           print(f"⚠️ {video_filename} に対応する字幕ファイルが見つかりません")
-           continue
+          if not matching_subtitles:
+              print(f"⚠️ {video_filename} に対応する字幕ファイルが見つかりません")
+              continue
        
-       try:
-           for subtitle_file in matching_subtitles:
-               subtitle_filename = os.path.basename(subtitle_file)
-               subtitle_ext = Path(subtitle_file).suffix.lower()
+          try:
+              for subtitle_file in matching_subtitles:
+                  subtitle_filename = os.path.basename(subtitle_file)
                
-               print(f"\n🎬 処理中: {video_filename} + {subtitle_filename}")
+                  print(f"\n🎬 処理中: {video_filename} + {subtitle_filename}")
                
-               # マーカー付きASSファイルかチェック
-               has_markers = check_for_markers(subtitle_file) if subtitle_ext == '.ass' else False
+                  # 合成に使う字幕ファイルを準備（必要ならマーカー保持でSRTに変換）
+                  with stage('prepare', file=subtitle_filename):
+                      subtitle_file_to_use, has_markers, temp_files = prepare_subtitle_file(subtitle_file, style_args, work_dir,
+                                                                                            forced=bool(presets))
                
-               if has_markers:
-                   print(f"  🎨 マーカー付きASSファイル検出")
+                  if presets:
+                      # プリセットごとの出力をまとめて1回で合成
+                      outputs = [(preset, os.path.join(output_dir, build_output_filename(
+                          base_name, subtitle_filename, style_args, has_markers, preset.name))) for preset in presets]
+                      with stage('render', file=subtitle_filename, presets=len(presets)) as entry:
+                          results = merge_presets_with_ffmpeg(video_file, subtitle_file_to_use, outputs, style_args,
+                                                              has_markers, source_subtitle=subtitle_file,
+                                                              encoding_options=encoding_options)
+                          entry['success'] = all(results.values())
+                      for output_path, success in results.items():
+                          output_filename = os.path.basename(output_path)
+                          if success:
+                              file_size = os.path.getsize(output_path)
+                              print(f"  ✅ 成功: {output_filename} ({file_size / (1024*1024):.1f} MB)")
+                              processed_count += 1
+                          else:
+                              print(f"  ❌ 失敗: {output_filename}")
+                      for temp_file in temp_files:
+                          if os.path.exists(temp_file):
+                              os.remove(temp_file)
+                      continue
                
-               # スタイル強制適用が必要かチェック
-               if style_args and len(style_args) > 0:
-                   print(f"  🎨 スタイル強制適用モード")
-                   
-                   if subtitle_ext == '.ass':
-                       if has_markers:
-                           # マーカー付きASSの場合：マーカーを保持してSRTに変換
-                           print(f"  🔄 マーカー保持ASS→SRT変換中...")
-                           temp_srt = os.path.join(work_dir, f"marker_temp_{hash(subtitle_file) % 10000}.srt")
-                           
-                           if convert_ass_to_srt_with_markers(subtitle_file, temp_srt, style_args):
-                               subtitle_file_to_use = temp_srt
-                               print(f"  ✅ マーカー保持変換成功")
-                           else:
-                               print(f"  ❌ マーカー保持変換失敗、通常変換を試行")
-                               temp_srt = os.path.join(work_dir, f"temp_{hash(subtitle_file) % 10000}.srt")
-                               if convert_ass_to_srt(subtitle_file, temp_srt):
-                                   subtitle_file_to_use = temp_srt
-                               else:
-                                   subtitle_file_to_use = subtitle_file
-                       else:
-                           # 通常のASS→SRT変換
-                           print(f"  🔄 ASS→SRT変換中...")
-                           temp_srt = os.path.join(work_dir, f"temp_{hash(subtitle_file) % 10000}.srt")
-                           
-                           if convert_ass_to_srt(subtitle_file, temp_srt):
-                               subtitle_file_to_use = temp_srt
-                               print(f"  ✅ ASS→SRT変換成功")
-                           else:
-                               subtitle_file_to_use = subtitle_file
-                   else:
-                       subtitle_file_to_use = subtitle_file
-                   
-               else:
-                   # スタイル引数なし、元のファイルをそのまま使用
-                   subtitle_file_to_use = subtitle_file
-               
-               # 出力ファイル名を生成
-               style_suffix = ""
-               if style_args:
-                   if 'size' in style_args:
-                       style_suffix += f"_s{style_args['size']}"
-                   if 'color' in style_args:
-                       style_suffix += f"_{style_args['color']}"
-                   if 'bold' in style_args:
-                       style_suffix += "_bold"
-                   if 'background' in style_args and style_args['background'] != 'none':
-                       style_suffix += f"_bg{style_args['background']}"
+                  # 出力ファイル名を生成
+                  output_filename = build_output_filename(base_name, subtitle_filename, style_args, has_markers)
+                  output_path = os.path.join(output_dir, output_filename)
                
-               subtitle_base = os.path.splitext(subtitle_filename)[0]
-               if has_markers:
-                   output_filename = f"{base_name}_{subtitle_base}_markers{style_suffix}_merged.mp4"
-               else:
-                   output_filename = f"{base_name}_{subtitle_base}{style_suffix}_merged.mp4"
+                  # FFmpegコマンドを実行
+                  with stage('render', file=output_filename) as entry:
+                      success = merge_subtitle_with_ffmpeg(video_file, subtitle_file_to_use, output_path, style_args, has_markers,
+                                                           source_subtitle=subtitle_file, encoding_options=encoding_options)
+                      entry['success'] = success
                
-               output_path = os.path.join(output_dir, output_filename)
+                  if success:
+                      file_size = os.path.getsize(output_path)
+                      print(f"  ✅ 成功: {output_filename}")
+                      print(f"  📊 サイズ: {file_size / (1024*1024):.1f} MB")
+                      processed_count += 1
+                  else:
+                      print(f"  ❌ 失敗: {output_filename}")
                
-               # FFmpegコマンドを実行
-               success = merge_subtitle_with_ffmpeg(video_file, subtitle_file_to_use, output_path, style_args, has_markers)
+                  # 一時ファイルをクリーンアップ
+                  for temp_file in temp_files:
+                      if os.path.exists(temp_file):
+                          os.remove(temp_file)
+                       
+          except Exception as e:
+              print(f"  ❌ エラー ({video_filename}): {e}")
+   finally:
+      shutil.rmtree(work_dir, ignore_errors=True)
+   
+   print(f"\n🎉 処理完了: {processed_count}個の字幕付き動画を作成しました")
+
+def build_output_filename(video_base_name, subtitle_filename, style_args, has_markers, preset_name=None):
+   """合成結果の出力ファイル名を作成（スタイル情報を含む）"""
+   style_suffix = f"_{preset_name}" if preset_name else ""
+   if style_args:
+       if 'size' in style_args:
+           style_suffix += f"_s{style_args['size']}"
+       if 'color' in style_args:
+           style_suffix += f"_{style_args['color']}"
+       if 'bold' in style_args:
+           style_suffix += "_bold"
+       if 'background' in style_args and style_args['background'] != 'none':
+           style_suffix += f"_bg{style_args['background']}"
+   
+   subtitle_base = os.path.splitext(subtitle_filename)[0]
+   if has_markers:
+       return f"{video_base_name}_{subtitle_base}_markers{style_suffix}_merged.mp4"
+   return f"{video_base_name}_{subtitle_base}{style_suffix}_merged.mp4"
+
+def prepare_subtitle_file(subtitle_file, style_args, work_dir, forced=False):
+   """合成に使う字幕ファイルを準備
+
+   forced: スタイルプリセットを使う場合など、style_args がなくてもスタイルを強制適用する
+   戻り値: (FFmpegに渡す字幕パス, マーカー有無, 後で削除する一時ファイルのリスト)
+   """
+   subtitle_ext = Path(subtitle_file).suffix.lower()
+   temp_files = []
+   
+   # マーカー付きASSファイルかチェック
+   has_markers = check_for_markers(subtitle_file) if subtitle_ext == '.ass' else False
+   
+   if has_markers:
+       print(f"  🎨 マーカー付きASSファイル検出")
+   
+   # スタイル強制適用が必要かチェック
+   if forced or (style_args and len(style_args) > 0):
+       print(f"  🎨 スタイル強制適用モード")
+       
+       if subtitle_ext == '.ass':
+           if has_markers:
+               # マーカー付きASSの場合：マーカーを保持してSRTに変換
+               print(f"  🔄 マーカー保持ASS→SRT変換中...")
+               temp_srt = work_file(work_dir, 'marker_temp_', '.srt')
+               temp_files.append(temp_srt)
                
-               if success:
-                   file_size = os.path.getsize(output_path)
-                   print(f"  ✅ 成功: {output_filename}")
-                   print(f"  📊 サイズ: {file_size / (1024*1024):.1f} MB")
-                   processed_count += 1
+               if convert_ass_to_srt_with_markers(subtitle_file, temp_srt, style_args):
+                   subtitle_file_to_use = temp_srt
+                   print(f"  ✅ マーカー保持変換成功")
                else:
-                   print(f"  ❌ 失敗: {output_filename}")
+                   print(f"  ❌ マーカー保持変換失敗、通常変換を試行")
+                   temp_srt = work_file(work_dir, 'temp_', '.srt')
+                   temp_files.append(temp_srt)
+                   if convert_ass_to_srt(subtitle_file, temp_srt):
+                       subtitle_file_to_use = temp_srt
+                   else:
+                       subtitle_file_to_use = subtitle_file
+           else:
+               # 通常のASS→SRT変換
+               print(f"  🔄 ASS→SRT変換中...")
+               temp_srt = work_file(work_dir, 'temp_', '.srt')
+               temp_files.append(temp_srt)
                
-               # 一時ファイルをクリーンアップ
-               for temp_file in [f for f in [locals().get('temp_srt')] if f and os.path.exists(f)]:
-                   os.remove(temp_file)
-                       
-       except Exception as e:
-           print(f"  ❌ エラー ({video_filename}): {e}")
+               if convert_ass_to_srt(subtitle_file, temp_srt):
+                   subtitle_file_to_use = temp_srt
+                   print(f"  ✅ ASS→SRT変換成功")
+               else:
+                   subtitle_file_to_use = subtitle_file
+       else:
+           subtitle_file_to_use = subtitle_file
+       
+   else:
+       # スタイル引数なし、元のファイルをそのまま使用
+       subtitle_file_to_use = subtitle_file
    
-   print(f"\n🎉 処理完了: {processed_count}個の字幕付き動画を作成しました")
+   return subtitle_file_to_use, has_markers, temp_files
 
 def check_for_markers(ass_file):
    """ASSファイルにマーカー（ASSタグ）が含まれているかチェック"""
@@ -199,14 +279,12 @@ def convert_ass_to_srt_with_markers(ass_file, srt_file, style_args):
                end_time = parts[2].strip()
                text = parts[9].strip()
                
-               print(f"      🔍 原文: '{text}'")
-               
                # ASSタグをHTMLタグに変換（修正版）
                converted_text, markers_found = convert_ass_tags_to_html_fixed(text, style_args)
                if markers_found:
                    marker_count += markers_found
                
-               print(f"      ✨ 変換後: '{converted_text}'")
+               log.debug("      🔍 原文: '%s' -> 変換後: '%s'", text, converted_text)
                
                # ASS時間をSRT時間に変換
                start_srt = ass_time_to_srt_time(start_time)
@@ -232,13 +310,11 @@ def convert_ass_tags_to_html_fixed(text, style_args):
    converted_text = text
    markers_found = 0
    
-   print(f"        🔧 変換開始: '{converted_text}'")
-   
    # Step 1: 完全なASSタグブロック（{...}）を処理
    def process_ass_tag_block(match):
        nonlocal markers_found
        tag_content = match.group(1)
-       print(f"        🎯 タグブロック発見: '{tag_content}'")
+       log.debug("        🎯 タグブロック発見: '%s'", tag_content)
        
        html_tags = []
        
@@ -248,7 +324,6 @@ def convert_ass_tags_to_html_fixed(text, style_args):
            size = fs_match.group(1)
            html_tags.append(f'<font size="{size}">')
            markers_found += 1
-           print(f"          📏 フォントサイズ: {size}")
        
        # 色
        color_match = re.search(r'\\c&H([0-9A-Fa-f]+)&', tag_content)
@@ -257,19 +332,16 @@ def convert_ass_tags_to_html_fixed(text, style_args):
            rgb_hex = bgr_to_rgb_hex(bgr_hex)
            html_tags.append(f'<font color="#{rgb_hex}">')
            markers_found += 1
-           print(f"          🎨 色: {bgr_hex} -> {rgb_hex}")
        
        # 太字
        if '\\b1' in tag_content:
            html_tags.append('<b>')
            markers_found += 1
-           print(f"          💪 太字")
        
        # 斜体
        if '\\i1' in tag_content:
            html_tags.append('<i>')
            markers_found += 1
-           print(f"          📐 斜体")
        
        # リセット
        if '\\r' in tag_content:
@@ -280,8 +352,6 @@ def convert_ass_tags_to_html_fixed(text, style_args):
    # Step 2: ASSタグブロック（{...}）を置換
    converted_text = re.sub(r'\{([^}]*)\}', process_ass_tag_block, converted_text)
    
-   print(f"        🔧 ブロック処理後: '{converted_text}'")
-   
    # Step 3: 残った不完全なタグや記号をクリーンアップ
    # 余分な{や}を削除
    converted_text = re.sub(r'[{}]', '', converted_text)
@@ -297,8 +367,6 @@ def convert_ass_tags_to_html_fixed(text, style_args):
    # 先頭・末尾の空白を削除
    converted_text = converted_text.strip()
    
-   print(f"        ✅ 最終結果: '{converted_text}'")
-   
    return converted_text, markers_found
 
 def bgr_to_rgb_hex(bgr_hex):
@@ -377,11 +445,11 @@ def ass_time_to_srt_time(ass_time):
    except:
        return "00:00:00,000"
 
-def parse_style_args():
+def parse_style_args(argv=None):
    """コマンドライン引数からスタイルパラメータを解析（背景対応版）"""
    style_args = {}
    
-   args = sys.argv[1:]
+   args = sys.argv[1:] if argv is None else argv
    i = 0
    while i < len(args):
        if args[i] == '--size' and i + 1 < len(args):
@@ -421,156 +489,308 @@ def parse_style_args():
    
    return style_args
 
-def find_matching_subtitles(video_base_name, subtitle_files):
-   """動画ベース名に対応する字幕ファイルを検索"""
-   matching = []
-   
-   for subtitle_file in subtitle_files:
-       subtitle_filename = os.path.basename(subtitle_file)
-       subtitle_base = os.path.splitext(subtitle_filename)[0]
-       
-       # 完全一致
-       if subtitle_base == video_base_name:
-           matching.append(subtitle_file)
-       # 部分一致
-       elif subtitle_base.startswith(video_base_name + "_"):
-           matching.append(subtitle_file)
-       # 逆方向の一致も確認
-       elif video_base_name.startswith(subtitle_base.replace('_editable', '').replace('_markers', '')):
-           matching.append(subtitle_file)
-   
-   return matching
+def build_subtitle_filter(subtitle_path, style_args=None, has_markers=False, preset=None):
+   """字幕焼き込み用のビデオフィルタを構築
+
+   preset（style_presets.StylePreset）を指定した場合はコンパイル済みの force_style を使い、
+   style_args の指定はその後ろに足す（同じ項目は後ろが優先される）。
+   戻り値: (フィルタ名, force_style文字列, -vf に渡すフィルタ文字列)
+   """
+   
+   if preset or (style_args and len(style_args) > 0):
+       # スタイルパラメータが指定されている場合は強制適用
+       print(f"  🎨 スタイル強制適用モード")
+       if has_markers:
+           print(f"    🎯 マーカー情報も保持")
+       
+       # スタイル文字列を構築
+       style_options = []
+       style_args = style_args or {}
+       
+       if preset:
+           style_options.append(preset.force_style)
+           print(f"    🎨 プリセット: {preset.name}")
+       
+       if 'size' in style_args:
+           fontsize = style_args['size']
+           style_options.append(f"FontSize={fontsize}")
+           print(f"    📏 FontSize={fontsize}")
+       
+       if 'color' in style_args:
+           color_bgr = color_to_bgr(style_args['color'])
+           style_options.append(f"PrimaryColour={color_bgr}")
+           print(f"    🎨 PrimaryColour={color_bgr}")
+       
+       if 'bold' in style_args and style_args['bold']:
+           style_options.append("Bold=1")
+           print(f"    💪 Bold=1")
+       
+       if 'italic' in style_args and style_args['italic']:
+           style_options.append("Italic=1")
+           print(f"    📐 Italic=1")
+       
+       if 'outline' in style_args:
+           outline = style_args['outline']
+           style_options.append(f"Outline={outline}")
+           style_options.append("OutlineColour=&H00000000")
+           print(f"    🖼️ Outline={outline}")
+       
+       if 'position' in style_args:
+           alignment = position_to_alignment(style_args['position'])
+           style_options.append(f"Alignment={alignment}")
+           print(f"    📍 Alignment={alignment}")
+       
+       if 'margin' in style_args:
+           margin = style_args['margin']
+           style_options.append(f"MarginV={margin}")
+           print(f"    📏 MarginV={margin}")
+       
+       # 背景色の設定
+       if 'background' in style_args and style_args['background'] != 'none':
+           background_color = color_to_bgr(style_args['background'])
+           
+           # 透明度の設定
+           background_with_alpha = with_alpha(background_color, style_args.get('background_alpha', 0.8))
+           
+           style_options.append(f"BackColour={background_with_alpha}")
+           style_options.append("BorderStyle=4")  # 背景ボックスを有効
+           print(f"    🎯 BackColour={background_with_alpha}")
+           print(f"    📦 BorderStyle=4 (背景ボックス有効)")
+       
+       force_style = ','.join(style_options)
+       print(f"  🔧 最終force_style: {force_style}")
+       
+       # subtitlesフィルタを使用
+       filter_name = 'subtitles'
+       video_filter = f"subtitles={escape_filter_path(subtitle_path)}:force_style='{force_style}'"
+   else:
+       # スタイルパラメータなし、元のファイルをそのまま使用
+       print(f"  📝 元のスタイル使用モード")
+       
+       force_style = ''
+       subtitle_ext = Path(subtitle_path).suffix.lower()
+       if subtitle_ext == '.ass':
+           filter_name = 'ass'
+           video_filter = f'ass={escape_filter_path(subtitle_path)}'
+       else:
+           filter_name = 'subtitles'
+           video_filter = f"subtitles={escape_filter_path(subtitle_path)}"
+   
+   return filter_name, force_style, video_filter
 
-def color_to_bgr_hex(color_name):
-   """色名をFFmpeg用BGR形式16進数に変換"""
-   colors = {
-       'white': '&H00FFFFFF',
-       'red': '&H000000FF',
-       'blue': '&H00FF0000',
-       'green': '&H0000FF00',
-       'yellow': '&H0000FFFF',
-       'black': '&H00000000',
-       'cyan': '&H00FFFF00',
-       'magenta': '&H00FF00FF',
-       'gray': '&H00808080'
-   }
-   return colors.get(color_name.lower(), '&H00FFFFFF')
+def try_incremental_render(video_path, video_filter, force_style, source_subtitle, output_path, key):
+   """前回の合成結果を元に、字幕が変わったGOPだけを再エンコード
+   
+   key にはエンコード設定の識別子（encoding_key）を渡す。一致すれば前回と同じ
+   エンコード引数で変更箇所を再エンコードする。合成記録は出力ファイル名ごとに分けて
+   あるので、同じ字幕を複数のプリセットで合成しても互いの記録を上書きしない。
+   """
+   
+   record = last_render(source_subtitle, variant=os.path.basename(output_path))
+   if not record:
+       print(f"  📝 前回の合成記録なし - 全体をエンコード")
+       return False
+   
+   previous_output = record.get('output_path')
+   if (record.get('force_style') != force_style
+           or record.get('encoding_key', record.get('encoder')) != key
+           or not record.get('encoder')
+           or not previous_output or not os.path.exists(previous_output)
+           or record.get('video_identity') != video_identity(video_path)):
+       print(f"  📝 前回とスタイル・エンコード設定・動画が異なるため全体をエンコード")
+       return False
+   # ASSはスタイル定義（[Events] 以外）の変更がキューの比較に出ないので、ここで確認する
+   if load_ass_header(record['subtitle_snapshot']) != load_ass_header(source_subtitle):
+       print(f"  📝 字幕のスタイル定義（ASSヘッダー）が前回と異なるため全体をエンコード")
+       return False
+   
+   try:
+       incremental_rerender(video_path, video_filter, record['encoder'], previous_output,
+                            record['subtitle_snapshot'], source_subtitle, output_path)
+       return record['encoder']
+   except Exception as e:
+       print(f"  ⚠️ 差分再エンコード失敗、全体をエンコード: {e}")
+       return False
 
-def merge_subtitle_with_ffmpeg(video_path, subtitle_path, output_path, style_args=None, has_markers=False):
-   """FFmpegで字幕を動画に合成（マーカー対応版・背景対応）"""
+def merge_subtitle_with_ffmpeg(video_path, subtitle_path, output_path, style_args=None, has_markers=False, source_subtitle=None,
+                              encoding_options=None, preset=None):
+   """FFmpegで字幕を動画に合成（マーカー対応版・背景対応）
+   
+   source_subtitle には字幕ディレクトリ内の元ファイルを渡す（変換前）。
+   合成記録の保存と差分再レンダリングの比較に使う。
+   encoding_options は parse_encoding_args() の結果（省略時は standard プロファイル）。
+   """
    
    try:
-       if style_args and len(style_args) > 0:
-           # スタイルパラメータが指定されている場合は強制適用
-           print(f"  🎨 スタイル強制適用モード")
-           if has_markers:
-               print(f"    🎯 マーカー情報も保持")
-           
-           # スタイル文字列を構築
-           style_options = []
-           
-           if 'size' in style_args:
-               fontsize = style_args['size']
-               style_options.append(f"FontSize={fontsize}")
-               print(f"    📏 FontSize={fontsize}")
-           
-           if 'color' in style_args:
-               color_bgr = color_to_bgr_hex(style_args['color'])
-               style_options.append(f"PrimaryColour={color_bgr}")
-               print(f"    🎨 PrimaryColour={color_bgr}")
-           
-           if 'bold' in style_args and style_args['bold']:
-               style_options.append("Bold=1")
-               print(f"    💪 Bold=1")
-           
-           if 'italic' in style_args and style_args['italic']:
-               style_options.append("Italic=1")
-               print(f"    📐 Italic=1")
-           
-           if 'outline' in style_args:
-               outline = style_args['outline']
-               style_options.append(f"Outline={outline}")
-               style_options.append("OutlineColour=&H00000000")
-               print(f"    🖼️ Outline={outline}")
-           
-           if 'position' in style_args:
-               alignment = {'bottom': 2, 'center': 5, 'top': 8}.get(style_args['position'], 2)
-               style_options.append(f"Alignment={alignment}")
-               print(f"    📍 Alignment={alignment}")
-           
-           if 'margin' in style_args:
-               margin = style_args['margin']
-               style_options.append(f"MarginV={margin}")
-               print(f"    📏 MarginV={margin}")
+       filter_name, force_style, video_filter = build_subtitle_filter(subtitle_path, style_args, has_markers, preset)
+       key = encoding_key(encoding_options)
+       encoder = None
+       
+       # レンダーキャッシュを確認（同一の動画・字幕・スタイル・エンコード設定なら再エンコードしない）
+       cache = RenderCache() if cache_enabled() else None
+       cache_hit = False
+       if cache:
+           cache_key = make_cache_key(video_path, subtitle_path, filter_name, force_style, key)
+           cache_hit = cache.lookup(cache_key, output_path)
+       
+       # 差分再レンダリング（--incremental）
+       success = cache_hit
+       if not success and source_subtitle and incremental_enabled():
+           encoder = try_incremental_render(video_path, video_filter, force_style, source_subtitle, output_path, key)
+           success = bool(encoder)
+       
+       if not success:
+           # エンコード設定を決定（deadlineモードでは試しエンコードで preset/CRF を選ぶ）
+           encoder, decision = resolve_encoder_args(video_path, video_filter, encoding_options)
            
-           # 背景色の設定
-           if 'background' in style_args and style_args['background'] != 'none':
-               background_color = color_to_bgr_hex(style_args['background'])
+           # 一時ファイルに書き出して完成後に置き換える（途中のMP4を他から見せない・
+           # キャッシュとハードリンクされた既存出力も書き換えない）
+           with atomic_output(output_path) as output:
+               cmd = ['ffmpeg', '-y', '-i', input_path(video_path), '-vf', video_filter] + encoder + [output.path]
                
-               # 透明度の設定
-               alpha = style_args.get('background_alpha', 0.8)
-               alpha_value = int(alpha * 255)
-               background_with_alpha = f"&H{alpha_value:02X}{background_color[3:]}"
+               print(f"  🔄 FFmpeg実行中... (preset={decision['preset']} crf={decision['crf']})")
+               result = run_ffmpeg(cmd, label=os.path.basename(output_path))
                
-               style_options.append(f"BackColour={background_with_alpha}")
-               style_options.append("BorderStyle=4")  # 背景ボックスを有効
-               print(f"    🎯 BackColour={background_with_alpha}")
-               print(f"    📦 BorderStyle=4 (背景ボックス有効)")
+               if result.returncode != 0:
+                   print(f"  📝 FFmpegエラー: {result.stderr}")
+                   return False
+               output.commit()
            
-           force_style = ','.join(style_options)
-           print(f"  🔧 最終force_style: {force_style}")
+           write_encoding_log(output_path, decision, encoder, result.stats['elapsed'])
+       
+       if cache and not cache_hit:
+           cache.store(cache_key, output_path, {
+               'output_name': os.path.basename(output_path),
+               'video': os.path.basename(video_path),
+               'filter': filter_name,
+               'force_style': force_style,
+           })
+       
+       # プレビュー・差分再レンダリング用に今回合成した字幕を記録
+       if source_subtitle:
+           # キャッシュヒット時のdeadlineモードは実際の引数が分からないので記録しない
+           if not encoder and not is_deadline_mode(encoding_options):
+               encoder = key
+           record_render(source_subtitle, video_path, output_path, {
+               'filter': filter_name,
+               'force_style': force_style,
+               'encoding_key': key,
+               'encoder': encoder,
+               'video_identity': video_identity(video_path),
+           }, variant=os.path.basename(output_path))
+       
+       return True
            
-           # subtitlesフィルタを使用
-           cmd = [
-               'ffmpeg', '-y',
-               '-i', video_path,
-               '-vf', f"subtitles={subtitle_path}:force_style='{force_style}'",
-               '-c:a', 'copy',
-               '-c:v', 'libx264',
-               '-preset', 'medium',
-               '-crf', '23',
-               output_path
-           ]
-       else:
-           # スタイルパラメータなし、元のファイルをそのまま使用
-           print(f"  📝 元のスタイル使用モード")
+   except Exception as e:
+       print(f"  📝 実行エラー: {e}")
+       return False
+
+def merge_presets_with_ffmpeg(video_path, subtitle_path, outputs, style_args=None, has_markers=False,
+                              source_subtitle=None, encoding_options=None):
+   """複数のスタイルプリセットを1回のFFmpegで合成（デコードは1回、split で各プリセットに分ける）
+
+   outputs: [(StylePreset, 出力パス), ...]
+   プリセットが1つだけなら merge_subtitle_with_ffmpeg と同じ（差分再レンダリングも使える）。
+   キャッシュにあるものは再利用し、残りだけをまとめてエンコードする。
+   deadlineモードの試しエンコードは最初のプリセットで行い、全出力に同じ設定を使う。
+   戻り値: {出力パス: 成功したか}
+   """
+   if len(outputs) == 1:
+       # 1本だけなら通常の合成（差分再レンダリングも使える）
+       preset, output_path = outputs[0]
+       return {output_path: merge_subtitle_with_ffmpeg(video_path, subtitle_path, output_path, style_args, has_markers,
+                                                       source_subtitle=source_subtitle,
+                                                       encoding_options=encoding_options, preset=preset)}
+   
+   key = encoding_key(encoding_options)
+   cache = RenderCache() if cache_enabled() else None
+   results = {}
+   pending = []
+   
+   for preset, output_path in outputs:
+       filter_name, force_style, video_filter = build_subtitle_filter(subtitle_path, style_args, has_markers, preset)
+       cache_key = make_cache_key(video_path, subtitle_path, filter_name, force_style, key) if cache else None
+       if cache and cache.lookup(cache_key, output_path):
+           results[output_path] = True
+           continue
+       pending.append({'preset': preset, 'output_path': output_path, 'filter_name': filter_name,
+                       'force_style': force_style, 'video_filter': video_filter, 'cache_key': cache_key})
+   
+   if not pending:
+       return results
+   
+   try:
+       encoder, decision = resolve_encoder_args(video_path, pending[0]['video_filter'], encoding_options)
+       
+       # [0:v] を1回だけデコードして split で分け、プリセットごとに字幕を焼き込む
+       branches = ''.join(f"[v{index}]" for index in range(len(pending)))
+       graph = [f"[0:v]split={len(pending)}{branches}"]
+       for index, job in enumerate(pending):
+           subtitle_filter = job['video_filter']
+           graph.append(f"[v{index}]{subtitle_filter}[out{index}]")
+       
+       with ExitStack() as stack:
+           targets = [stack.enter_context(atomic_output(job['output_path'])) for job in pending]
+           cmd = ['ffmpeg', '-y', '-i', input_path(video_path), '-filter_complex', ';'.join(graph)]
+           for index, target in enumerate(targets):
+               cmd += ['-map', f"[out{index}]", '-map', '0:a?'] + encoder + [target.path]
            
-           subtitle_ext = Path(subtitle_path).suffix.lower()
-           if subtitle_ext == '.ass':
-               cmd = [
-                   'ffmpeg', '-y',
-                   '-i', video_path,
-                   '-vf', f'ass={subtitle_path}',
-                   '-c:a', 'copy',
-                   '-c:v', 'libx264',
-                   '-preset', 'medium',
-                   '-crf', '23',
-                   output_path
-               ]
-           else:
-               cmd = [
-                   'ffmpeg', '-y',
-                   '-i', video_path,
-                   '-vf', f"subtitles={subtitle_path}",
-                   '-c:a', 'copy',
-                   '-c:v', 'libx264',
-                   '-preset', 'medium',
-                   '-crf', '23',
-                   output_path
-               ]
-       
-       print(f"  🔄 FFmpeg実行中...")
-       result = subprocess.run(cmd, capture_output=True, text=True)
-       
-       if result.returncode == 0:
-           return True
-       else:
-           print(f"  📝 FFmpegエラー: {result.stderr}")
-           return False
+           print(f"  🔄 FFmpeg実行中... ({len(pending)}本を1回のデコードで書き出し "
+                 f"preset={decision['preset']} crf={decision['crf']})")
+           result = run_ffmpeg(cmd, label=f"{os.path.basename(video_path)} x{len(pending)}")
            
+           if result.returncode != 0:
+               print(f"  📝 FFmpegエラー: {result.stderr}")
+               for job in pending:
+                   results[job['output_path']] = False
+               return results
+           for target in targets:
+               target.commit()
+       
+       for job in pending:
+           output_path = job['output_path']
+           write_encoding_log(output_path, decision, encoder, result.stats['elapsed'])
+           if cache:
+               cache.store(job['cache_key'], output_path, {
+                   'output_name': os.path.basename(output_path),
+                   'video': os.path.basename(video_path),
+                   'filter': job['filter_name'],
+                   'force_style': job['force_style'],
+               })
+           if source_subtitle:
+               record_render(source_subtitle, video_path, output_path, {
+                   'filter': job['filter_name'],
+                   'force_style': job['force_style'],
+                   'encoding_key': key,
+                   'encoder': encoder,
+                   'video_identity': video_identity(video_path),
+               }, variant=os.path.basename(output_path))
+           results[output_path] = True
+       return results
+   
    except Exception as e:
        print(f"  📝 実行エラー: {e}")
-       return False
+       for job in pending:
+           results.setdefault(job['output_path'], False)
+       return results
+
+def parse_directory_args(argv=None):
+   """コマンドライン引数から入出力ディレクトリと対応付けファイル（--pairs）を取得（省略時はコンテナ内の既定値）"""
+   names = {'--video-dir': 'video_dir', '--subtitle-dir': 'subtitle_dir', '--output-dir': 'output_dir',
+            '--pairs': 'pairs_path'}
+   directories = {}
+   
+   args = sys.argv[1:] if argv is None else argv
+   i = 0
+   while i < len(args):
+       if args[i] in names and i + 1 < len(args):
+           directories[names[args[i]]] = args[i + 1]
+           i += 2
+       else:
+           i += 1
+   
+   return directories
 
 if __name__ == "__main__":
-   apply_subtitles_to_videos()
+   with run_report('apply_subtitles'):
+      apply_subtitles_to_videos(**parse_directory_args())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""字幕のエンコーディング判定のベンチマーク（ファイル全体の chardet / 段階的な判定）
+
+字幕コーパスを UTF-8・UTF-8(BOM)・CP932・EUC-JP で保存し、キュー数を変えて
+以前の方法（ファイル全体を chardet.detect）と subtitle_encoding.detect_encoding の判定時間を比べる。
+段階的な判定は先頭の一部しか見ないので、ファイルが大きくなっても時間がほぼ変わらないことを確認する。
+ディレクトリの一括変換（並列数・キャッシュあり/なし）の時間も測る。
+
+    python benchmarks/bench_encoding.py                                # 1000, 10000, 100000キュー
+    python benchmarks/bench_encoding.py --cues 1000,10000 --runs 5
+    python benchmarks/bench_encoding.py --legacy-max-cues 0            # 以前の方法を測らない
+    python benchmarks/bench_encoding.py --json encoding.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import make_subtitle_corpus
+from subtitle_encoding import detect_encoding, convert_many
+
+ENCODINGS = ['utf-8', 'utf-8-sig', 'cp932', 'euc-jp']
+
+def encoded_corpus(count, encoding, work_dir):
+    """字幕コーパスを指定のエンコーディングで保存してパスを返す"""
+    with open(make_subtitle_corpus(count, 'srt', 0.1), encoding='utf-8') as f:
+        text = f.read()
+    path = os.path.join(work_dir, f"cues_{count}_{encoding}.srt")
+    with open(path, 'wb') as f:
+        # CP932 / EUC-JP で表せない記号は置き換える
+        f.write(text.encode(encoding, 'replace'))
+    return path
+
+def legacy_detect(raw_data):
+    """以前の fix_subtitle_encoding と同じ判定（ファイル全体を chardet に渡す）"""
+    import chardet
+    return chardet.detect(raw_data).get('encoding')
+
+def best_time(func, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        value = func()
+        samples.append(time.perf_counter() - started)
+    return min(samples), value
+
+def bench_batch(count, files, workers, work_dir):
+    """同じ大きさの字幕を files 個置いたディレクトリを一括変換（1回目: キャッシュなし、2回目: キャッシュあり）"""
+    input_dir = os.path.join(work_dir, f"batch_{count}")
+    os.makedirs(input_dir, exist_ok=True)
+    for index in range(files):
+        encoding = ENCODINGS[index % len(ENCODINGS)]
+        source = encoded_corpus(count, encoding, work_dir)
+        # 内容を少し変えて、ファイルごとに別のキャッシュキーにする
+        with open(source, 'rb') as f:
+            data = f.read()
+        with open(os.path.join(input_dir, f"{index:03d}.srt"), 'wb') as f:
+            f.write(data + f"\n{index}\n".encode(encoding))
+    subtitles = sorted(os.path.join(input_dir, name) for name in os.listdir(input_dir))
+    output_dir = os.path.join(work_dir, f"batch_{count}_out")
+    cache_path = os.path.join(work_dir, 'encoding_cache.json')
+
+    results = []
+    for label, parallel, path in [('cold', workers, cache_path), ('cached', workers, cache_path),
+                                  ('serial', 1, '')]:
+        if label == 'cold' and os.path.exists(cache_path):
+            os.remove(cache_path)
+        started = time.perf_counter()
+        converted = convert_many(subtitles, output_dir, workers=parallel, cache_path=path)
+        results.append({
+            'label': label,
+            'workers': parallel,
+            'files': len(converted),
+            'wall': round(time.perf_counter() - started, 4),
+            'errors': sum(1 for result in converted if 'error' in result),
+        })
+    shutil.rmtree(output_dir, ignore_errors=True)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='字幕のエンコーディング判定のベンチマーク')
+    parser.add_argument('--cues', default='1000,10000,100000', help='キュー数（カンマ区切り）')
+    parser.add_argument('--runs', type=int, default=3, help='各条件の実行回数（最速を採用）')
+    parser.add_argument('--legacy-max-cues', type=int, default=100000,
+                        help='以前の方法を測る最大キュー数（遅いので大きいものは省略できる）')
+    parser.add_argument('--batch-files', type=int, default=16, help='一括変換のファイル数（0で省略）')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='一括変換の並列数')
+    parser.add_argument('--json', help='結果をJSONで保存')
+    args = parser.parse_args()
+
+    counts = [int(value) for value in args.cues.split(',') if value.strip()]
+    results = []
+    batches = {}
+    with tempfile.TemporaryDirectory(prefix='bench_encoding_') as work_dir:
+        print("🔤 判定時間（最速）")
+        for count in counts:
+            for encoding in ENCODINGS:
+                path = encoded_corpus(count, encoding, work_dir)
+                with open(path, 'rb') as f:
+                    raw_data = f.read()
+                staged, detection = best_time(lambda: detect_encoding(raw_data), args.runs)
+                result = {
+                    'cues': count,
+                    'encoding': encoding,
+                    'bytes': len(raw_data),
+                    'staged': round(staged, 6),
+                    'detected': detection['encoding'],
+                    'method': detection['method'],
+                }
+                if count <= args.legacy_max_cues:
+                    legacy, legacy_encoding = best_time(lambda: legacy_detect(raw_data), 1)
+                    result.update(legacy=round(legacy, 6), legacy_detected=legacy_encoding)
+                results.append(result)
+
+                legacy_text = (f"全体 {result['legacy']:8.3f}秒 ({result['legacy_detected']})  →  "
+                               if 'legacy' in result else '')
+                print(f"  {count:>7}キュー {encoding:<10} {len(raw_data) / (1024 * 1024):7.2f}MB  {legacy_text}"
+                      f"段階的 {staged * 1000:8.2f}ms ({detection['encoding']}, {detection['method']})")
+
+        if args.batch_files:
+            print(f"\n📁 一括変換（{args.batch_files}ファイル、並列 {args.workers}）")
+            for count in counts:
+                batches[count] = bench_batch(count, args.batch_files, args.workers, work_dir)
+                for batch in batches[count]:
+                    print(f"  {count:>7}キュー {batch['label']:<7} 並列{batch['workers']:<3} "
+                          f"{batch['wall']:8.3f}秒  失敗 {batch['errors']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'results': results, 'batches': batches}, f, ensure_ascii=False, indent=2)
+        print(f"💾 {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""ログ出力量のベンチマーク（マーカー処理・マーカー保持変換）
+
+マーカーごと・キューごとの詳細ログ（debug）と、件数だけをまとめて出す通常のログ（info）で、
+大きなマーカー付き字幕を処理する時間と出力量を比べる。出力はコンテナと同じ
+PYTHONUNBUFFERED=1 相当（書き込みごとにファイルへ書き出す）で一時ファイルに書く。
+debug はログ整理前の print と同じ行数を出すので、整理前の所要時間の目安になる。
+
+    python benchmarks/bench_logging.py                              # 10万キュー・マーカー密度0.3
+    python benchmarks/bench_logging.py --cues 1000000 --runs 1
+    python benchmarks/bench_logging.py --json logging.json
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import make_subtitle_corpus
+from subtitle_logging import configure_logging
+
+LEVELS = ['debug', 'info']
+
+@contextlib.contextmanager
+def unbuffered_stdout(path):
+    """stdout を書き込みごとにファイルへ書き出すストリームに差し替える"""
+    with open(path, 'wb', buffering=0) as raw:
+        stream = io.TextIOWrapper(raw, encoding='utf-8', write_through=True)
+        with contextlib.redirect_stdout(stream):
+            yield
+        stream.flush()
+        stream.detach()
+
+def run_case(name, func, level, runs, work_dir):
+    """func を runs 回実行して最速の結果と出力量を返す"""
+    configure_logging(level)
+    log_path = os.path.join(work_dir, f"{name}_{level}.log")
+    samples = []
+    for _ in range(runs):
+        with unbuffered_stdout(log_path):
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+    with open(log_path, 'rb') as f:
+        data = f.read()
+    return {
+        'case': name,
+        'level': level,
+        'wall': round(min(samples), 6),
+        'runs': [round(sample, 6) for sample in samples],
+        'log_lines': data.count(b'\n'),
+        'log_bytes': len(data),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='ログ出力量のベンチマーク')
+    parser.add_argument('--cues', type=int, default=100000, help='キュー数')
+    parser.add_argument('--marker-density', type=float, default=0.3, help='マーカーを含むキューの割合')
+    parser.add_argument('--runs', type=int, default=3, help='各条件の実行回数（最速を採用）')
+    parser.add_argument('--json', help='結果をJSONで保存')
+    args = parser.parse_args()
+
+    from process_markers import process_srt_with_markers
+    from apply_subtitles import convert_ass_to_srt_with_markers
+
+    print(f"📦 テストデータ準備中: {args.cues}キュー（マーカー密度 {args.marker_density:g}）")
+    srt_path = make_subtitle_corpus(args.cues, 'srt', args.marker_density)
+    ass_path = make_subtitle_corpus(args.cues, 'ass', args.marker_density)
+    with open(srt_path, encoding='utf-8') as f:
+        srt_content = f.read()
+    default_style = {'size': 24, 'color': 'white', 'bold': False, 'italic': False}
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='bench_logging_') as work_dir:
+        converted = os.path.join(work_dir, 'converted.srt')
+        cases = [
+            ('markers', lambda: process_srt_with_markers(srt_content, default_style)),
+            ('convert', lambda: convert_ass_to_srt_with_markers(ass_path, converted, {})),
+        ]
+        for name, func in cases:
+            for level in LEVELS:
+                result = run_case(name, func, level, args.runs, work_dir)
+                results.append(result)
+                print(f"  {name:8s} {level:6s} {result['wall']:8.3f}秒  "
+                      f"{result['log_lines']:>9,}行 {result['log_bytes'] / (1024 * 1024):8.2f}MB")
+    configure_logging()
+
+    print("\n📊 debug → info")
+    for name, _ in cases:
+        debug, info = (next(r for r in results if r['case'] == name and r['level'] == level) for level in LEVELS)
+        ratio = debug['wall'] / info['wall'] if info['wall'] > 0 else float('inf')
+        print(f"  {name:8s} {debug['wall']:.3f}秒 → {info['wall']:.3f}秒（{ratio:.1f}倍）  "
+              f"ログ {debug['log_lines']:,}行 → {info['log_lines']:,}行")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'cues': args.cues, 'marker_density': args.marker_density, 'results': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"💾 {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""動画と字幕の対応付けのベンチマーク（動画ごとの全件走査 / 索引）
+
+video_to_text・process_markers・combine_split と同じ命名の字幕ファイル名を生成し、
+以前の find_matching_subtitles（動画ごとに全字幕を3つの規則で調べる）と
+subtitle_index.SubtitleIndex（1回だけ索引を作る）の所要時間と対応付けの結果を比べる。
+ファイルは作らず、パスの一覧だけで計測する。
+
+    python benchmarks/bench_matching.py                         # 字幕5万件
+    python benchmarks/bench_matching.py --subtitles 200000
+    python benchmarks/bench_matching.py --legacy-videos 0       # 以前の方法を測らない
+    python benchmarks/bench_matching.py --json matching.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from subtitle_index import SubtitleIndex
+
+NAMES = ['会議', '講義', 'interview', 'lecture', 'vlog', '説明会', 'demo', '授業']
+SUFFIXES = ['_editable.srt', '_styled.ass', '_markers_s24_white.ass', '_markers_s48_yellow_bold.ass', '.srt']
+
+def make_library(subtitle_count, seed=0):
+    """動画と字幕のファイル名の一覧を作る（動画1本あたり字幕2〜3個、一部は分割パートと連番の動画）"""
+    rng = random.Random(seed)
+    videos, subtitles = [], []
+    index = 0
+    while len(subtitles) < subtitle_count:
+        base = f"{rng.choice(NAMES)}_{index:06d}"
+        if rng.random() < 0.1:
+            # 分割パート（<名前>_part01.mp4）と統合済み字幕（<名前>_merged.srt）
+            for part in range(1, 4):
+                videos.append(f"/videos/{base}_part{part:02d}.mp4")
+                subtitles.append(f"/output/{base}_part{part:02d}_editable.srt")
+            subtitles.append(f"/output/{base}_merged.srt")
+        else:
+            videos.append(f"/videos/{base}.mp4")
+            for suffix in rng.sample(SUFFIXES, rng.randint(2, 3)):
+                subtitles.append(f"/output/{base}{suffix}")
+            if rng.random() < 0.05:
+                # 名前が別の動画の前方一致になる動画（<名前>_2.mp4）
+                videos.append(f"/videos/{base}_2.mp4")
+                subtitles.append(f"/output/{base}_2_editable.srt")
+        index += 1
+    return videos, subtitles
+
+def legacy_find_matching_subtitles(video_base_name, subtitle_files):
+    """以前の apply_subtitles.find_matching_subtitles"""
+    matching = []
+    for subtitle_file in subtitle_files:
+        subtitle_filename = os.path.basename(subtitle_file)
+        subtitle_base = os.path.splitext(subtitle_filename)[0]
+        if subtitle_base == video_base_name:
+            matching.append(subtitle_file)
+        elif subtitle_base.startswith(video_base_name + "_"):
+            matching.append(subtitle_file)
+        elif video_base_name.startswith(subtitle_base.replace('_editable', '').replace('_markers', '')):
+            matching.append(subtitle_file)
+    return matching
+
+def main():
+    parser = argparse.ArgumentParser(description='動画と字幕の対応付けのベンチマーク')
+    parser.add_argument('--subtitles', type=int, default=50000, help='字幕ファイル数')
+    parser.add_argument('--legacy-videos', type=int, default=200,
+                        help='以前の方法で測る動画数（全件は時間がかかるので一部から全体を推定）')
+    parser.add_argument('--runs', type=int, default=3, help='索引の実行回数（最速を採用）')
+    parser.add_argument('--json', help='結果をJSONで保存')
+    args = parser.parse_args()
+
+    videos, subtitles = make_library(args.subtitles)
+    print(f"📦 動画 {len(videos):,}本 / 字幕 {len(subtitles):,}個")
+
+    samples = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        index = SubtitleIndex(subtitles)
+        matches = {video: index.match(video) for video in videos}
+        samples.append(time.perf_counter() - started)
+    indexed = min(samples)
+    matched = sum(1 for found in matches.values() if found)
+    print(f"  🗂️ 索引:     {indexed:8.3f}秒  対応付けできた動画 {matched:,}本")
+
+    result = {'videos': len(videos), 'subtitles': len(subtitles), 'indexed': round(indexed, 6), 'matched': matched}
+    if args.legacy_videos:
+        sample_videos = videos[:args.legacy_videos]
+        started = time.perf_counter()
+        legacy = {video: legacy_find_matching_subtitles(os.path.splitext(os.path.basename(video))[0], subtitles)
+                  for video in sample_videos}
+        elapsed = time.perf_counter() - started
+        estimated = elapsed / len(sample_videos) * len(videos)
+        extra = sum(len(set(legacy[video]) - set(matches[video])) for video in sample_videos)
+        missing = sum(len(set(matches[video]) - set(legacy[video])) for video in sample_videos)
+        print(f"  🔁 全件走査: {elapsed:8.3f}秒（{len(sample_videos)}本） → 全{len(videos):,}本で約 {estimated:,.1f}秒")
+        print(f"     以前の方法だけが対応付けた字幕 {extra}個 / 索引だけが対応付けた字幕 {missing}個"
+              f"（{len(sample_videos)}本中）")
+        result.update(legacy_sample=len(sample_videos), legacy=round(elapsed, 6),
+                      legacy_estimated=round(estimated, 3), legacy_extra=extra, legacy_missing=missing)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"💾 {args.json}")
+
+if __name__ == "__main__":
+    main()
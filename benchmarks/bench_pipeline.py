@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""処理段階ごとのベンチマーク（文字起こし〜合成・分割・統合）
+
+fixtures.py で決定的なテスト動画・字幕コーパスを作り、各段階の処理時間を計測して
+JSONに保存する。保存した結果をベースラインとして、変更前後の速さを比べられる。
+
+    python benchmarks/bench_pipeline.py                                  # 既定の規模で全段階
+    python benchmarks/bench_pipeline.py --stages markers,convert --cues 10,1000,100000
+    python benchmarks/bench_pipeline.py --full --json results.json       # 100万キュー・1080pも含める
+    python benchmarks/bench_pipeline.py --save-baseline baseline.json    # ベースラインとして保存
+    python benchmarks/bench_pipeline.py --baseline baseline.json --fail-on-regression
+
+段階: transcribe, normalize, markers, parse, convert, render, split, combine
+（transcribe / normalize は whisper などがインストールされていない環境ではスキップ）
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import contextlib
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 合成はキャッシュを使わず毎回エンコードする
+os.environ['RENDER_CACHE'] = '0'
+
+from fixtures import (RESOLUTIONS, make_video, make_speech_audio, make_subtitle_corpus, generate_cues,
+                      write_srt)
+
+STAGES = ['transcribe', 'normalize', 'markers', 'parse', 'convert', 'render', 'split', 'combine']
+DEFAULT_CUES = [10, 1000, 100000]
+FULL_CUES = [10, 1000, 100000, 1000000]
+DEFAULT_RESOLUTIONS = ['360p', '720p']
+FULL_RESOLUTIONS = ['360p', '720p', '1080p']
+# これより小さい差は計測のばらつきとして退行に数えない（秒）
+MIN_DELTA = 0.01
+
+class SkipStage(Exception):
+    """この環境では実行できない段階（依存パッケージがないなど）"""
+
+def child_cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+@contextlib.contextmanager
+def quiet(enabled=True):
+    """処理中の print を捨てる（端末への出力時間を計測に含めない）"""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def measure(stage, case, func, runs, items=None, unit='items', verbose=False):
+    """func() を runs 回実行して最速の結果を返す
+
+    func は追加の指標（dict）を返してよい。wall は経過時間、cpu は自プロセスと
+    子プロセス（FFmpeg）のCPU時間の合計。
+    """
+    samples = []
+    extra = {}
+    for _ in range(runs):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time() + child_cpu_time()
+        with quiet(not verbose):
+            extra = func() or {}
+        samples.append({
+            'wall': time.perf_counter() - wall_start,
+            'cpu': time.process_time() + child_cpu_time() - cpu_start,
+        })
+    best = min(samples, key=lambda sample: sample['wall'])
+    result = {
+        'stage': stage,
+        'case': case,
+        'wall': round(best['wall'], 6),
+        'cpu': round(best['cpu'], 6),
+        'runs': [round(sample['wall'], 6) for sample in samples],
+    }
+    if items:
+        result['items'] = items
+        result['unit'] = unit
+        result['throughput'] = round(items / best['wall'], 3) if best['wall'] > 0 else None
+    result.update(extra)
+    return result
+
+# ---------------------------------------------------------------- 各段階
+
+def bench_transcribe(context):
+    try:
+        from video_to_text_with_custom_styles import load_model, transcribe_video
+    except ImportError as e:
+        raise SkipStage(f"whisper を読み込めません: {e}")
+    duration = context['speech_duration']
+    audio = make_speech_audio(duration)
+    with quiet():
+        model = load_model(context['model'])
+    results = []
+
+    def run():
+        cues = transcribe_video(model, audio, normalize=True)
+        return {'cues': len(cues)}
+
+    result = measure('transcribe', f"{context['model']}_{duration}s", run, 1, duration, 'audio_seconds',
+                     context['verbose'])
+    # 実時間比（1未満なら音声の長さより速い）
+    result['realtime_factor'] = round(result['wall'] / duration, 4)
+    results.append(result)
+    return results
+
+def bench_normalize(context):
+    try:
+        from video_to_text_with_custom_styles import normalize_japanese_text
+    except ImportError as e:
+        raise SkipStage(f"正規化ライブラリを読み込めません: {e}")
+    from fixtures import srt_text
+    results = []
+    for count in context['cues']:
+        texts = [srt_text(cue['words']).replace('¥', '') for cue in generate_cues(count, 0)]
+
+        def run():
+            return {'output_chars': sum(len(normalize_japanese_text(text)) for text in texts)}
+
+        results.append(measure('normalize', f"{count}", run, context['runs'], count, 'cues', context['verbose']))
+    return results
+
+def bench_markers(context):
+    from process_markers import parse_arguments, process_srt_with_markers, srt_to_ass_with_style
+    args = parse_arguments(['in', 'out'])
+    default_style = {'size': args.size, 'color': args.color, 'bold': args.bold, 'italic': args.italic}
+    results = []
+    for count in context['cues']:
+        with open(make_subtitle_corpus(count, 'srt', context['marker_density']), encoding='utf-8') as f:
+            content = f.read()
+
+        def run():
+            processed = process_srt_with_markers(content, default_style)
+            ass = srt_to_ass_with_style(processed, 'benchmark', args)
+            return {'output_bytes': len(ass.encode('utf-8'))}
+
+        results.append(measure('markers', f"{count}_m{context['marker_density']:g}", run, context['runs'],
+                               count, 'cues', context['verbose']))
+    return results
+
+def bench_parse(context):
+    from subtitle_cues import parse_srt, parse_ass
+    results = []
+    for count in context['cues']:
+        for subtitle_format, parser in (('srt', parse_srt), ('ass', parse_ass)):
+            with open(make_subtitle_corpus(count, subtitle_format, context['marker_density']), encoding='utf-8') as f:
+                content = f.read()
+            results.append(measure('parse', f"{subtitle_format}_{count}", lambda: {'cues': len(parser(content))},
+                                   context['runs'], count, 'cues', context['verbose']))
+    return results
+
+def bench_convert(context):
+    from apply_subtitles import convert_ass_to_srt, convert_ass_to_srt_with_markers
+    results = []
+    for count in context['cues']:
+        ass_path = make_subtitle_corpus(count, 'ass', context['marker_density'])
+        srt_path = os.path.join(context['work_dir'], 'converted.srt')
+        results.append(measure('convert', f"ass_to_srt_{count}", lambda: {'ok': convert_ass_to_srt(ass_path, srt_path)},
+                               context['runs'], count, 'cues', context['verbose']))
+        results.append(measure('convert', f"ass_to_srt_markers_{count}",
+                               lambda: {'ok': convert_ass_to_srt_with_markers(ass_path, srt_path, {})},
+                               context['runs'], count, 'cues', context['verbose']))
+    return results
+
+def bench_render(context):
+    from apply_subtitles import merge_subtitle_with_ffmpeg
+    duration = context['video_duration']
+    ass_path = make_subtitle_corpus(max(1, int(duration / 2.5)), 'ass', context['marker_density'])
+    results = []
+    for resolution in context['resolutions']:
+        video = make_video(resolution, duration)
+        output = os.path.join(context['work_dir'], f"render_{resolution}.mp4")
+        frames = duration * 30
+
+        def run():
+            if not merge_subtitle_with_ffmpeg(video, ass_path, output, {}, has_markers=True):
+                raise RuntimeError(f"合成に失敗: {resolution}")
+            return {'output_bytes': os.path.getsize(output)}
+
+        result = measure('render', f"{resolution}_{duration}s", run, context['runs'], frames, 'frames',
+                         context['verbose'])
+        result['fps'] = result.pop('throughput')
+        results.append(result)
+    return results
+
+def bench_split(context):
+    from split_video import split_video
+    duration = context['split_duration']
+    video = make_video('720p', duration)
+    output_dir = os.path.join(context['work_dir'], 'split')
+    segment_length = max(2, duration // 4)
+
+    def run():
+        shutil.rmtree(output_dir, ignore_errors=True)
+        manifest = split_video(video, segment_length, output_dir)
+        if manifest is None:
+            raise RuntimeError("分割に失敗")
+        return {'parts': len(manifest['parts'])}
+
+    return [measure('split', f"720p_{duration}s_every{segment_length}s", run, context['runs'], duration,
+                    'video_seconds', context['verbose'])]
+
+def bench_combine(context):
+    from combine_split import combine_parts
+    results = []
+    for count in context['cues']:
+        # コーパスを4パートに分け、各パートの開始時刻を0秒からの相対時刻にずらして書き出す
+        cues = list(generate_cues(count, context['marker_density']))
+        part_dir = os.path.join(context['work_dir'], f"combine_{count}")
+        os.makedirs(part_dir, exist_ok=True)
+        parts = []
+        chunk = max(1, -(-len(cues) // 4))
+        for index in range(0, len(cues), chunk):
+            part_cues = cues[index:index + chunk]
+            offset = part_cues[0]['start']
+            path = os.path.join(part_dir, f"bench_part{len(parts):02d}_editable.srt")
+            write_srt(path, (dict(cue, start=cue['start'] - offset, end=cue['end'] - offset) for cue in part_cues))
+            parts.append({'subtitle': path, 'start': offset, 'end': part_cues[-1]['end']})
+        del cues
+        output = os.path.join(part_dir, 'merged.srt')
+        results.append(measure('combine', f"{count}", lambda: combine_parts(parts, output, 'srt'),
+                               context['runs'], count, 'cues', context['verbose']))
+    return results
+
+BENCHMARKS = {
+    'transcribe': bench_transcribe,
+    'normalize': bench_normalize,
+    'markers': bench_markers,
+    'parse': bench_parse,
+    'convert': bench_convert,
+    'render': bench_render,
+    'split': bench_split,
+    'combine': bench_combine,
+}
+
+# ---------------------------------------------------------------- 結果の比較
+
+def environment_info():
+    try:
+        ffmpeg = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True).stdout.split('\n')[0]
+    except OSError:
+        ffmpeg = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'ffmpeg': ffmpeg,
+    }
+
+def is_regression(before, after, tolerance):
+    return after > before * (1 + tolerance) and after - before > MIN_DELTA
+
+def compare_results(results, baseline, tolerance):
+    """ベースラインと比べて (段階, ケース, 基準, 今回, 比) のリストと退行の数を返す"""
+    previous = {(r['stage'], r['case']): r for r in baseline.get('results', [])}
+    rows = []
+    regressions = 0
+    for result in results:
+        before = previous.get((result['stage'], result['case']))
+        if not before or not before['wall']:
+            rows.append((result['stage'], result['case'], None, result['wall'], None))
+            continue
+        ratio = result['wall'] / before['wall']
+        if is_regression(before['wall'], result['wall'], tolerance):
+            regressions += 1
+        rows.append((result['stage'], result['case'], before['wall'], result['wall'], ratio))
+    return rows, regressions
+
+def print_results(results):
+    print(f"\n{'段階':<11} {'ケース':<28} {'時間':>10} {'CPU':>10} {'スループット':>18}")
+    for r in results:
+        if r.get('fps'):
+            rate_text = f"{r['fps']:,.1f} fps"
+        elif r.get('throughput'):
+            rate_text = f"{r['throughput']:,.1f} {r['unit']}/s"
+        else:
+            rate_text = ''
+        print(f"{r['stage']:<11} {r['case']:<28} {r['wall']:9.3f}秒 {r['cpu']:9.3f}秒 {rate_text:>18}")
+
+def print_comparison(rows, tolerance):
+    print(f"\n{'段階':<11} {'ケース':<28} {'基準':>10} {'今回':>10} {'比':>8}")
+    for stage, case, before, after, ratio in rows:
+        if ratio is None:
+            print(f"{stage:<11} {case:<28} {'-':>10} {after:9.3f}秒 {'(新規)':>8}")
+            continue
+        if is_regression(before, after, tolerance):
+            mark = '🔺'
+        elif is_regression(after, before, tolerance):
+            mark = '🔻'
+        else:
+            mark = '  '
+        print(f"{stage:<11} {case:<28} {before:9.3f}秒 {after:9.3f}秒 {ratio:7.2f}x {mark}")
+
+def parse_list(value, cast=str):
+    return [cast(item) for item in value.split(',') if item]
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='処理段階ごとのベンチマーク（決定的なテストデータを生成して計測）')
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"計測する段階（カンマ区切り: {','.join(STAGES)}）")
+    parser.add_argument('--cues', help='字幕コーパスのキュー数（カンマ区切り、デフォルト: 10,1000,100000）')
+    parser.add_argument('--marker-density', type=float, default=0.1, help='マーカー付きキューの割合')
+    parser.add_argument('--resolutions', help=f"合成する解像度（{','.join(RESOLUTIONS)}）")
+    parser.add_argument('--video-duration', type=int, default=10, help='合成に使う動画の秒数')
+    parser.add_argument('--split-duration', type=int, default=60, help='分割に使う動画の秒数')
+    parser.add_argument('--speech-duration', type=int, default=30, help='文字起こしに使う音声の秒数')
+    parser.add_argument('--model', default='tiny', help='文字起こしのWhisperモデル')
+    parser.add_argument('--runs', type=int, default=1, help='各ケースの実行回数（最速を採用）')
+    parser.add_argument('--full', action='store_true', help='100万キュー・1080pも含める')
+    parser.add_argument('--json', help='結果をJSONで保存')
+    parser.add_argument('--baseline', help='比較するベースラインのJSON')
+    parser.add_argument('--save-baseline', help='今回の結果をベースラインとして保存')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='退行とみなす遅くなった割合')
+    parser.add_argument('--fail-on-regression', action='store_true', help='退行があれば終了コード1')
+    parser.add_argument('--verbose', action='store_true', help='各段階の出力を表示')
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    stages = parse_list(args.stages)
+    unknown = [stage for stage in stages if stage not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"❌ 不明な段階: {', '.join(unknown)}")
+
+    work_dir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    context = {
+        'cues': parse_list(args.cues, int) if args.cues else (FULL_CUES if args.full else DEFAULT_CUES),
+        'resolutions': parse_list(args.resolutions) if args.resolutions
+                       else (FULL_RESOLUTIONS if args.full else DEFAULT_RESOLUTIONS),
+        'marker_density': args.marker_density,
+        'video_duration': args.video_duration,
+        'split_duration': args.split_duration,
+        'speech_duration': args.speech_duration,
+        'model': args.model,
+        'runs': args.runs,
+        'verbose': args.verbose,
+        'work_dir': work_dir,
+    }
+
+    results = []
+    skipped = {}
+    try:
+        for stage in stages:
+            print(f"⏱️ {stage} ...", flush=True)
+            try:
+                stage_results = BENCHMARKS[stage](context)
+            except SkipStage as e:
+                print(f"  ⏭️ スキップ: {e}")
+                skipped[stage] = str(e)
+                continue
+            for result in stage_results:
+                print(f"  {result['case']}: {result['wall']:.3f}秒")
+            results.extend(stage_results)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_results(results)
+    report = {
+        'created': time.time(),
+        'environment': environment_info(),
+        'parameters': {key: value for key, value in context.items() if key not in ('work_dir', 'verbose')},
+        'skipped': skipped,
+        'results': results,
+    }
+
+    regressions = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            rows, regressions = compare_results(results, json.load(f), args.tolerance)
+        print_comparison(rows, args.tolerance)
+        print(f"\n{'🔺 退行: ' + str(regressions) + '件' if regressions else '✅ 退行なし'}"
+              f"（許容: +{args.tolerance:.0%}）")
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"💾 保存: {path}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
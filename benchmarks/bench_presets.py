@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""複数のスタイルプリセットの合成のベンチマーク（プリセットごとにFFmpeg / 1回のFFmpegでまとめて）
+
+同じ動画・字幕に N個のプリセットを焼き込むとき、以前の方法（プリセットごとに
+merge_subtitle_with_ffmpeg、動画を N回デコード）と apply_subtitles.merge_presets_with_ffmpeg
+（1回だけデコードして split で分ける）の所要時間を比べる。レンダーキャッシュは使わない。
+
+    python benchmarks/bench_presets.py                                  # 720p 10秒、youtube,news,cinema
+    python benchmarks/bench_presets.py --resolution 1080p --duration 30
+    python benchmarks/bench_presets.py --presets youtube,news,cinema,anime,gaming --json presets.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['RENDER_CACHE'] = '0'
+
+from fixtures import make_video, make_subtitle_corpus
+from style_presets import parse_preset_names
+from apply_subtitles import merge_subtitle_with_ffmpeg, merge_presets_with_ffmpeg
+
+def timed(func):
+    """func を実行して (秒, 戻り値)（合成の途中経過の表示は捨てる）"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        value = func()
+        return time.perf_counter() - started, value
+
+def main():
+    parser = argparse.ArgumentParser(description='複数のスタイルプリセットの合成のベンチマーク')
+    parser.add_argument('--resolution', default='720p', help='テスト動画の解像度 (360p, 720p, 1080p)')
+    parser.add_argument('--duration', type=int, default=10, help='テスト動画の長さ（秒）')
+    parser.add_argument('--cues', type=int, default=100, help='字幕のキュー数')
+    parser.add_argument('--presets', default='youtube,news,cinema', help='プリセット（カンマ区切り）')
+    parser.add_argument('--json', help='結果をJSONで保存')
+    args = parser.parse_args()
+
+    presets = parse_preset_names(args.presets)
+    video = make_video(args.resolution, args.duration)
+    subtitle = make_subtitle_corpus(args.cues, 'srt', 0.0)
+    print(f"🎬 {os.path.basename(video)} + {args.cues}キュー → {len(presets)}プリセット "
+          f"({', '.join(preset.name for preset in presets)})")
+
+    with tempfile.TemporaryDirectory(prefix='bench_presets_') as work_dir:
+        def separate():
+            return [merge_subtitle_with_ffmpeg(video, subtitle, os.path.join(work_dir, f"separate_{preset.name}.mp4"),
+                                               preset=preset) for preset in presets]
+
+        def batched():
+            outputs = [(preset, os.path.join(work_dir, f"batched_{preset.name}.mp4")) for preset in presets]
+            return list(merge_presets_with_ffmpeg(video, subtitle, outputs).values())
+
+        separate_time, separate_results = timed(separate)
+        batched_time, batched_results = timed(batched)
+
+    print(f"  🔁 プリセットごと: {separate_time:8.2f}秒  成功 {sum(separate_results)}/{len(presets)}")
+    print(f"  🔀 まとめて1回:   {batched_time:8.2f}秒  成功 {sum(batched_results)}/{len(presets)}"
+          f"  ({separate_time / batched_time:.2f}倍)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'resolution': args.resolution,
+                'duration': args.duration,
+                'presets': [preset.name for preset in presets],
+                'separate': round(separate_time, 4),
+                'batched': round(batched_time, 4),
+            }, f, ensure_ascii=False, indent=2)
+        print(f"💾 {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""入力ステージングのベンチマーク（1ジョブあたりの書き込みバイト数）
+
+以前の add_subtitles_* は動画と字幕を作業ディレクトリにコピーしてから FFmpeg に
+渡していた。現在は動画をコピーせず file: パスで直接読み、字幕パスはフィルタ用に
+エスケープして渡す。両方の方式で同じ合成を行い、書き込み量と時間を比べる。
+
+    python benchmarks/bench_staging.py                         # テスト動画を生成して計測
+    python benchmarks/bench_staging.py --video 動画.mp4 --subtitle 字幕.ass
+    python benchmarks/bench_staging.py --staging-only          # エンコードせずステージングだけ
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ffmpeg_runner import run_ffmpeg
+from workspace import make_work_dir, atomic_output, input_path, escape_filter_path
+
+SAMPLE_ASS = """[Script Info]
+ScriptType: v4.00+
+PlayResX: 1280
+PlayResY: 720
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Noto Sans CJK JP,48,&H00FFFFFF,&H00FFFFFF,&H00000000,&H80000000,0,0,0,0,100,100,0,0,1,2,0,2,10,10,40,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+Dialogue: 0,0:00:00.50,0:00:03.00,Default,,0,0,0,,ベンチマーク用の字幕です
+Dialogue: 0,0:00:03.50,0:00:06.00,Default,,0,0,0,,{\\c&H00FFFF&}マーカー付き{\\r}の行
+"""
+
+def bytes_written():
+    """このプロセスと回収済みの子プロセスが書き込んだバイト数（/proc/self/io の wchar）"""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.lstat(os.path.join(root, name)).st_size
+    return total
+
+def create_sample_video(path, duration, bitrate):
+    """テスト用の動画を生成（ビットレートを上げて大きめのファイルにする）"""
+    cmd = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f"testsrc2=size=1280x720:rate=30:duration={duration}",
+        '-f', 'lavfi', '-i', f"sine=frequency=440:duration={duration}",
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-b:v', bitrate,
+        '-c:a', 'aac', '-shortest', path
+    ]
+    result = run_ffmpeg(cmd, quiet=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"テスト動画の生成に失敗: {result.stderr}")
+
+def encode(video_arg, subtitle_arg, output_path, cwd=None):
+    with atomic_output(output_path) as output:
+        cmd = [
+            'ffmpeg', '-y', '-v', 'error',
+            '-i', video_arg,
+            '-vf', f"ass={subtitle_arg}",
+            '-c:a', 'copy', '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '28',
+            output.path
+        ]
+        result = run_ffmpeg(cmd, quiet=True, cwd=cwd)
+        if result.returncode != 0:
+            raise RuntimeError(f"合成に失敗: {result.stderr}")
+        output.commit()
+    return os.path.getsize(output_path)
+
+def run_copy_staging(video_path, subtitle_path, output_path, staging_only):
+    """以前の方式: 動画と字幕を作業ディレクトリにコピーしてから合成"""
+    work_dir = make_work_dir('bench_copy_')
+    try:
+        work_video = os.path.join(work_dir, 'video_0000.mp4')
+        work_subtitle = os.path.join(work_dir, 'video_0000.ass')
+        shutil.copy2(video_path, work_video)
+        shutil.copy2(subtitle_path, work_subtitle)
+        staged = directory_size(work_dir)
+        output_size = 0 if staging_only else encode(work_video, work_subtitle, output_path, cwd=work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return staged, output_size
+
+def run_zero_copy(video_path, subtitle_path, output_path, staging_only):
+    """現在の方式: 元のファイルを直接読む"""
+    video_arg = input_path(video_path)
+    subtitle_arg = escape_filter_path(subtitle_path)
+    output_size = 0 if staging_only else encode(video_arg, subtitle_arg, output_path)
+    return 0, output_size
+
+def measure(name, runner, video_path, subtitle_path, output_path, runs, staging_only):
+    results = []
+    for _ in range(runs):
+        before = bytes_written()
+        started = time.perf_counter()
+        staged, output_size = runner(video_path, subtitle_path, output_path, staging_only)
+        elapsed = time.perf_counter() - started
+        after = bytes_written()
+        results.append({
+            'elapsed': elapsed,
+            'staged_bytes': staged,
+            'output_bytes': output_size,
+            # wchar には終了した子プロセス（FFmpeg）の書き込みも加算される
+            'total_bytes': after - before if before is not None else staged + output_size,
+        })
+    best = min(results, key=lambda r: r['elapsed'])
+    return dict(best, mode=name, runs=runs)
+
+def format_mb(value):
+    return f"{value / (1024 * 1024):8.1f} MB"
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='入力ステージング方式ごとの書き込みバイト数を計測')
+    parser.add_argument('--video', help='計測に使う動画（省略時はテスト動画を生成）')
+    parser.add_argument('--subtitle', help='ASS字幕（省略時はサンプルを生成）')
+    parser.add_argument('--duration', type=int, default=20, help='生成するテスト動画の秒数')
+    parser.add_argument('--bitrate', default='20M', help='生成するテスト動画のビットレート')
+    parser.add_argument('--runs', type=int, default=3, help='各方式の実行回数（最速を採用）')
+    parser.add_argument('--staging-only', action='store_true', help='合成せずステージングだけを計測')
+    parser.add_argument('--json', help='結果をJSONで保存')
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    bench_dir = tempfile.mkdtemp(prefix='bench_staging_')
+    try:
+        # ステージングが必要になる名前（日本語・空白・記号）で用意する
+        source_dir = os.path.join(bench_dir, "入力 [テスト], 01")
+        os.makedirs(source_dir)
+        video_path = os.path.join(source_dir, "動画: サンプル.mp4")
+        subtitle_path = os.path.join(source_dir, "字幕 'サンプル'.ass")
+
+        if args.video:
+            os.symlink(os.path.abspath(args.video), video_path)
+        else:
+            print(f"🎬 テスト動画を生成中 ({args.duration}秒, {args.bitrate})...")
+            create_sample_video(video_path, args.duration, args.bitrate)
+        if args.subtitle:
+            shutil.copyfile(args.subtitle, subtitle_path)
+        else:
+            with open(subtitle_path, 'w', encoding='utf-8') as f:
+                f.write(SAMPLE_ASS)
+
+        video_size = os.path.getsize(video_path)
+        print(f"📹 入力動画: {format_mb(video_size).strip()}")
+        output_path = os.path.join(bench_dir, 'output.mp4')
+
+        results = [
+            measure('copy', run_copy_staging, video_path, subtitle_path, output_path, args.runs, args.staging_only),
+            measure('zero-copy', run_zero_copy, video_path, subtitle_path, output_path, args.runs, args.staging_only),
+        ]
+
+        print(f"\n{'方式':<10} {'ステージング':>14} {'出力':>11} {'書き込み合計':>14} {'時間':>8}")
+        for r in results:
+            print(f"{r['mode']:<10} {format_mb(r['staged_bytes']):>14} {format_mb(r['output_bytes']):>11} "
+                  f"{format_mb(r['total_bytes']):>14} {r['elapsed']:7.2f}秒")
+        saved = results[0]['total_bytes'] - results[1]['total_bytes']
+        print(f"\n📉 1ジョブあたりの書き込み削減: {format_mb(saved).strip()}")
+
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump({'video_bytes': video_size, 'results': results}, f, ensure_ascii=False, indent=2)
+    finally:
+        shutil.rmtree(bench_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
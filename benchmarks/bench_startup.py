@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""subtitled.py のサブコマンドの起動時間のベンチマーク（import時間の退行チェック）
+
+`subtitled.py <サブコマンド> --help` を何度か実行して最速の時間を測り、何もしない
+Python（python -c pass）との差をサブコマンドの起動コストとする。`-X importtime` の出力から
+読み込まれたモジュールも調べ、軽いサブコマンド（convert, combine）で whisper・torch などの
+重い依存が読み込まれていたり、起動コストが予算を超えていたら終了コード1で終わる。
+
+    python benchmarks/bench_startup.py                        # 予算 100ms
+    python benchmarks/bench_startup.py --budget-ms 60 --runs 20
+    python benchmarks/bench_startup.py --light convert,combine,split --json startup.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI_PATH = os.path.join(ROOT_DIR, 'subtitled.py')
+
+# 軽いサブコマンドで読み込まれてはいけないモジュール
+HEAVY_MODULES = ('whisper', 'torch', 'numpy', 'jaconv', 'mojimoji', 'neologdn', 'chardet')
+
+def child_env():
+    """計測用の環境（実行レポートは書き出さない）"""
+    env = dict(os.environ)
+    env['SUBTITLE_RUN_REPORT'] = '0'
+    return env
+
+def best_wall_time(cmd, runs):
+    """cmd を runs 回実行した最速の時間（秒）"""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=child_env(), check=True)
+        samples.append(time.perf_counter() - started)
+    return min(samples)
+
+def import_times(cmd):
+    """-X importtime の出力を解析して [(モジュール名, 累積マイクロ秒, 深さ), ...]"""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + cmd[1:], stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True, env=child_env())
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(cumulative), depth))
+    return modules
+
+def measure(command, runs, baseline):
+    """1つのサブコマンドの起動時間と読み込まれたモジュール"""
+    cmd = [sys.executable, CLI_PATH, command, '--help']
+    wall = best_wall_time(cmd, runs)
+    modules = import_times(cmd)
+    # site（インタプリタの起動）より後の、直接 import されたモジュール
+    names = [name for name, _, _ in modules]
+    start = names.index('site') + 1 if 'site' in names else 0
+    top_level = sorted(((name, cumulative) for name, cumulative, depth in modules[start:] if depth == 0),
+                       key=lambda item: -item[1])
+    heavy = sorted({name.split('.')[0] for name in names} & set(HEAVY_MODULES))
+    return {
+        'command': command,
+        'wall_ms': round(wall * 1000, 2),
+        'added_ms': round((wall - baseline) * 1000, 2),
+        'import_ms': round(sum(cumulative for _, cumulative in top_level) / 1000, 2),
+        'slowest': [(name, round(cumulative / 1000, 2)) for name, cumulative in top_level[:5]],
+        'heavy': heavy,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='subtitled.py のサブコマンドの起動時間のベンチマーク')
+    parser.add_argument('--commands', default='convert,combine,split,process,generate',
+                        help='計測するサブコマンド（カンマ区切り、--help で起動する）')
+    parser.add_argument('--light', default='convert,combine', help='予算と重い依存をチェックするサブコマンド')
+    parser.add_argument('--budget-ms', type=float, default=100.0,
+                        help='軽いサブコマンドの起動コストの上限（python -c pass との差、ミリ秒）')
+    parser.add_argument('--runs', type=int, default=10, help='各サブコマンドの実行回数（最速を採用）')
+    parser.add_argument('--json', help='結果をJSONで保存')
+    args = parser.parse_args()
+
+    commands = [value.strip() for value in args.commands.split(',') if value.strip()]
+    light = {value.strip() for value in args.light.split(',') if value.strip()}
+
+    baseline = best_wall_time([sys.executable, '-c', 'pass'], args.runs)
+    print(f"🐍 python -c pass: {baseline * 1000:7.1f}ms（この時間との差を起動コストとする）")
+
+    results = []
+    failures = []
+    for command in commands:
+        result = measure(command, args.runs, baseline)
+        results.append(result)
+        slowest = ', '.join(f"{name} {ms:.1f}ms" for name, ms in result['slowest'][:3])
+        mark = ''
+        if command in light:
+            if result['added_ms'] > args.budget_ms:
+                failures.append(f"{command}: 起動コスト {result['added_ms']:.1f}ms > {args.budget_ms:g}ms")
+                mark = ' 🔺'
+            if result['heavy']:
+                failures.append(f"{command}: 重い依存を読み込んでいる ({', '.join(result['heavy'])})")
+                mark = ' 🔺'
+        print(f"  {command:<10} {result['wall_ms']:7.1f}ms  起動コスト {result['added_ms']:6.1f}ms  "
+              f"import {result['import_ms']:6.1f}ms{mark}")
+        print(f"             遅いimport: {slowest or '-'}")
+        if result['heavy']:
+            print(f"             重い依存: {', '.join(result['heavy'])}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'baseline_ms': round(baseline * 1000, 2), 'budget_ms': args.budget_ms, 'results': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"💾 {args.json}")
+
+    if failures:
+        print("\n❌ 起動時間の退行:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print(f"\n✅ {', '.join(sorted(light))}: 起動コスト {args.budget_ms:g}ms 以内・重い依存なし")
+
+if __name__ == "__main__":
+    main()
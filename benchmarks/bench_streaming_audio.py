@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""音声読み込みのメモリのベンチマーク（全体読み込み / ストリーミング）
+
+whisper の transcribe(パス) と同じ方法（whisper.audio.load_audio: FFmpegの出力を全部読んで
+float32 に変換）と、streaming_audio.AudioStream でウィンドウごとに読む方法で、
+1時間・3時間・6時間の音声を読み込んだときの最大常駐メモリを比べる。
+音声は FFmpeg の lavfi で生成してパイプで読むので、長い音声ファイルは作らない。
+計測は1件ずつ別プロセスで行う（最大常駐メモリがほかの計測に影響されないように）。
+
+    python benchmarks/bench_streaming_audio.py                          # 1h, 3h, 6h
+    python benchmarks/bench_streaming_audio.py --durations 600,3600 --window 300
+    python benchmarks/bench_streaming_audio.py --modes streaming --transcribe tiny   # 文字起こしも含める
+    python benchmarks/bench_streaming_audio.py --json streaming.json
+
+6時間の全体読み込みは3GB以上使うので、メモリが足りない環境では --modes streaming で実行する。
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+DEFAULT_DURATIONS = [3600, 10800, 21600]
+MODES = ['whole', 'streaming']
+
+def lavfi_source(duration):
+    return ['-f', 'lavfi', '-i', f"sine=frequency=220:beep_factor=4:sample_rate=16000:duration={duration}"]
+
+def peak_rss_bytes():
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+def load_whole(duration):
+    """whisper.audio.load_audio と同じ読み込み方（全体を1つの配列にする）"""
+    import numpy as np
+    cmd = ['ffmpeg', '-nostdin', '-threads', '0', '-v', 'error'] + lavfi_source(duration) + [
+        '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', '16000', '-'
+    ]
+    out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    audio = np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+    return len(audio)
+
+def load_streaming(duration, window):
+    from streaming_audio import AudioStream
+    samples = 0
+    with AudioStream(lavfi_source(duration), window) as stream:
+        for chunk in stream:
+            samples += len(chunk)
+    return samples
+
+def transcribe_streaming_case(duration, window, model_name):
+    import whisper
+    from streaming_audio import transcribe_streaming
+    model = whisper.load_model(model_name)
+    result = transcribe_streaming(model, lavfi_source(duration), window, language='ja', verbose=None)
+    return len(result['segments'])
+
+def run_child(mode, duration, window, model_name):
+    """子プロセスとして1件を計測し、JSONを標準出力に書く"""
+    started = time.perf_counter()
+    if mode == 'whole':
+        count = load_whole(duration)
+    elif mode == 'streaming':
+        count = load_streaming(duration, window)
+    else:
+        count = transcribe_streaming_case(duration, window, model_name)
+    print(json.dumps({
+        'mode': mode,
+        'duration': duration,
+        'wall': round(time.perf_counter() - started, 3),
+        'peak_rss': peak_rss_bytes(),
+        'count': count,
+    }))
+
+def measure(mode, duration, window, model_name):
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', mode, str(duration), '--window', str(window)]
+    if model_name:
+        cmd += ['--transcribe', model_name]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        tail = (result.stderr or '').strip().splitlines()[-1:] or [f"終了コード {result.returncode}"]
+        return {'mode': mode, 'duration': duration, 'error': tail[0]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def format_duration(seconds):
+    return f"{seconds / 3600:g}h" if seconds >= 3600 else f"{seconds:g}s"
+
+def main():
+    parser = argparse.ArgumentParser(description='音声読み込みのメモリのベンチマーク')
+    parser.add_argument('--durations', default=','.join(str(value) for value in DEFAULT_DURATIONS),
+                        help='音声の長さ（秒、カンマ区切り）')
+    parser.add_argument('--modes', default=','.join(MODES), help='whole, streaming（カンマ区切り）')
+    parser.add_argument('--window', type=float, default=600, help='ストリーミングのウィンドウ（秒）')
+    parser.add_argument('--transcribe', metavar='MODEL', help='ストリーミングで文字起こしまで行う（whisper が必要）')
+    parser.add_argument('--json', help='結果をJSONで保存')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'DURATION'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], float(args.child[1]), args.window, args.transcribe)
+        return
+
+    durations = [float(value) for value in args.durations.split(',') if value.strip()]
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    if args.transcribe:
+        modes.append('transcribe')
+
+    print(f"🎧 音声読み込みのメモリ（ウィンドウ {args.window:g}秒）")
+    results = []
+    for duration in durations:
+        for mode in modes:
+            result = measure(mode, duration, args.window, args.transcribe)
+            results.append(result)
+            if 'error' in result:
+                print(f"  {format_duration(duration):>6} {mode:<10} ❌ {result['error']}")
+                continue
+            print(f"  {format_duration(duration):>6} {mode:<10} 最大メモリ {result['peak_rss'] / (1024 * 1024):8.1f}MB"
+                  f"  {result['wall']:7.1f}秒")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'window': args.window, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"💾 {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""ベンチマーク用の決定的なテストデータ
+
+FFmpegの lavfi で作るテスト動画（解像度・長さ・音声を指定）と、乱数のシードを固定して
+作るSRT/ASSの字幕コーパス（10〜100万キュー、マーカーの密度を指定）を生成する。
+同じ引数なら毎回同じ内容になるので、生成済みのファイルは BENCH_FIXTURE_DIR に置いて再利用する。
+"""
+
+import os
+import random
+import subprocess
+
+FIXTURE_DIR = os.environ.get('BENCH_FIXTURE_DIR',
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), '.fixtures'))
+
+RESOLUTIONS = {
+    '360p': (640, 360),
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+}
+
+# 話し声に近い音声（基本周波数の揺れ・音節ごとの強弱・文の区切りの無音）
+SPEECH_EXPRESSION = (
+    "0.4*sin(2*PI*(160+30*sin(2*PI*0.7*t))*t)*(0.55+0.45*sin(2*PI*4.3*t))"
+    "*gt(mod(t\\,3.2)\\,0.5)"
+    "+0.15*sin(2*PI*(480+60*sin(2*PI*1.1*t))*t)*gt(mod(t\\,3.2)\\,0.5)"
+)
+
+PHRASES = [
+    'こんにちは', '今日は', 'とても', 'いい天気ですね', 'それでは', '始めましょう',
+    '字幕の', 'テストです', 'この動画では', '説明します', 'まず最初に', '次に',
+    'ここが', '大事なポイントです', 'ありがとうございました', 'よろしくお願いします',
+]
+MARKERS = ['red', 'large', 'yellow bold', 'size48', 'blue italic', 'small green']
+MARKER_TAGS = {
+    'red': r'\c&H0000FF&',
+    'large': r'\fs36',
+    'yellow bold': r'\c&H00FFFF&\b1',
+    'size48': r'\fs48',
+    'blue italic': r'\c&HFF0000&\i1',
+    'small green': r'\fs18\c&H00FF00&',
+}
+RESET_TAG = r'{\fs24\c&HFFFFFF&\b0\i0}'
+
+ASS_HEADER = """[Script Info]
+Title: benchmark
+ScriptType: v4.00+
+PlayResX: 1920
+PlayResY: 1080
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Noto Sans CJK JP,24,&H00FFFFFF,&H00FFFFFF,&H00000000,&H80000000,0,0,0,0,100,100,0,0,1,2,0,2,10,10,40,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+def fixture_path(filename, directory=None):
+    directory = directory or FIXTURE_DIR
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, filename)
+
+def run_ffmpeg_quiet(cmd):
+    result = subprocess.run(cmd, capture_output=True, text=True, errors='replace')
+    if result.returncode != 0:
+        raise RuntimeError(f"テストデータの生成に失敗: {result.stderr[-500:]}")
+
+def make_video(resolution='720p', duration=10, fps=30, directory=None):
+    """テスト動画（testsrc2 + 話し声風の音声、2秒ごとにキーフレーム）を作ってパスを返す"""
+    width, height = RESOLUTIONS[resolution]
+    path = fixture_path(f"video_{resolution}_{duration}s_{fps}fps.mp4", directory)
+    if os.path.exists(path):
+        return path
+    temp_path = path + '.tmp.mp4'
+    run_ffmpeg_quiet([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f"testsrc2=size={width}x{height}:rate={fps}:duration={duration}",
+        '-f', 'lavfi', '-i', f"aevalsrc={SPEECH_EXPRESSION}:s=48000:d={duration}",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-g', str(fps * 2), '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-b:a', '128k', '-shortest',
+        '-map_metadata', '-1', '-fflags', '+bitexact',
+        temp_path
+    ])
+    os.replace(temp_path, path)
+    return path
+
+def make_speech_audio(duration=30, directory=None):
+    """文字起こし用の話し声風の音声（16kHz モノラル WAV）"""
+    path = fixture_path(f"speech_{duration}s.wav", directory)
+    if os.path.exists(path):
+        return path
+    temp_path = path + '.tmp.wav'
+    run_ffmpeg_quiet([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f"aevalsrc={SPEECH_EXPRESSION}:s=16000:d={duration}",
+        '-ac', '1', '-fflags', '+bitexact', temp_path
+    ])
+    os.replace(temp_path, path)
+    return path
+
+def generate_cues(count, marker_density=0.1, seed=0, cue_length=2.5, gap=0.5):
+    """字幕キューを順に生成（{'start', 'end', 'words', 'marker'}、marker はなければ None）
+
+    marker_density の割合のキューで1語を (マーカー, 語) にする。SRTでは ¥¥¥マーカー¥¥¥語¥¥¥、
+    ASSではマーカー処理後と同じタグとして書き出す。
+    """
+    rng = random.Random(seed)
+    start = 0.0
+    for _ in range(count):
+        words = [rng.choice(PHRASES) for _ in range(rng.randint(2, 4))]
+        marker = None
+        if rng.random() < marker_density:
+            marker = rng.choice(MARKERS)
+            index = rng.randrange(len(words))
+            words[index] = (marker, words[index])
+        length = cue_length * (0.6 + 0.8 * rng.random())
+        yield {'start': start, 'end': start + length, 'words': words, 'marker': marker}
+        start += length + gap * rng.random()
+
+def format_srt_time(seconds):
+    millis = int(round(seconds * 1000))
+    return f"{millis // 3600000:02d}:{millis // 60000 % 60:02d}:{millis // 1000 % 60:02d},{millis % 1000:03d}"
+
+def format_ass_time(seconds):
+    centis = int(round(seconds * 100))
+    return f"{centis // 360000}:{centis // 6000 % 60:02d}:{centis // 100 % 60:02d}.{centis % 100:02d}"
+
+def srt_text(words):
+    return ''.join(f"¥¥¥{word[0]}¥¥¥{word[1]}¥¥¥" if isinstance(word, tuple) else word for word in words)
+
+def ass_text(words):
+    return ''.join('{' + MARKER_TAGS[word[0]] + '}' + word[1] + RESET_TAG if isinstance(word, tuple) else word
+                   for word in words)
+
+def write_srt(path, cues):
+    """キューをSRTに書き出す（100万キューでもメモリに溜めない）"""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for count, cue in enumerate(cues, 1):
+            f.write(f"{count}\n{format_srt_time(cue['start'])} --> {format_srt_time(cue['end'])}\n"
+                    f"{srt_text(cue['words'])}\n\n")
+    return count
+
+def write_ass(path, cues):
+    """キューをマーカー処理済みと同じ形のASS（タグ付き）に書き出す"""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(ASS_HEADER)
+        for count, cue in enumerate(cues, 1):
+            f.write(f"Dialogue: 0,{format_ass_time(cue['start'])},{format_ass_time(cue['end'])},Default,,0,0,0,,"
+                    f"{ass_text(cue['words'])}\n")
+    return count
+
+def make_subtitle_corpus(count, subtitle_format='srt', marker_density=0.1, seed=0, directory=None):
+    """字幕コーパスを作ってパスを返す（同じ引数なら生成済みのファイルを使う）"""
+    path = fixture_path(f"cues_{count}_m{marker_density:g}_s{seed}.{subtitle_format}", directory)
+    if os.path.exists(path):
+        return path
+    temp_path = f"{path}.tmp"
+    writer = write_ass if subtitle_format == 'ass' else write_srt
+    writer(temp_path, generate_cues(count, marker_density, seed))
+    os.replace(temp_path, path)
+    return path
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from render_cache import file_sha256, video_identity
+from encoding_profiles import ENCODING_PROFILES, DEFAULT_PROFILE, parse_encoding_args, encoding_key
+from workspace import make_work_dir
+from run_report import run_report, stage, record_cache
+from profiling import PROFILE_OPTIONS
+from video_to_text_with_custom_styles import build_parser as build_generator_parser, load_model, transcribe_video, \
+    write_outputs, find_video_files
+from subtitle_index import safe_base_name
+from process_markers import parse_arguments as parse_process_arguments, marker_ass_filename, process_marker_file
+from apply_subtitles import parse_style_args, prepare_subtitle_file, check_for_markers, build_output_filename, \
+    merge_subtitle_with_ffmpeg
+
+STATE_FILENAME = '.build_state.json'
+
+# ノードの状態
+FRESH = 'fresh'        # 最新（実行不要）
+STALE = 'stale'        # 再実行が必要
+BUILT = 'built'        # 今回実行した
+SKIPPED = 'skipped'    # 入力が無い・編集保護などで実行しなかった
+FAILED = 'failed'      # 失敗（下流は実行しない）
+
+class BuildNode:
+    """ビルドグラフの1ノード（1つの処理と、その入力・設定・出力）"""
+
+    def __init__(self, node_id, stage, inputs, options, outputs, action, deps=(), protect_outputs=False):
+        self.node_id = node_id
+        self.stage = stage
+        self.inputs = list(inputs)
+        self.options = options
+        self.outputs = list(outputs)
+        self.action = action
+        self.deps = list(deps)
+        # 出力が手で編集されていたら上書きしない（文字起こしのSRTなど）
+        self.protect_outputs = protect_outputs
+
+class BuildState:
+    """前回ビルド時の入力フィンガープリントと出力ハッシュ（<root>/.build_state.json）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.nodes = json.load(f).get('nodes', {})
+        except (OSError, ValueError):
+            self.nodes = {}
+
+    def get(self, node_id):
+        return self.nodes.get(node_id)
+
+    def update(self, node_id, fingerprint, outputs):
+        with self._lock:
+            self.nodes[node_id] = {
+                'fingerprint': fingerprint,
+                'outputs': outputs,
+                'built_at': time.time(),
+            }
+            self._save()
+
+    def _save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'nodes': self.nodes}, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+def content_hash(path):
+    """入力ファイルのハッシュ（動画はサンプルハッシュ、それ以外は全体）"""
+    if os.path.splitext(path)[1].lower() in ('.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.m4v'):
+        return video_identity(path)
+    return file_sha256(path)
+
+def fingerprint(node):
+    """入力内容と設定から作るノードのフィンガープリント（入力が欠けていればNone）"""
+    if not all(os.path.exists(path) for path in node.inputs):
+        return None
+    source = {
+        'stage': node.stage,
+        'options': node.options,
+        'inputs': {os.path.basename(path): content_hash(path) for path in node.inputs},
+    }
+    payload = json.dumps(source, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+def output_hashes(node):
+    return {path: file_sha256(path) for path in node.outputs if os.path.exists(path)}
+
+def outputs_edited(node, record):
+    """前回ビルド後に出力が手で編集されたか"""
+    recorded = (record or {}).get('outputs', {})
+    return any(os.path.exists(path) and file_sha256(path) != digest for path, digest in recorded.items())
+
+def check_node(node, state, force=False):
+    """ノードが最新かどうかを判定
+
+    戻り値: (状態, 理由)
+    """
+    if not all(os.path.exists(path) for path in node.inputs):
+        return SKIPPED, '入力なし'
+    if force:
+        return STALE, '強制'
+    if not all(os.path.exists(path) for path in node.outputs):
+        return STALE, '出力なし'
+
+    record = state.get(node.node_id)
+    if record is None:
+        # ビルド記録が無い既存の出力は、入力より新しければ最新とみなす（make と同じ判定）
+        newest_input = max(os.path.getmtime(path) for path in node.inputs)
+        if all(os.path.getmtime(path) >= newest_input for path in node.outputs):
+            return FRESH, '既存の出力を採用'
+        return STALE, '入力が出力より新しい'
+
+    if record.get('fingerprint') != fingerprint(node):
+        if node.protect_outputs and outputs_edited(node, record):
+            return SKIPPED, '出力が編集済み（--force で上書き）'
+        return STALE, '入力・設定が変更'
+    return FRESH, '最新'
+
+class BuildContext:
+    """ビルド全体の設定と、ステージ間で共有するリソース"""
+
+    def __init__(self, args, style_argv):
+        self.args = args
+        self.root = args.root
+        self.videos_dir = os.path.join(self.root, 'videos')
+        self.output_dir = os.path.join(self.root, 'output')
+        self.marker_dir = os.path.join(self.root, 'marker_output')
+        self.merged_dir = os.path.join(self.root, 'merged_videos')
+
+        # 文字起こし: video_to_text_with_custom_styles.py と同じ引数（モデル以外はデフォルト）
+        self.generator_args = build_generator_parser().parse_args([
+            '--model', args.model, '--input-dir', self.videos_dir, '--output-dir', self.output_dir
+        ])
+        # マーカー処理・合成: marker_workflow.sh の process / apply と同じスタイル引数
+        self.process_args = parse_process_arguments([self.output_dir, self.marker_dir] + style_argv)
+        self.style_args = parse_style_args(style_argv)
+        self.encoding_options = parse_encoding_args()
+
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    def model(self):
+        """Whisperモデル（最初の文字起こしで1回だけ読み込む）"""
+        if self._model is None:
+            with stage('model_load', model=self.args.model):
+                self._model = load_model(self.args.model)
+        return self._model
+
+    def transcribe(self, video_path):
+        # モデルは共有するので文字起こしは1本ずつ
+        with self._model_lock:
+            base_name = safe_base_name(os.path.splitext(os.path.basename(video_path))[0])
+            cues = transcribe_video(self.model(), video_path, self.generator_args.normalize)
+            write_outputs(cues, base_name, self.generator_args, self.output_dir)
+        return True
+
+    def process(self, srt_path):
+        return process_marker_file(srt_path, self.marker_dir, self.process_args) is not None
+
+    def render(self, video_path, ass_path, output_path):
+        work_dir = make_work_dir('build_render_')
+        try:
+            subtitle_to_use, has_markers, _ = prepare_subtitle_file(ass_path, self.style_args, work_dir)
+            return merge_subtitle_with_ffmpeg(video_path, subtitle_to_use, output_path, self.style_args, has_markers,
+                                              source_subtitle=ass_path, encoding_options=self.encoding_options)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def generator_options(context):
+    options = vars(context.generator_args).copy()
+    for key in ('input_dir', 'output_dir', 'preview') + PROFILE_OPTIONS:
+        options.pop(key, None)
+    return options
+
+def build_graph(context):
+    """動画 → 文字起こし → マーカーASS → 合成MP4 のグラフを作成"""
+    nodes = []
+    if not os.path.isdir(context.videos_dir):
+        return nodes
+
+    transcribe_options = generator_options(context)
+    process_options = {key: value for key, value in vars(context.process_args).items()
+                       if key not in ('input_dir', 'output_dir') + PROFILE_OPTIONS}
+    render_options = {
+        'style': context.style_args,
+        'encoding': encoding_key(context.encoding_options),
+    }
+
+    for filename in sorted(find_video_files(context.videos_dir)):
+        video_path = os.path.join(context.videos_dir, filename)
+        video_base = os.path.splitext(filename)[0]
+        base_name = safe_base_name(video_base)
+
+        srt_path = os.path.join(context.output_dir, f"{base_name}_editable.srt")
+        transcript_outputs = [srt_path, os.path.join(context.output_dir, f"{base_name}.txt")]
+        if context.generator_args.format in ['ass', 'both']:
+            transcript_outputs.append(os.path.join(context.output_dir, f"{base_name}_styled.ass"))
+        transcribe = BuildNode(
+            f"transcribe:{filename}", 'transcribe', [video_path], transcribe_options, transcript_outputs,
+            lambda path=video_path: context.transcribe(path), protect_outputs=True
+        )
+
+        ass_filename = marker_ass_filename(os.path.basename(srt_path), context.process_args)
+        ass_path = os.path.join(context.marker_dir, ass_filename)
+        process = BuildNode(
+            f"process:{os.path.basename(srt_path)}", 'process', [srt_path], process_options, [ass_path],
+            lambda path=srt_path: context.process(path), deps=[transcribe]
+        )
+
+        has_markers = check_for_markers(ass_path) if os.path.exists(ass_path) else True
+        output_path = os.path.join(context.merged_dir,
+                                   build_output_filename(video_base, ass_filename, context.style_args, has_markers))
+        render = BuildNode(
+            f"render:{os.path.basename(output_path)}", 'render', [video_path, ass_path], render_options, [output_path],
+            lambda v=video_path, a=ass_path, o=output_path: context.render(v, a, o), deps=[process]
+        )
+        nodes.extend([transcribe, process, render])
+
+    return nodes
+
+def show_plan(nodes, state, force=False):
+    """ビルド計画を表示（上流が再実行されるノードも再実行扱い）"""
+    statuses = {}
+    for node in nodes:
+        upstream = [statuses[dep.node_id][0] for dep in node.deps]
+        if any(status == STALE for status in upstream):
+            statuses[node.node_id] = (STALE, '上流が再実行')
+        elif any(status in (SKIPPED, FAILED) for status in upstream) and \
+                not all(os.path.exists(path) for path in node.inputs):
+            statuses[node.node_id] = (SKIPPED, '上流がスキップ')
+        else:
+            statuses[node.node_id] = check_node(node, state, force)
+
+    stale_count = sum(1 for status, _ in statuses.values() if status == STALE)
+    print(f"\n📋 ビルド計画: {len(nodes)}ノード中 {stale_count}ノードを実行")
+    icons = {FRESH: '✅', STALE: '🔄', SKIPPED: '⏭️'}
+    for node in nodes:
+        status, reason = statuses[node.node_id]
+        print(f"  {icons.get(status, '❔')} {node.node_id:<60} {reason}")
+    return statuses
+
+def execute_node(node, state, force):
+    """依存ノードの完了後に呼ばれ、最新でなければ実行する"""
+    status, reason = check_node(node, state, force)
+    if status in (FRESH, STALE):
+        record_cache('build', status == FRESH)
+    if status == FRESH and state.get(node.node_id) is None:
+        # 既存の出力を今回の入力で記録しておく
+        state.update(node.node_id, fingerprint(node), output_hashes(node))
+    if status != STALE:
+        if status == SKIPPED:
+            print(f"⏭️ {node.node_id}: {reason}")
+        return status
+
+    print(f"\n🔄 {node.node_id} ({reason})")
+    started = time.time()
+    # 出力が無くても成功扱いのもの（マーカー無しのSRTなど）は下流をスキップする
+    with stage(node.stage, file=node.node_id):
+        result = node.action()
+    if not result:
+        if node.stage == 'process':
+            print(f"⏭️ {node.node_id}: マーカー無し")
+            return SKIPPED
+        print(f"❌ {node.node_id}: 失敗")
+        return FAILED
+
+    state.update(node.node_id, fingerprint(node), output_hashes(node))
+    print(f"✅ {node.node_id} ({time.time() - started:.1f}秒)")
+    return BUILT
+
+def affected_nodes(nodes, changed_paths):
+    """変更されたファイルを入力に持つノードと、その下流のノードだけを選ぶ"""
+    changed = {os.path.abspath(path) for path in changed_paths}
+    selected = set()
+    for node in nodes:
+        if any(os.path.abspath(path) in changed for path in node.inputs) or \
+                any(dep.node_id in selected for dep in node.deps):
+            selected.add(node.node_id)
+    return [node for node in nodes if node.node_id in selected]
+
+def run_graph(nodes, state, jobs=1, force=False):
+    """依存関係が満たされたノードから並列に実行
+
+    nodes に含まれない依存ノード（affected_nodes で絞り込んだ場合）は最新とみなす。
+    """
+    node_ids = {node.node_id for node in nodes}
+    results = {}
+    pending = list(nodes)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        while pending or running:
+            for node in list(pending):
+                dep_results = [results.get(dep.node_id) if dep.node_id in node_ids else FRESH
+                               for dep in node.deps]
+                if any(result is None for result in dep_results):
+                    continue
+                pending.remove(node)
+                if any(result == FAILED for result in dep_results):
+                    results[node.node_id] = FAILED
+                    print(f"⛔ {node.node_id}: 上流が失敗")
+                    continue
+                running[executor.submit(execute_node, node, state, force)] = node
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                try:
+                    results[node.node_id] = future.result()
+                except Exception as e:
+                    print(f"❌ {node.node_id}: {e}")
+                    results[node.node_id] = FAILED
+
+    return results
+
+def add_build_arguments(parser):
+    """build.py と watch_folder.py 共通の引数を追加"""
+    parser.add_argument('--root', default='.', help='videos/ output/ marker_output/ merged_videos/ を含むディレクトリ')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='並列実行するノード数')
+    parser.add_argument('--model', default='base', help='Whisperモデル')
+
+    # apply_subtitles.py と同じエンコード・キャッシュ設定（parse_encoding_args などが sys.argv から読む）
+    parser.add_argument('--encoding-profile', default=DEFAULT_PROFILE, choices=list(ENCODING_PROFILES))
+    parser.add_argument('--target-time', type=float)
+    parser.add_argument('--target-size', type=float)
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--incremental', action='store_true')
+
+def parse_arguments():
+    """引数解析（残りの引数は process / apply 共通のスタイル引数として扱う）"""
+    parser = argparse.ArgumentParser(
+        description='変更があった段階だけを再実行するビルド（生成 → マーカー処理 → 合成）',
+        epilog='その他の引数（--size, --color, --bold ...）は process / apply と同じスタイル引数として渡されます'
+    )
+    add_build_arguments(parser)
+    parser.add_argument('--dry-run', action='store_true', help='実行せずにビルド計画だけを表示')
+    parser.add_argument('--force', action='store_true', help='全ノードを再実行（編集済みの出力も上書き）')
+
+    return parser.parse_known_args()
+
+def main():
+    """メイン処理"""
+    args, style_argv = parse_arguments()
+    context = BuildContext(args, style_argv)
+    state = BuildState(os.path.join(args.root, STATE_FILENAME))
+
+    print("🏗️ 字幕ビルド")
+    print(f"📁 ルート: {os.path.abspath(args.root)}")
+
+    nodes = build_graph(context)
+    if not nodes:
+        print(f"❌ 動画ファイルが見つかりません: {context.videos_dir}")
+        sys.exit(1)
+
+    show_plan(nodes, state, args.force)
+    if args.dry_run:
+        return
+
+    for directory in (context.output_dir, context.marker_dir, context.merged_dir):
+        os.makedirs(directory, exist_ok=True)
+
+    started = time.time()
+    results = run_graph(nodes, state, args.jobs, args.force)
+
+    counts = {}
+    for status in results.values():
+        counts[status] = counts.get(status, 0) + 1
+    print(f"\n🎉 ビルド完了 ({time.time() - started:.1f}秒): 実行 {counts.get(BUILT, 0)} / "
+          f"最新 {counts.get(FRESH, 0)} / スキップ {counts.get(SKIPPED, 0)} / 失敗 {counts.get(FAILED, 0)}")
+    if counts.get(FAILED):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    with run_report('build'):
+        main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import sys
+import glob
+import difflib
+import argparse
+
+from subtitle_cues import parse_srt, parse_ass, seconds_to_srt_time, seconds_to_ass_time
+from ffmpeg_runner import probe_duration
+from split_video import find_manifests, load_manifest, manifest_path
+from workspace import atomic_output
+from run_report import run_report, stage
+
+# 分割位置付近とみなす範囲（秒）
+BOUNDARY_WINDOW = 1.5
+# 分割位置で途切れた文を結合する最大の隙間（秒）
+MERGE_GAP = 0.8
+# 結合後の最大の長さ（秒）と文字数
+MAX_MERGED_DURATION = 10.0
+MAX_MERGED_CHARS = 60
+# 重複とみなす本文の類似度
+DUPLICATE_RATIO = 0.8
+
+SENTENCE_ENDINGS = ('。', '！', '？', '!', '?', '.', '」', '』')
+PART_PATTERN = re.compile(r'^(?P<base>.+)_part(?P<index>\d{2,})$')
+NORMALIZE_PATTERN = re.compile(r'[\s、。，．,.!?！？「」『』・…ー～〜\-_]')
+
+SUBTITLE_SUFFIXES = {
+    'srt': '_editable.srt',
+    'ass': '_styled.ass',
+}
+
+def normalize_name(name):
+    """ファイル名比較用（字幕生成時に除外・短縮される記号を無視する）"""
+    return ''.join(c for c in name if c.isalnum())
+
+def normalize_text(text):
+    """本文比較用（空白・句読点・ASSタグ・マーカーを除く）"""
+    text = re.sub(r'\{[^}]*\}', '', text)
+    text = text.replace('¥¥¥', '').replace('\\N', '')
+    return NORMALIZE_PATTERN.sub('', text)
+
+def find_part_subtitle(subtitle_dir, part_base, suffix):
+    """分割パートに対応する字幕ファイルを探す
+
+    字幕生成時にファイル名の記号が除かれる・短くなることがあるため、
+    完全一致がなければ記号を無視した前方一致で探す。
+    """
+    exact = os.path.join(subtitle_dir, part_base + suffix)
+    if os.path.exists(exact):
+        return exact
+    part_key = normalize_name(part_base)
+    for path in sorted(glob.glob(os.path.join(glob.escape(subtitle_dir), f"*{suffix}"))):
+        key = normalize_name(os.path.basename(path)[:-len(suffix)])
+        if key and part_key.startswith(key) and key.endswith(normalize_name(part_base[-6:])):
+            return path
+    return None
+
+def resolve_parts(base_name, video_dir, subtitle_dir, suffix, segment_length):
+    """各パートの字幕ファイルと、元動画での実際の開始時刻を決める
+
+    優先順: 分割マニフェスト → 分割動画の長さ（ffprobe）の累積 → パート番号 × 分割時間
+    """
+    path = manifest_path(video_dir, base_name)
+    if os.path.exists(path):
+        manifest = load_manifest(path)
+        print(f"📋 分割マニフェスト: {path}")
+        parts = [(os.path.splitext(part['file'])[0], part['start'], part['end']) for part in manifest['parts']]
+    else:
+        videos = sorted(glob.glob(os.path.join(glob.escape(video_dir), f"{glob.escape(base_name)}_part[0-9][0-9]*.mp4")))
+        if videos:
+            print(f"🔍 マニフェストがないため分割動画の長さから開始時刻を計算（{len(videos)}個）")
+            parts = []
+            offset = 0.0
+            for video in videos:
+                duration = probe_duration(video)
+                parts.append((os.path.splitext(os.path.basename(video))[0], offset, offset + duration))
+                offset += duration
+        else:
+            print(f"⚠️ 分割動画もないため パート番号 × {segment_length}秒 で開始時刻を計算します")
+            parts = []
+            for path in sorted(glob.glob(os.path.join(glob.escape(subtitle_dir), f"*_part[0-9][0-9]*{suffix}"))):
+                match = PART_PATTERN.match(os.path.basename(path)[:-len(suffix)])
+                if match and normalize_name(base_name).startswith(normalize_name(match.group('base'))):
+                    index = int(match.group('index'))
+                    parts.append((f"{base_name}_part{match.group('index')}", index * segment_length,
+                                  (index + 1) * segment_length))
+            parts.sort(key=lambda part: part[1])
+
+    resolved = []
+    for part_base, start, end in parts:
+        subtitle = find_part_subtitle(subtitle_dir, part_base, suffix)
+        if subtitle is None:
+            print(f"  ⚠️ 字幕が見つかりません: {part_base}{suffix}")
+            continue
+        resolved.append({'subtitle': subtitle, 'start': start, 'end': end})
+    return resolved
+
+def is_duplicate(previous, current):
+    """分割位置の前後で同じ発話が二重に認識されているか"""
+    a, b = normalize_text(previous['text']), normalize_text(current['text'])
+    if not a or not b:
+        return False
+    if a in b or b in a:
+        return True
+    return difflib.SequenceMatcher(None, a, b).ratio() >= DUPLICATE_RATIO
+
+def join_text(first, second):
+    if first and second and first[-1].isascii() and first[-1].isalnum() and second[0].isascii() and second[0].isalnum():
+        return first + ' ' + second
+    return first + second
+
+def reconcile_boundary(previous, current, boundary):
+    """分割位置をまたぐ2つのキューを調整
+
+    戻り値: (previous を置き換えるキュー, 'keep' / 'merged' / 'deduplicated')
+    'keep' 以外は current を previous に取り込んだので書き出さない。
+    """
+    near_boundary = (previous['end'] >= boundary - BOUNDARY_WINDOW
+                     and current['start'] <= boundary + BOUNDARY_WINDOW)
+    if not near_boundary:
+        return previous, 'keep'
+
+    # 同じ発話が両方のパートで認識されている → 長い方の本文で1つにまとめる
+    if current['start'] <= previous['end'] + MERGE_GAP and is_duplicate(previous, current):
+        text = current['text'] if len(normalize_text(current['text'])) > len(normalize_text(previous['text'])) \
+            else previous['text']
+        merged = dict(previous, end=max(previous['end'], current['end']), text=text)
+        return merged, 'deduplicated'
+
+    # 文の途中で切れている → 1つのキューに結合
+    text = join_text(previous['text'].rstrip(), current['text'].lstrip())
+    if (current['start'] - previous['end'] <= MERGE_GAP
+            and not previous['text'].rstrip().endswith(SENTENCE_ENDINGS)
+            and current['end'] - previous['start'] <= MAX_MERGED_DURATION
+            and len(normalize_text(text)) <= MAX_MERGED_CHARS):
+        return dict(previous, end=current['end'], text=text), 'merged'
+
+    # 別々のキューとして残す（重なりだけ解消）
+    if previous['end'] > current['start']:
+        previous = dict(previous, end=max(previous['start'], current['start']))
+    return previous, 'keep'
+
+class CueWriter:
+    """キューを1つずつ書き出す（SRTは番号を振り直し、ASSは最初のパートのヘッダーを使う）"""
+
+    def __init__(self, f, subtitle_format):
+        self.f = f
+        self.format = subtitle_format
+        self.count = 0
+        self.header_written = False
+
+    def write_header(self, content):
+        if self.format == 'ass' and not self.header_written:
+            header = content.split('\n[Events]', 1)[0]
+            self.f.write(header.rstrip('\n') + '\n\n[Events]\n')
+            self.f.write('Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n')
+        self.header_written = True
+
+    def write(self, cue):
+        self.count += 1
+        if self.format == 'ass':
+            fields = cue.get('fields') or ['Default', '', '0', '0', '0', '']
+            self.f.write(f"Dialogue: {cue.get('layer', '0')},{seconds_to_ass_time(cue['start'])},"
+                         f"{seconds_to_ass_time(cue['end'])},{','.join(fields)},{cue['text']}\n")
+        else:
+            if self.count > 1:
+                self.f.write('\n')
+            self.f.write(f"{self.count}\n{seconds_to_srt_time(cue['start'])} --> "
+                         f"{seconds_to_srt_time(cue['end'])}\n{cue['text']}\n")
+
+def combine_parts(parts, output_path, subtitle_format):
+    """パートを順に1つずつ読み、実際の開始時刻でずらして1つの字幕に書き出す
+
+    読み込むのは常に1パート分で、分割位置をまたぐ可能性のある直前のキューだけを保留する。
+    """
+    stats = {'cues': 0, 'merged': 0, 'deduplicated': 0}
+    with atomic_output(output_path) as output:
+        with open(output.path, 'w', encoding='utf-8') as f:
+            writer = CueWriter(f, subtitle_format)
+            pending = None
+            for part in parts:
+                with open(part['subtitle'], 'r', encoding='utf-8') as subtitle_file:
+                    content = subtitle_file.read()
+                writer.write_header(content)
+                cues = parse_ass(content) if subtitle_format == 'ass' else parse_srt(content)
+                print(f"  📝 {os.path.basename(part['subtitle'])}: {len(cues)}個 (+{part['start']:.3f}秒)")
+
+                for index, cue in enumerate(cues):
+                    cue = dict(cue, start=cue['start'] + part['start'], end=cue['end'] + part['start'])
+                    # パートの長さを超えた分は切る（次のパートと重複するため）
+                    if part['end'] and cue['start'] < part['end'] < cue['end']:
+                        cue['end'] = part['end']
+                    if pending is not None and index == 0:
+                        pending, action = reconcile_boundary(pending, cue, part['start'])
+                        if action != 'keep':
+                            stats[action] += 1
+                            continue
+                    if pending is not None:
+                        writer.write(pending)
+                    pending = cue
+            if pending is not None:
+                writer.write(pending)
+        stats['cues'] = writer.count
+        output.commit()
+    return stats
+
+def detect_base_names(video_dir, subtitle_dir):
+    """分割元のベース名を自動検出（マニフェスト優先）"""
+    names = list(find_manifests(video_dir))
+    if names:
+        return names
+    found = []
+    for path in sorted(glob.glob(os.path.join(glob.escape(subtitle_dir), '*_part00_editable.srt'))):
+        found.append(os.path.basename(path)[:-len('_part00_editable.srt')])
+    return found
+
+def combine_split_subtitles(base_name, video_dir='split/videos', subtitle_dir='split/output', output_dir='output',
+                            segment_length=600, formats=('srt',)):
+    """分割字幕を統合"""
+    print(f"🔗 分割字幕ファイルを統合中")
+    print(f"📝 ベース名: {base_name}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    created = []
+    for subtitle_format in formats:
+        suffix = SUBTITLE_SUFFIXES[subtitle_format]
+        parts = resolve_parts(base_name, video_dir, subtitle_dir, suffix, segment_length)
+        if not parts:
+            print(f"❌ 分割{subtitle_format.upper()}ファイルが見つかりません: {subtitle_dir}/{base_name}_part*{suffix}")
+            continue
+
+        output_path = os.path.join(output_dir, f"{base_name}_merged{suffix}")
+        with stage('combine', file=os.path.basename(output_path)) as entry:
+            stats = combine_parts(parts, output_path, subtitle_format)
+            entry.update(stats, parts=len(parts))
+        print(f"✅ 統合完了: {output_path}")
+        print(f"  📊 {stats['cues']}個の字幕ブロック (境界で結合 {stats['merged']} / 重複除去 {stats['deduplicated']})")
+        created.append(output_path)
+    return created
+
+def parse_arguments():
+    """引数解析"""
+    parser = argparse.ArgumentParser(description='分割字幕を実際の開始時刻で統合（分割位置の重複・途切れを調整）')
+    parser.add_argument('base_name', nargs='?', help='分割元のベース名（省略時は自動検出）')
+    parser.add_argument('segment_length', nargs='?', type=float, default=None,
+                        help='分割時間（秒）マニフェストも分割動画もない場合だけ使用')
+    parser.add_argument('--segment-length', dest='segment_length_option', type=float, help='分割時間（秒）')
+    parser.add_argument('--video-dir', default='split/videos', help='分割動画とマニフェストのディレクトリ')
+    parser.add_argument('--subtitle-dir', default='split/output', help='分割字幕のディレクトリ')
+    parser.add_argument('--output-dir', default='output', help='統合字幕の出力先')
+    parser.add_argument('--format', choices=['srt', 'ass', 'both'], default='srt', help='統合する字幕形式')
+    return parser.parse_args()
+
+def main():
+    """メイン処理"""
+    args = parse_arguments()
+    segment_length = args.segment_length_option or args.segment_length or 600
+    formats = ('srt', 'ass') if args.format == 'both' else (args.format,)
+
+    base_names = [args.base_name] if args.base_name else detect_base_names(args.video_dir, args.subtitle_dir)
+    if not base_names:
+        print(f"❌ 分割字幕が見つかりません: {args.subtitle_dir}")
+        print("📝 まず ./split_workflow.sh generate を実行してください")
+        sys.exit(1)
+
+    created = []
+    for base_name in base_names:
+        created.extend(combine_split_subtitles(base_name, args.video_dir, args.subtitle_dir, args.output_dir,
+                                               segment_length, formats))
+        print("")
+
+    if not created:
+        sys.exit(1)
+
+    print("📋 次のステップ:")
+    print(f"  1. nano {created[0]}  # 必要に応じて編集")
+    print("  2. ./marker_workflow.sh process --size 32 --color yellow --bold")
+    print("  3. ./marker_workflow.sh apply --size 32 --color yellow --bold")
+
+if __name__ == "__main__":
+    with run_report('combine_split'):
+        main()
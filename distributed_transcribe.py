@@ -0,0 +1,554 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import socket
+import secrets
+import argparse
+import threading
+import subprocess
+
+from workspace import atomic_output
+from split_video import split_video
+from run_report import run_report, stage
+from metrics import add_metrics_arguments, start_metrics_server
+
+# 共有ディレクトリ（NFSなど、全ホストから同じ内容が見える場所）
+# <共有>/<ジョブ名>/
+#   job.json              コーディネーターが書くジョブ定義（パートの一覧と文字起こしの設定）
+#   videos/               分割動画と分割マニフェスト
+#   claims/<パート>.lock  取得中のワーカー（O_EXCL で作成、mtime がハートビート）
+#   results/              各パートの字幕
+#   done/<パート>.json    完了マーカー（結果を配置した後に作る）
+#   failures/<パート>.json 失敗・再取得の履歴
+DEFAULT_SHARED_DIR = os.environ.get('DISTRIBUTED_DIR', 'split/distributed')
+JOB_FILE = 'job.json'
+
+# ハートビートの間隔と、更新が止まった取得を無効とみなすまでの時間（秒）
+HEARTBEAT_INTERVAL = 30.0
+STALE_AFTER = float(os.environ.get('DISTRIBUTED_STALE_AFTER', '300'))
+MAX_ATTEMPTS = 3
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def read_json(path):
+    """JSONを読む（ないか書き込み途中なら None）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_json(path, data):
+    with atomic_output(path) as output:
+        with open(output.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        output.commit()
+
+class SharedJob:
+    """共有ディレクトリ上の1つの分散文字起こしジョブ
+
+    パートの取得は claims/<パート>.lock を O_CREAT|O_EXCL で作れたワーカーが勝つ
+    （NFSv3以降でもアトミック）。取得中のワーカーはロックの mtime を定期的に更新し、
+    更新が STALE_AFTER 秒止まったロックは別のワーカーやコーディネーターが回収する。
+    時刻はホストの時計ではなく共有ディレクトリ上のファイルの mtime 同士で比べるので、
+    ホスト間の時計のずれの影響を受けない。
+    """
+
+    def __init__(self, job_dir):
+        self.job_dir = job_dir
+        self.name = os.path.basename(os.path.normpath(job_dir))
+        self.claims_dir = os.path.join(job_dir, 'claims')
+        self.results_dir = os.path.join(job_dir, 'results')
+        self.done_dir = os.path.join(job_dir, 'done')
+        self.failures_dir = os.path.join(job_dir, 'failures')
+        self.video_dir = os.path.join(job_dir, 'videos')
+        self._definition = None
+
+    @property
+    def definition(self):
+        if self._definition is None:
+            self._definition = read_json(os.path.join(self.job_dir, JOB_FILE))
+        return self._definition
+
+    def exists(self):
+        return self.definition is not None
+
+    @property
+    def parts(self):
+        return self.definition['parts']
+
+    @property
+    def max_attempts(self):
+        return self.definition.get('max_attempts', MAX_ATTEMPTS)
+
+    def create(self, definition):
+        for directory in (self.claims_dir, self.results_dir, self.done_dir, self.failures_dir):
+            os.makedirs(directory, exist_ok=True)
+        write_json(os.path.join(self.job_dir, JOB_FILE), definition)
+        self._definition = definition
+
+    # ------------------------------------------------------------ 状態
+
+    def claim_path(self, part_name):
+        return os.path.join(self.claims_dir, f"{part_name}.lock")
+
+    def is_done(self, part_name):
+        return os.path.exists(os.path.join(self.done_dir, f"{part_name}.json"))
+
+    def failures(self, part_name):
+        return read_json(os.path.join(self.failures_dir, f"{part_name}.json")) or []
+
+    def is_exhausted(self, part_name):
+        return not self.is_done(part_name) and len(self.failures(part_name)) >= self.max_attempts
+
+    def shared_now(self):
+        """共有ディレクトリのサーバー時刻（ファイルを touch して mtime を読む）"""
+        path = os.path.join(self.claims_dir, '.clock')
+        with open(path, 'a'):
+            pass
+        os.utime(path, None)
+        return os.stat(path).st_mtime
+
+    def status(self):
+        """{'done': [...], 'running': [...], 'pending': [...], 'failed': [...]}"""
+        status = {'done': [], 'running': [], 'pending': [], 'failed': []}
+        for part in self.parts:
+            name = part['name']
+            if self.is_done(name):
+                status['done'].append(name)
+            elif os.path.exists(self.claim_path(name)):
+                status['running'].append(name)
+            elif self.is_exhausted(name):
+                status['failed'].append(name)
+            else:
+                status['pending'].append(name)
+        return status
+
+    def is_finished(self):
+        return all(self.is_done(part['name']) or self.is_exhausted(part['name']) for part in self.parts)
+
+    # ------------------------------------------------------------ 取得・ハートビート・回収
+
+    def try_claim(self, part_name, worker):
+        """パートを取得（成功ならトークン、他のワーカーが取得済みなら None）"""
+        token = secrets.token_hex(8)
+        try:
+            fd = os.open(self.claim_path(part_name), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'token': token, 'worker': worker, 'claimed': time.time()}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        # 取得中に別のワーカーが完了させていた場合は手放す
+        if self.is_done(part_name):
+            self.release(part_name, token)
+            return None
+        return token
+
+    def claim_owner(self, part_name):
+        return read_json(self.claim_path(part_name)) or {}
+
+    def owns(self, part_name, token):
+        return self.claim_owner(part_name).get('token') == token
+
+    def heartbeat(self, part_name):
+        try:
+            os.utime(self.claim_path(part_name), None)
+        except FileNotFoundError:
+            pass
+
+    def release(self, part_name, token):
+        if self.owns(part_name, token):
+            try:
+                os.remove(self.claim_path(part_name))
+            except FileNotFoundError:
+                pass
+
+    def reclaim_if_stale(self, part_name, reclaimer):
+        """ハートビートが止まったロックを回収（回収したら True）
+
+        ロックを一意な名前に rename して奪い合いを1人に絞る。rename の直前に別のワーカーが
+        新しく取得していた場合は、中身のトークンと rename 後の mtime を確かめて元の名前に戻す
+        （最初の stat と owner の読み込みの間に解放・再取得されると、トークンだけでは区別できない）。
+        """
+        path = self.claim_path(part_name)
+        try:
+            age = self.shared_now() - os.stat(path).st_mtime
+        except FileNotFoundError:
+            return False
+        if age < STALE_AFTER:
+            return False
+
+        owner = self.claim_owner(part_name)
+        stale_path = f"{path}.stale_{secrets.token_hex(4)}"
+        try:
+            os.rename(path, stale_path)
+        except FileNotFoundError:
+            return False
+        taken = read_json(stale_path) or {}
+        try:
+            age = self.shared_now() - os.stat(stale_path).st_mtime
+        except FileNotFoundError:
+            return False
+        if taken.get('token') != owner.get('token') or age < STALE_AFTER:
+            try:
+                os.link(stale_path, path)
+            except FileExistsError:
+                pass
+            os.remove(stale_path)
+            return False
+        os.remove(stale_path)
+
+        print(f"♻️ [{reclaimer}] 応答のない取得を回収: {part_name}（{taken.get('worker', '?')}、{age:.0f}秒更新なし）")
+        self.record_failure(part_name, taken.get('worker'), f"ハートビートが{age:.0f}秒停止")
+        return True
+
+    def record_failure(self, part_name, worker, error):
+        path = os.path.join(self.failures_dir, f"{part_name}.json")
+        failures = self.failures(part_name)
+        failures.append({'worker': worker, 'error': error, 'time': time.time()})
+        write_json(path, failures)
+
+    # ------------------------------------------------------------ 結果
+
+    def staging_dir(self, token):
+        path = os.path.join(self.results_dir, f".staging_{token}")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def publish(self, part_name, token, staging_dir, info):
+        """作業ディレクトリの結果を results/ に置き換えで配置し、完了マーカーを作る"""
+        for filename in os.listdir(staging_dir):
+            os.replace(os.path.join(staging_dir, filename), os.path.join(self.results_dir, filename))
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        write_json(os.path.join(self.done_dir, f"{part_name}.json"), info)
+        self.release(part_name, token)
+
+def find_jobs(shared_dir, job_name=None):
+    if job_name:
+        return [SharedJob(os.path.join(shared_dir, job_name))]
+    if not os.path.isdir(shared_dir):
+        return []
+    jobs = [SharedJob(os.path.join(shared_dir, name)) for name in sorted(os.listdir(shared_dir))]
+    return [job for job in jobs if job.exists()]
+
+# ---------------------------------------------------------------- ワーカー
+
+class Heartbeat:
+    """処理中にロックの mtime を更新し続けるスレッド"""
+
+    def __init__(self, job, part_name, token):
+        self.job = job
+        self.part_name = part_name
+        self.token = token
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            if not self.job.owns(self.part_name, self.token):
+                self.lost = True
+                return
+            self.job.heartbeat(self.part_name)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def transcribe_part(job, part, token, worker, models):
+    """取得したパートを文字起こしして結果を配置"""
+    # whisper はワーカーだけに必要（コーディネーターだけのホストでは読み込まない）
+    from video_to_text_with_custom_styles import parse_arguments, load_model, transcribe_video, write_outputs
+
+    definition = job.definition
+    args = parse_arguments(['--model', definition['model'], '--format', definition['format'],
+                            '--output-dir', job.results_dir] + definition.get('transcribe_args', []))
+    if args.model not in models:
+        with stage('model_load', model=args.model):
+            models[args.model] = load_model(args.model)
+
+    name = part['name']
+    video_path = os.path.join(job.job_dir, part['file'])
+    print(f"🎬 [{worker}] {job.name}/{name} 文字起こし開始 ({part['duration']:.0f}秒)")
+    started = time.time()
+    staging_dir = job.staging_dir(token)
+    try:
+        with Heartbeat(job, name, token) as heartbeat:
+            with stage('transcribe', file=f"{job.name}/{name}") as entry:
+                entry['audio_seconds'] = part['duration']
+                cues = transcribe_video(models[args.model], video_path, args.normalize)
+                entry['cues'] = len(cues)
+            with stage('write', file=f"{job.name}/{name}"):
+                write_outputs(cues, name, args, staging_dir)
+        if heartbeat.lost or not job.owns(name, token):
+            print(f"⚠️ [{worker}] {name} は別のワーカーに回収されたため結果を破棄します")
+            return False
+        job.publish(name, token, staging_dir, {
+            'worker': worker,
+            'cues': len(cues),
+            'elapsed': round(time.time() - started, 3),
+            'finished': time.time(),
+        })
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    print(f"✅ [{worker}] {job.name}/{name} 完了 ({len(cues)}個, {time.time() - started:.1f}秒)")
+    return True
+
+def claim_next(job, worker):
+    """未完了のパートを1つ取得（応答のないワーカーの取得は回収してから取得）"""
+    for part in job.parts:
+        name = part['name']
+        if job.is_done(name) or job.is_exhausted(name):
+            continue
+        token = job.try_claim(name, worker)
+        if token is None and job.reclaim_if_stale(name, worker):
+            token = job.try_claim(name, worker)
+        if token is not None:
+            return part, token
+    return None, None
+
+def run_worker(shared_dir, job_name=None, wait=False, poll_interval=10.0):
+    """パートを取得しては文字起こしする（どのホストからでも何台でも起動できる）
+
+    取得できるパートがなくても未完了のジョブがあれば待機し、他のワーカーが止まった場合は
+    そのパートを回収して引き継ぐ。全ジョブが終わったら終了（wait=True なら新しいジョブを待つ）。
+    実行レポートはパートごとに1つ保存する（常駐しても段階がたまり続けない）。
+    """
+    worker = worker_name()
+    models = {}
+    print(f"👷 分散ワーカー起動: {worker}")
+    print(f"📁 共有ディレクトリ: {shared_dir}")
+    processed = 0
+    while True:
+        unfinished = False
+        for job in find_jobs(shared_dir, job_name):
+            if not job.exists() or job.is_finished():
+                continue
+            unfinished = True
+            part, token = claim_next(job, worker)
+            if part is None:
+                continue
+            try:
+                with run_report('distributed_transcribe_worker'):
+                    if transcribe_part(job, part, token, worker, models):
+                        processed += 1
+            except KeyboardInterrupt:
+                # 回収を待たずに他のワーカーが引き継げるように手放す
+                job.release(part['name'], token)
+                raise
+            except Exception as e:
+                print(f"❌ [{worker}] {job.name}/{part['name']} エラー: {e}")
+                job.record_failure(part['name'], worker, str(e))
+                job.release(part['name'], token)
+            break
+        else:
+            if not unfinished and not wait:
+                print(f"🎉 [{worker}] 処理できるパートがなくなりました（{processed}個処理）")
+                return processed
+            time.sleep(poll_interval)
+
+# ---------------------------------------------------------------- コーディネーター
+
+def prepare_job(shared_dir, input_video, segment_length, snap, model, subtitle_format, transcribe_args,
+                job_name=None, max_attempts=MAX_ATTEMPTS):
+    """動画を共有ディレクトリに分割し、ジョブ定義を書く（同じ動画のジョブがあれば再利用）"""
+    base_name = os.path.splitext(os.path.basename(input_video))[0]
+    job = SharedJob(os.path.join(shared_dir, job_name or base_name))
+    source = os.path.abspath(input_video)
+    if job.exists() and job.definition.get('source') == source:
+        status = job.status()
+        print(f"♻️ 既存のジョブを再開: {job.name}（完了 {len(status['done'])}/{len(job.parts)}）")
+        return job
+
+    manifest = split_video(input_video, segment_length, job.video_dir, snap)
+    if manifest is None:
+        return None
+
+    job.create({
+        'name': job.name,
+        'base_name': base_name,
+        'source': source,
+        'created': time.time(),
+        'segment_length': segment_length,
+        'model': model,
+        'format': subtitle_format,
+        'transcribe_args': transcribe_args,
+        'max_attempts': max_attempts,
+        'parts': [{
+            'name': os.path.splitext(part['file'])[0],
+            # ホストごとにマウント先が違っても使えるようジョブディレクトリからの相対パス
+            'file': os.path.join('videos', part['file']),
+            'start': part['start'],
+            'duration': part['duration'],
+        } for part in manifest['parts']],
+    })
+    print(f"📋 ジョブ作成: {job.job_dir}（{len(job.parts)}パート）")
+    return job
+
+def print_status(job):
+    status = job.status()
+    print(f"📊 {job.name}: 完了 {len(status['done'])}/{len(job.parts)}  処理中 {len(status['running'])}"
+          f"  待機 {len(status['pending'])}  失敗 {len(status['failed'])}")
+    for name in status['running']:
+        owner = job.claim_owner(name)
+        print(f"  ⏳ {name}: {owner.get('worker', '?')}")
+    for name in status['failed']:
+        last = job.failures(name)[-1]
+        print(f"  ❌ {name}: {last.get('worker')} - {last.get('error')}")
+    return status
+
+def wait_for_job(job, poll_interval=10.0):
+    """全パートの完了を待つ（応答のないワーカーの取得はコーディネーターも回収する）"""
+    coordinator = f"coordinator@{worker_name()}"
+    last = None
+    while True:
+        for part in job.parts:
+            if not job.is_done(part['name']):
+                job.reclaim_if_stale(part['name'], coordinator)
+        status = job.status()
+        summary = tuple(len(status[key]) for key in ('done', 'running', 'pending', 'failed'))
+        if summary != last:
+            print_status(job)
+            last = summary
+        if job.is_finished():
+            return not status['failed']
+        time.sleep(poll_interval)
+
+def merge_job(job, output_dir):
+    """全パートの字幕を分割マニフェストの開始時刻で統合"""
+    from combine_split import combine_split_subtitles
+
+    definition = job.definition
+    formats = ('srt', 'ass') if definition['format'] in ('ass', 'both') else ('srt',)
+    return combine_split_subtitles(definition['base_name'], job.video_dir, job.results_dir, output_dir,
+                                   definition['segment_length'], formats)
+
+def start_local_worker(shared_dir, job_name):
+    cmd = [sys.executable, '-u', os.path.join(SCRIPT_DIR, 'distributed_transcribe.py'),
+           '--shared-dir', shared_dir, 'worker', '--job', job_name]
+    return subprocess.Popen(cmd)
+
+def coordinate(args, transcribe_args):
+    job = prepare_job(args.shared_dir, args.input_video, args.segment_length, args.snap, args.model,
+                      args.format, transcribe_args, args.job, args.max_attempts)
+    if job is None:
+        return False
+
+    print("")
+    print("📋 他のホストでワーカーを起動:")
+    print(f"  python3 distributed_transcribe.py --shared-dir {args.shared_dir} worker")
+    if args.no_wait:
+        return True
+
+    local_worker = start_local_worker(args.shared_dir, job.name) if args.work else None
+    try:
+        succeeded = wait_for_job(job, args.poll_interval)
+    finally:
+        if local_worker is not None:
+            local_worker.wait()
+
+    if not succeeded:
+        print(f"❌ 失敗したパートがあります（{job.failures_dir}）")
+        return False
+    print("\n🔗 全パート完了 - 字幕を統合します")
+    return bool(merge_job(job, args.output_dir))
+
+def parse_arguments():
+    """引数解析"""
+    parser = argparse.ArgumentParser(description='共有ディレクトリを使った複数ホストでの分散文字起こし')
+    parser.add_argument('--shared-dir', default=DEFAULT_SHARED_DIR, help='全ホストから見える共有ディレクトリ')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    coordinator = sub.add_parser('coordinate', help='動画を分割してジョブを作り、完了を待って統合（-- 以降は文字起こしの引数）')
+    coordinator.add_argument('input_video', help='入力動画ファイル')
+    coordinator.add_argument('segment_length', nargs='?', type=float, default=300, help='分割時間（秒、デフォルト: 300）')
+    coordinator.add_argument('--job', help='ジョブ名（デフォルト: 動画のベース名）')
+    coordinator.add_argument('--snap', choices=['keyframe', 'silence'], default='silence', help='分割位置の決め方')
+    coordinator.add_argument('--model', default='base', help='Whisperモデル')
+    coordinator.add_argument('--format', choices=['ass', 'srt', 'both'], default='both', help='字幕形式')
+    coordinator.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS, help='パートごとの最大試行回数')
+    coordinator.add_argument('--output-dir', default='output', help='統合字幕の出力先')
+    coordinator.add_argument('--work', action='store_true', help='このホストでもワーカーを1つ動かす')
+    coordinator.add_argument('--no-wait', action='store_true', help='ジョブを作るだけで終了（後で merge を実行）')
+    coordinator.add_argument('--poll-interval', type=float, default=10.0, help='状態確認の間隔（秒）')
+
+    worker = sub.add_parser('worker', help='パートを取得して文字起こしするワーカー')
+    worker.add_argument('--job', help='処理するジョブ名（省略時は全ジョブ）')
+    worker.add_argument('--wait', action='store_true', help='ジョブがなくなっても終了せず新しいジョブを待つ')
+    worker.add_argument('--poll-interval', type=float, default=10.0, help='待機中の確認間隔（秒）')
+    add_metrics_arguments(worker)
+
+    status = sub.add_parser('status', help='ジョブの進捗を表示')
+    status.add_argument('--job', help='ジョブ名（省略時は全ジョブ）')
+
+    merge = sub.add_parser('merge', help='完了したジョブの字幕を統合')
+    merge.add_argument('job', help='ジョブ名')
+    merge.add_argument('--output-dir', default='output', help='統合字幕の出力先')
+
+    # -- 以降は video_to_text_with_custom_styles.py の引数として各ワーカーに渡す
+    argv = sys.argv[1:]
+    transcribe_args = []
+    if '--' in argv:
+        transcribe_args = argv[argv.index('--') + 1:]
+        argv = argv[:argv.index('--')]
+    return parser.parse_args(argv), transcribe_args
+
+def main():
+    """メイン処理"""
+    args, transcribe_args = parse_arguments()
+
+    if args.command == 'worker':
+        # 常駐するワーカーはパートごとにレポートを保存し、SIGTERM も Ctrl+C と同じく終了処理をする
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        start_metrics_server(args.metrics_port, args.metrics_host, shared_dir=args.shared_dir)
+        try:
+            run_worker(args.shared_dir, args.job, args.wait, args.poll_interval)
+        except KeyboardInterrupt:
+            print("\n👋 ワーカーを終了します")
+        return
+
+    with run_report('distributed_transcribe'):
+        run_command(args, transcribe_args)
+
+def run_command(args, transcribe_args):
+    """ワーカー以外のサブコマンドを実行"""
+    if args.command == 'coordinate':
+        if not coordinate(args, transcribe_args):
+            sys.exit(1)
+    elif args.command == 'status':
+        jobs = find_jobs(args.shared_dir, args.job)
+        if not jobs or not jobs[0].exists():
+            print(f"📭 ジョブがありません: {args.shared_dir}")
+        for job in jobs:
+            print_status(job)
+    elif args.command == 'merge':
+        job = SharedJob(os.path.join(args.shared_dir, args.job))
+        if not job.exists():
+            raise SystemExit(f"❌ ジョブが見つかりません: {job.job_dir}")
+        status = job.status()
+        if len(status['done']) != len(job.parts):
+            print_status(job)
+            raise SystemExit("❌ 未完了のパートがあります")
+        if not merge_job(job, args.output_dir):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
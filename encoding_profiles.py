@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+from ffmpeg_runner import run_ffmpeg, probe_duration
+from workspace import input_path
+
+# 名前付きエンコードプロファイル
+ENCODING_PROFILES = {
+    'preview': {'preset': 'ultrafast', 'crf': 30},   # クライアント確認用の速度優先
+    'standard': {'preset': 'medium', 'crf': 23},     # 従来の設定
+    'archive': {'preset': 'slow', 'crf': 18},        # 納品・保存用の画質優先
+}
+
+DEFAULT_PROFILE = 'standard'
+
+# deadlineモードで試すpreset（画質の高い順）とCRF（画質の高い順）
+CANDIDATE_PRESETS = ['slower', 'slow', 'medium', 'fast', 'faster', 'veryfast', 'superfast', 'ultrafast']
+CANDIDATE_CRFS = [18, 20, 23, 26, 28, 30, 32]
+
+# 試し打ちするサンプル数と1サンプルの長さ（秒）
+PROBE_SAMPLES = 3
+PROBE_SAMPLE_LENGTH = 4.0
+
+# 見積もりに掛ける安全係数
+SAFETY_FACTOR = 1.15
+
+# 試しエンコードに使ってよい時間（目標時間に対する割合）と回数の上限
+PROBE_TIME_RATIO = 0.2
+PROBE_MAX_ENCODES = 6
+
+def encoder_args(preset, crf):
+    """preset/CRFからFFmpegのエンコード引数を作成（オーディオはコピー）"""
+    return ['-c:a', 'copy', '-c:v', 'libx264', '-preset', preset, '-crf', str(crf)]
+
+def profile_encoder_args(name):
+    """プロファイル名からエンコード引数を作成"""
+    if name not in ENCODING_PROFILES:
+        raise ValueError(f"不明なエンコードプロファイル: {name} (選択肢: {', '.join(ENCODING_PROFILES)})")
+    profile = ENCODING_PROFILES[name]
+    return encoder_args(profile['preset'], profile['crf'])
+
+def parse_encoding_args(argv=None):
+    """コマンドライン引数からエンコード設定を解析
+
+    --encoding-profile NAME / --target-time 秒 / --target-size MB
+    target指定があればdeadlineモードになる。
+    """
+    args = sys.argv[1:] if argv is None else argv
+    options = {'profile': DEFAULT_PROFILE, 'target_time': None, 'target_size': None}
+    i = 0
+    while i < len(args):
+        if args[i] == '--encoding-profile' and i + 1 < len(args):
+            options['profile'] = args[i + 1]
+            i += 2
+        elif args[i] == '--target-time' and i + 1 < len(args):
+            options['target_time'] = float(args[i + 1])
+            i += 2
+        elif args[i] == '--target-size' and i + 1 < len(args):
+            options['target_size'] = float(args[i + 1])
+            i += 2
+        else:
+            i += 1
+
+    if options['profile'] not in ENCODING_PROFILES:
+        raise ValueError(f"不明なエンコードプロファイル: {options['profile']} (選択肢: {', '.join(ENCODING_PROFILES)})")
+    return options
+
+def is_deadline_mode(options):
+    """目標時間・目標サイズが指定されているか"""
+    return bool(options and (options.get('target_time') or options.get('target_size')))
+
+def encoding_key(options):
+    """キャッシュ・差分判定用のエンコード設定の識別子
+
+    プロファイル指定時は実際の引数、deadlineモードでは目標値そのものを使う
+    （試し打ちの結果は実行ごとに揺れるため）。
+    """
+    options = options or {'profile': DEFAULT_PROFILE}
+    if is_deadline_mode(options):
+        return ['deadline', options.get('target_time'), options.get('target_size')]
+    return profile_encoder_args(options.get('profile', DEFAULT_PROFILE))
+
+def probe_encode(video_path, video_filter, preset, crf, duration, threads=None):
+    """サンプル区間を試しエンコードし、速度と1秒あたりのバイト数を測定
+
+    戻り値: (速度[動画秒/実時間秒], ビデオの1秒あたりバイト数)
+    """
+    sample_length = min(PROBE_SAMPLE_LENGTH, duration / PROBE_SAMPLES)
+    media_seconds = 0.0
+    wall_seconds = 0.0
+    total_bytes = 0
+
+    with tempfile.TemporaryDirectory(prefix='probe_encode_') as work_dir:
+        for index in range(PROBE_SAMPLES):
+            start = duration * (index + 0.5) / PROBE_SAMPLES - sample_length / 2
+            sample_path = os.path.join(work_dir, f"sample_{index}.mp4")
+            cmd = [
+                'ffmpeg', '-y', '-v', 'error',
+                '-ss', f"{max(0.0, start):.3f}",
+                '-t', f"{sample_length:.3f}",
+                '-copyts',
+                '-i', input_path(video_path),
+                '-map', '0:v:0',
+                '-vf', f"{video_filter},setpts=PTS-STARTPTS",
+                '-c:v', 'libx264', '-preset', preset, '-crf', str(crf),
+            ] + thread_args(threads) + [
+                sample_path
+            ]
+            started = time.time()
+            result = run_ffmpeg(cmd, quiet=True)
+            wall_seconds += time.time() - started
+            if result.returncode != 0:
+                raise RuntimeError(f"試しエンコード失敗: {result.stderr}")
+            media_seconds += sample_length
+            total_bytes += os.path.getsize(sample_path)
+
+    return media_seconds / max(wall_seconds, 1e-6), total_bytes / media_seconds
+
+def probe_audio_bitrate(video_path):
+    """オーディオのビットレート（bps）を取得（コピーされるので見積もりに加算する）"""
+    cmd = ['ffprobe', '-v', 'error', '-select_streams', 'a:0',
+           '-show_entries', 'stream=bit_rate', '-of', 'csv=p=0', video_path]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return 0.0
+
+def choose_deadline_settings(video_path, video_filter, target_time=None, target_size=None, threads=None):
+    """試しエンコードの結果から目標時間・目標サイズを満たすpreset/CRFを選ぶ
+
+    presetは目標時間を満たす中で最も画質の高いもの、CRFは目標サイズを満たす
+    中で最も画質の高いものを選ぶ。満たせない場合は最速・最小の設定にする。
+    候補は速度・サイズの順に並んでいるので二分探索で調べ、試しエンコードは
+    PROBE_MAX_ENCODES 回・目標時間の PROBE_TIME_RATIO までに抑える。試しエンコードに
+    かかった時間は目標時間から差し引いて判定する。
+    戻り値: (エンコード引数, 判断内容の辞書)
+    """
+    probe_started = time.time()
+    duration = probe_duration(video_path)
+    audio_bytes = probe_audio_bitrate(video_path) / 8 * duration
+    measurements = []
+    probe_budget = target_time * PROBE_TIME_RATIO if target_time else None
+    stopped = []
+
+    def probe_seconds():
+        return time.time() - probe_started
+
+    def can_probe():
+        """試しエンコードをもう1回できるか（回数・時間の上限）"""
+        if len(measurements) >= PROBE_MAX_ENCODES:
+            reason = f"試しエンコードの回数上限（{PROBE_MAX_ENCODES}回）"
+        elif probe_budget is not None and probe_seconds() >= probe_budget:
+            reason = f"試しエンコードの時間上限（{probe_budget:.0f}秒）"
+        else:
+            return True
+        if reason not in stopped:
+            stopped.append(reason)
+            print(f"    ⚠️ {reason}に達したため探索を打ち切り")
+        return False
+
+    def measure(preset, crf):
+        speed, bytes_per_second = probe_encode(video_path, video_filter, preset, crf, duration, threads)
+        estimate = {
+            'preset': preset,
+            'crf': crf,
+            'speed': round(speed, 3),
+            'estimated_time': round(duration / speed * SAFETY_FACTOR, 1),
+            'estimated_size': int(bytes_per_second * duration * SAFETY_FACTOR + audio_bytes),
+        }
+        measurements.append(estimate)
+        print(f"    🧪 preset={preset} crf={crf}: speed={speed:.2f}x "
+              f"予想時間={estimate['estimated_time']:.0f}秒 予想サイズ={estimate['estimated_size'] / (1024*1024):.1f}MB")
+        return estimate
+
+    def search(candidates, fits):
+        """fits を満たす最初の候補を二分探索（候補は後ろほど満たしやすい順）
+
+        探索を打ち切った場合・どれも満たさない場合は最後の候補（最速・最小）。
+        """
+        low, high = 0, len(candidates) - 1
+        chosen = len(candidates) - 1
+        while low <= high:
+            if not can_probe():
+                # 確かめられていない候補は使わない（満たすと分かっている候補か最後の候補）
+                break
+            middle = (low + high) // 2
+            if fits(candidates[middle]):
+                chosen = middle
+                high = middle - 1
+            else:
+                low = middle + 1
+        return candidates[chosen]
+
+    print(f"  ⏱️ deadlineモード: 目標時間={target_time or '-'}秒 目標サイズ={target_size or '-'}MB")
+
+    # presetの決定（目標時間 - 試しエンコードにかかった時間）
+    preset = ENCODING_PROFILES[DEFAULT_PROFILE]['preset']
+    crf = ENCODING_PROFILES[DEFAULT_PROFILE]['crf']
+    if target_time:
+        preset = search(CANDIDATE_PRESETS,
+                        lambda candidate: measure(candidate, crf)['estimated_time'] <= target_time - probe_seconds())
+
+    # CRFの決定（目標サイズ）
+    if target_size:
+        target_bytes = target_size * 1024 * 1024
+        crf = search(CANDIDATE_CRFS, lambda candidate: measure(preset, candidate)['estimated_size'] <= target_bytes)
+
+    decision = {
+        'mode': 'deadline',
+        'target_time': target_time,
+        'target_size_mb': target_size,
+        'duration': duration,
+        'preset': preset,
+        'crf': crf,
+        'probe_seconds': round(probe_seconds(), 1),
+        'probe_encodes': len(measurements),
+        'probe_limits': {'max_encodes': PROBE_MAX_ENCODES,
+                         'max_seconds': round(probe_budget, 1) if probe_budget is not None else None},
+        'measurements': measurements,
+    }
+    if target_time:
+        # 本番のエンコードに残っている時間
+        decision['remaining_time'] = round(target_time - probe_seconds(), 1)
+    if stopped:
+        decision['search_stopped'] = stopped
+    print(f"  ✅ 選択: preset={preset} crf={crf}（試しエンコード {len(measurements)}回 {probe_seconds():.1f}秒）")
+    return encoder_args(preset, crf), decision
+
+def thread_args(threads):
+    """エンコーダのスレッド数指定（未指定ならFFmpegに任せる）"""
+    return ['-threads', str(threads)] if threads else []
+
+def resolve_encoder_args(video_path, video_filter, options):
+    """エンコード設定を実際のFFmpeg引数に解決
+
+    options['threads'] があればエンコーダのスレッド数を制限する（並列レンダリング用）。
+    スレッド数はキャッシュキー（encoding_key）には含めない。
+    戻り値: (エンコード引数, 判断内容の辞書)
+    """
+    options = options or {'profile': DEFAULT_PROFILE}
+    threads = options.get('threads')
+    if is_deadline_mode(options):
+        args, decision = choose_deadline_settings(video_path, video_filter,
+                                                  options.get('target_time'), options.get('target_size'), threads)
+    else:
+        name = options.get('profile', DEFAULT_PROFILE)
+        profile = ENCODING_PROFILES[name]
+        args, decision = profile_encoder_args(name), {'mode': 'profile', 'profile': name,
+                                                      'preset': profile['preset'], 'crf': profile['crf']}
+    if threads:
+        decision['threads'] = threads
+    return args + thread_args(threads), decision
+
+def write_encoding_log(output_path, decision, encoder, elapsed=None):
+    """選んだエンコード設定を出力ファイルの隣に記録（<出力>.encode.json）"""
+    log = dict(decision, encoder=encoder, output=os.path.basename(output_path))
+    if elapsed is not None:
+        log['elapsed'] = round(elapsed, 1)
+    with open(f"{output_path}.encode.json", 'w', encoding='utf-8') as f:
+        json.dump(log, f, ensure_ascii=False, indent=2)
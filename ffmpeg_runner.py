@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import time
+import threading
+import subprocess
+from collections import deque
+
+from run_report import record_ffmpeg
+from profiling import ffmpeg_benchmark_enabled, parse_ffmpeg_benchmark, record_ffmpeg_benchmark
+
+# 進捗が止まってから強制終了するまでの秒数（環境変数で上書き可能）
+DEFAULT_STALL_TIMEOUT = float(os.environ.get('FFMPEG_STALL_TIMEOUT', '300'))
+
+# 進捗を表示する間隔（秒）
+PROGRESS_INTERVAL = float(os.environ.get('FFMPEG_PROGRESS_INTERVAL', '5'))
+
+# 診断用に保持するstderrの行数
+STDERR_TAIL_LINES = 200
+
+DURATION_PATTERN = re.compile(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)')
+
+class FFmpegResult:
+    """FFmpeg実行結果（subprocess.CompletedProcess と同じ returncode / stderr を持つ）"""
+
+    def __init__(self, returncode, stderr_tail, stats, stalled=False):
+        self.returncode = returncode
+        self.stderr_lines = list(stderr_tail)
+        self.stats = stats
+        self.stalled = stalled
+
+    @property
+    def stderr(self):
+        """保持しているstderr末尾の行"""
+        return '\n'.join(self.stderr_lines)
+
+def format_seconds(seconds):
+    """秒を H:MM:SS 形式に変換"""
+    seconds = max(0, int(seconds))
+    return f"{seconds // 3600}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+def parse_out_time(value):
+    """-progress の out_time（HH:MM:SS.ffffff）を秒に変換"""
+    try:
+        hours, minutes, seconds = value.split(':')
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except ValueError:
+        return None
+
+def with_progress_args(cmd, benchmark=False):
+    """ffmpegコマンドに -progress pipe:1 -nostats を差し込む
+
+    benchmark=True なら -benchmark も付ける。結果は info レベルで出るので -v error などは info に上げる。
+    """
+    if not benchmark:
+        return [cmd[0], '-progress', 'pipe:1', '-nostats'] + list(cmd[1:])
+    args = list(cmd[1:])
+    for index, arg in enumerate(args[:-1]):
+        if arg in ('-v', '-loglevel'):
+            args[index + 1] = 'info'
+    return [cmd[0], '-progress', 'pipe:1', '-nostats', '-benchmark'] + args
+
+def run_ffmpeg(cmd, label=None, duration=None, stall_timeout=None, quiet=False, cwd=None):
+    """FFmpegを実行し、進捗を逐次表示する
+
+    -progress pipe:1 の出力を1行ずつ読み、fps・速度・処理位置・残り時間を表示する。
+    stderrは末尾の一定行数だけをリングバッファに保持する。
+    進捗が stall_timeout 秒進まなければプロセスを強制終了する。
+    duration を省略した場合は stderr の "Duration:" から取得する。
+    """
+    stall_timeout = DEFAULT_STALL_TIMEOUT if stall_timeout is None else stall_timeout
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    stats = {'frame': 0, 'fps': 0.0, 'speed': None, 'out_time': 0.0, 'elapsed': 0.0, 'duration': duration}
+    benchmark = {} if ffmpeg_benchmark_enabled() else None
+    state = {'last_progress': time.time(), 'last_report': 0.0}
+    started = time.time()
+
+    process = subprocess.Popen(
+        with_progress_args(cmd, benchmark is not None),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors='replace',
+        cwd=cwd,
+    )
+
+    def read_stderr():
+        for line in process.stderr:
+            line = line.rstrip()
+            if benchmark is not None and parse_ffmpeg_benchmark(line, benchmark):
+                continue
+            stderr_tail.append(line)
+            if stats['duration'] is None:
+                match = DURATION_PATTERN.search(line)
+                if match:
+                    hours, minutes, seconds = match.groups()
+                    stats['duration'] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    def read_progress():
+        block = {}
+        for line in process.stdout:
+            key, _, value = line.strip().partition('=')
+            block[key] = value
+            if key != 'progress':
+                continue
+            update_stats(block)
+            block = {}
+
+    def update_stats(block):
+        out_time = parse_out_time(block.get('out_time', ''))
+        if out_time is not None and out_time > stats['out_time']:
+            stats['out_time'] = out_time
+            state['last_progress'] = time.time()
+        try:
+            stats['frame'] = int(block.get('frame', stats['frame']))
+            stats['fps'] = float(block.get('fps', stats['fps']))
+        except ValueError:
+            pass
+        speed = block.get('speed', '').rstrip('x')
+        if speed and speed != 'N/A':
+            try:
+                stats['speed'] = float(speed)
+            except ValueError:
+                pass
+        now = time.time()
+        if not quiet and (block.get('progress') == 'end' or now - state['last_report'] >= PROGRESS_INTERVAL):
+            state['last_report'] = now
+            print(progress_line(label, stats), flush=True)
+
+    threads = [threading.Thread(target=read_stderr, daemon=True),
+               threading.Thread(target=read_progress, daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    stalled = False
+    while True:
+        try:
+            process.wait(timeout=1.0)
+            break
+        except subprocess.TimeoutExpired:
+            if stall_timeout and time.time() - state['last_progress'] > stall_timeout:
+                stalled = True
+                print(f"  ⏰ FFmpegの進捗が{stall_timeout:.0f}秒止まったため強制終了します", flush=True)
+                process.kill()
+                process.wait()
+                break
+
+    for thread in threads:
+        thread.join(timeout=5)
+
+    stats['elapsed'] = time.time() - started
+    if benchmark:
+        stats['benchmark'] = benchmark
+        record_ffmpeg_benchmark(label, benchmark)
+    record_ffmpeg(label, stats)
+    return FFmpegResult(process.returncode, stderr_tail, stats, stalled)
+
+def probe_duration(path):
+    """ffprobeで動画の長さ（秒）を取得"""
+    cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', path]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe失敗: {result.stderr.strip()}")
+    return float(result.stdout.strip())
+
+def progress_line(label, stats):
+    """進捗表示用の1行を作成"""
+    parts = [f"    ⏳ {label}" if label else "    ⏳"]
+    duration = stats.get('duration')
+    if duration:
+        parts.append(f"{min(100.0, stats['out_time'] / duration * 100):5.1f}%")
+    parts.append(format_seconds(stats['out_time']))
+    parts.append(f"fps={stats['fps']:.1f}")
+    if stats.get('speed'):
+        parts.append(f"speed={stats['speed']:.2f}x")
+        if duration:
+            remaining = (duration - stats['out_time']) / stats['speed']
+            parts.append(f"ETA {format_seconds(remaining)}")
+    return ' '.join(parts)
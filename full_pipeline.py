@@ -1,67 +1,234 @@
 import os
-import subprocess
 import sys
+import time
 import shlex
+import shutil
+import argparse
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
-def full_subtitle_pipeline(style_args=""):
-    """動画→字幕生成→合成の全自動パイプライン"""
-    
-    print("🚀 全自動字幕パイプライン開始")
-    print("=" * 50)
-    
-    # Phase 1: 動画から字幕生成
-    print("\n📍 Phase 1: 動画から字幕を生成")
-    
-    cmd = ["python", "video_to_text_with_custom_styles.py"]
-    
-    # 引数が文字列の場合は適切に分割
-    if isinstance(style_args, str) and style_args:
+from video_to_text_with_custom_styles import (build_parser, load_model, transcribe_video, write_outputs,
+                                              find_video_files, build_srt_content, build_ass_content)
+from subtitle_index import safe_base_name
+from apply_subtitles import merge_subtitle_with_ffmpeg
+from encoding_profiles import ENCODING_PROFILES, DEFAULT_PROFILE
+from workspace import make_work_dir
+from run_report import run_report, stage as report_stage, probe_media_seconds
+
+class StageTimer:
+    """ステージごとの所要時間を集計（レンダリングワーカーからも呼ばれるのでロック付き）
+
+    実行レポート（run_report）にも同じ名前の段階として記録する。
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, file=None):
+        started = time.time()
+        try:
+            with report_stage(name, file=file) as entry:
+                yield entry
+        finally:
+            elapsed = time.time() - started
+            with self._lock:
+                self.totals[name] = self.totals.get(name, 0.0) + elapsed
+                self.counts[name] = self.counts.get(name, 0) + 1
+
+    def report(self):
+        """ステージ別の時間と実経過時間を表示"""
+        total = sum(self.totals.values())
+        wall = time.time() - self.started
+        print(f"\n⏱️ ステージ別時間（合計 {total:.1f}秒 / 経過 {wall:.1f}秒）:")
+        for name, seconds in self.totals.items():
+            share = seconds / total * 100 if total else 0.0
+            print(f"  {name:<12} {seconds:8.1f}秒 ({share:4.1f}%)  x{self.counts[name]}")
+        if total > wall:
+            print(f"  🔀 並列化で短縮: {total - wall:.1f}秒")
+
+def parse_arguments(argv=None):
+    """引数解析（字幕生成の引数 + パイプライン用の引数）"""
+    parser = argparse.ArgumentParser(
+        description='動画→字幕生成→合成を1プロセスで実行',
+        parents=[build_parser(add_help=False)]
+    )
+    parser.add_argument('--merged-dir', default='/merged_videos', help='字幕付き動画の出力ディレクトリ')
+    parser.add_argument('--no-artifacts', action='store_true',
+                        help='SRT/ASS/テキストを出力ディレクトリに残さない（合成用の字幕は一時ディレクトリに作成）')
+    parser.add_argument('--encoding-profile', default=DEFAULT_PROFILE, choices=list(ENCODING_PROFILES),
+                        help='エンコードプロファイル (preview, standard, archive)')
+    parser.add_argument('--target-time', type=float, help='目標エンコード時間（秒）')
+    parser.add_argument('--target-size', type=float, help='目標ファイルサイズ（MB）')
+    parser.add_argument('--no-cache', action='store_true', help='レンダーキャッシュを使わない')
+    parser.add_argument('--incremental', action='store_true', help='前回の出力から変わったGOPだけを再エンコード')
+
+    # 並列化（文字起こしとレンダリングを重ねて実行）
+    parser.add_argument('--render-workers', type=int, default=0,
+                        help='レンダリングワーカー数（1以上で文字起こしと並行して合成、0で逐次実行）')
+    parser.add_argument('--render-threads', type=int, help='レンダリング1本あたりのエンコーダスレッド数')
+    parser.add_argument('--transcribe-threads', type=int, help='文字起こし（torch）に使うスレッド数')
+    return parser.parse_args(argv)
+
+def split_style_args(style_args):
+    """文字列・リストで渡された引数をリストに変換"""
+    if isinstance(style_args, str):
         try:
             # shlex.split を使ってクォートを考慮して分割
-            parsed_args = shlex.split(style_args)
-            cmd.extend(parsed_args)
+            return shlex.split(style_args)
         except ValueError as e:
             print(f"⚠️ 引数解析エラー: {e}")
             print(f"元の引数: {style_args}")
             # フォールバック: 単純分割
-            cmd.extend(style_args.split())
-    elif isinstance(style_args, list):
-        cmd.extend(style_args)
-    
-    print(f"🔧 実行コマンド: {' '.join(cmd)}")
-    
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    if result.returncode != 0:
-        print("❌ Phase 1 失敗")
-        print("STDOUT:", result.stdout)
-        print("STDERR:", result.stderr)
+            return style_args.split()
+    return list(style_args or [])
+
+def write_render_subtitle(cues, base_name, args, work_dir):
+    """合成に使う字幕だけを一時ディレクトリに書き出す（--no-artifacts 時）"""
+    if args.format in ['ass', 'both']:
+        path = os.path.join(work_dir, f"{base_name}_styled.ass")
+        content = build_ass_content(cues, args, base_name)
+    else:
+        path = os.path.join(work_dir, f"{base_name}_editable.srt")
+        content = build_srt_content(cues)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return path
+
+def set_transcribe_threads(threads):
+    """torchの演算スレッド数を設定（レンダリング用のコアを空けるため）"""
+    import torch
+    torch.set_num_threads(threads)
+    print(f"🧵 文字起こしスレッド数: {threads}")
+
+def render_video(video_path, subtitle_path, args, encoding_options, timer):
+    """Phase 2: 字幕を動画に合成（生成したASSのスタイルをそのまま使用）"""
+    video_base = os.path.splitext(os.path.basename(video_path))[0]
+    subtitle_base = os.path.splitext(os.path.basename(subtitle_path))[0]
+    output_path = os.path.join(args.merged_dir, f"{video_base}_{subtitle_base}_merged.mp4")
+
+    print(f"📍 Phase 2: 字幕を動画に合成 ({os.path.basename(video_path)})")
+    with timer.stage('render', os.path.basename(video_path)):
+        success = merge_subtitle_with_ffmpeg(
+            video_path, subtitle_path, output_path, {}, False,
+            source_subtitle=None if args.no_artifacts else subtitle_path,
+            encoding_options=encoding_options
+        )
+
+    if success:
+        print(f"  ✅ 成功: {os.path.basename(output_path)}")
+    else:
+        print(f"  ❌ 失敗: {os.path.basename(output_path)}")
+    return success
+
+def wait_render(result):
+    """レンダリングワーカーの結果を取得（例外は失敗として扱う）"""
+    if not hasattr(result, 'result'):
+        return result
+    try:
+        return result.result()
+    except Exception as e:
+        print(f"  ❌ レンダリングエラー: {e}")
         return False
-    
-    print("✅ Phase 1 完了: 字幕ファイル生成")
-    if result.stdout:
-        print("Phase 1 出力:")
-        print(result.stdout)
-    
-    # Phase 2: 字幕を動画に合成
-    print("\n📍 Phase 2: 字幕を動画に合成")
-    
-    result = subprocess.run(["python", "apply_subtitles.py"], capture_output=True, text=True)
-    
-    if result.returncode != 0:
-        print("❌ Phase 2 失敗")
-        print("STDOUT:", result.stdout)
-        print("STDERR:", result.stderr)
+
+def full_subtitle_pipeline(style_args=""):
+    """動画→字幕生成→合成の全自動パイプライン
+
+    字幕生成と合成を同じプロセスで関数として呼び出し、Whisperモデルの読み込みは
+    1回だけにする。認識結果のキューはメモリ上でそのまま合成ステージに渡す。
+    --render-workers を指定すると、文字起こしが終わった動画から順にレンダリング
+    ワーカーへ渡し、次の動画の文字起こしと並行して合成する。
+    """
+
+    args = parse_arguments(split_style_args(style_args))
+    timer = StageTimer()
+
+    print("🚀 全自動字幕パイプライン開始")
+    print("=" * 50)
+    print(f"📁 入力: {args.input_dir}")
+    print(f"📁 字幕出力: {args.output_dir}{'（保存しない）' if args.no_artifacts else ''}")
+    print(f"📁 動画出力: {args.merged_dir}")
+
+    if not os.path.exists(args.input_dir):
+        print(f"❌ 入力ディレクトリが見つかりません: {args.input_dir}")
         return False
-    
-    print("✅ Phase 2 完了: 字幕付き動画生成")
-    if result.stdout:
-        print("Phase 2 出力:")
-        print(result.stdout)
-    
-    print("\n🎉 全パイプライン完了!")
-    
-    return True
+
+    video_files = find_video_files(args.input_dir)
+    if not video_files:
+        print("❌ 動画ファイルが見つかりません")
+        return False
+
+    os.makedirs(args.merged_dir, exist_ok=True)
+    if not args.no_artifacts:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    encoding_options = {
+        'profile': args.encoding_profile,
+        'target_time': args.target_time,
+        'target_size': args.target_size,
+        'threads': args.render_threads,
+    }
+
+    if args.transcribe_threads:
+        set_transcribe_threads(args.transcribe_threads)
+
+    # Phase 1 の準備: モデルは1回だけ読み込む
+    with timer.stage('model'):
+        model = load_model(args.model)
+
+    work_dir = make_work_dir('full_pipeline_')
+    executor = None
+    if args.render_workers > 0:
+        print(f"🔀 パイプライン実行: レンダリングワーカー {args.render_workers}")
+        executor = ThreadPoolExecutor(max_workers=args.render_workers)
+    results = []
+    try:
+        for filename in video_files:
+            video_path = os.path.join(args.input_dir, filename)
+            base_name = safe_base_name(os.path.splitext(filename)[0])
+
+            print(f"\n🎬 処理中: {filename}")
+
+            try:
+                # Phase 1: 音声認識（キューはメモリ上に保持）
+                print("📍 Phase 1: 動画から字幕を生成")
+                with timer.stage('transcribe', filename) as entry:
+                    entry['audio_seconds'] = probe_media_seconds(video_path)
+                    cues = transcribe_video(model, video_path, args.normalize)
+
+                with timer.stage('subtitles', filename):
+                    if args.no_artifacts:
+                        subtitle_path = write_render_subtitle(cues, base_name, args, work_dir)
+                    else:
+                        paths = write_outputs(cues, base_name, args)
+                        subtitle_path = paths.get('ass', paths['srt'])
+
+                if executor:
+                    # 文字起こしが終わったものから順にレンダリングへ回す
+                    results.append(executor.submit(render_video, video_path, subtitle_path, args, encoding_options, timer))
+                    print(f"  📤 レンダリング待ちに追加")
+                else:
+                    results.append(render_video(video_path, subtitle_path, args, encoding_options, timer))
+            except Exception as e:
+                print(f"  ❌ エラー ({filename}): {e}")
+                results.append(False)
+
+        if executor:
+            results = [wait_render(result) for result in results]
+    finally:
+        if executor:
+            executor.shutdown(wait=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    processed = sum(1 for result in results if result is True)
+    timer.report()
+    print(f"\n🎉 全パイプライン完了! ({processed}/{len(video_files)})")
+
+    return processed == len(video_files)
 
 if __name__ == "__main__":
     # コマンドライン引数をスタイル設定として使用
@@ -71,12 +238,13 @@ if __name__ == "__main__":
         print(f"🎨 スタイル設定: {' '.join(style_args)}")
     else:
         style_args = []
-    
-    success = full_subtitle_pipeline(style_args)
-    
+
+    with run_report('full_pipeline'):
+        success = full_subtitle_pipeline(style_args)
+
     if success:
         print("\n📁 出力ファイルを確認してください:")
         print("  - 字幕ファイル: ./output/")
         print("  - 字幕付き動画: ./merged_videos/")
     else:
-        print("\n❌ パイプライン処理に失敗しました")
+        sys.exit(1)
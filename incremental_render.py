@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import shutil
+import subprocess
+
+from subtitle_cues import load_cues, changed_time_ranges, merge_time_ranges
+from ffmpeg_runner import run_ffmpeg, probe_duration
+from workspace import atomic_output, make_work_dir, input_path
+
+# キュー境界の丸め誤差を吸収するための余白（秒）
+CUE_MARGIN = 0.05
+
+# セグメント分割時にキーフレーム時刻の丸め誤差を吸収する値（秒）
+KEYFRAME_EPSILON = 0.001
+
+def incremental_enabled():
+    """差分再レンダリングが有効かどうか（--incremental または INCREMENTAL_RENDER=1）"""
+    if '--incremental' in sys.argv[1:]:
+        return True
+    return os.environ.get('INCREMENTAL_RENDER', '0').lower() in ('1', 'true', 'yes', 'on')
+
+def probe_keyframes(video_path):
+    """ffprobeでビデオストリームのキーフレーム時刻（秒）と長さを取得
+
+    パケットのフラグだけを読むのでデコードは発生しない。
+    """
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        video_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe失敗: {result.stderr.strip()}")
+
+    keyframes = []
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) >= 2 and 'K' in parts[1] and parts[0] not in ('', 'N/A'):
+            keyframes.append(float(parts[0]))
+
+    return sorted(set(keyframes)), probe_duration(video_path)
+
+def snap_to_gops(ranges, keyframes, duration):
+    """変更範囲をGOP境界（キーフレーム）まで広げて重なりを結合"""
+    spans = []
+    for start, end in ranges:
+        gop_start = max([kf for kf in keyframes if kf <= start] or [0.0])
+        later = [kf for kf in keyframes if kf > end]
+        gop_end = later[0] if later else duration
+        spans.append((gop_start, gop_end))
+    return merge_time_ranges(spans)
+
+def split_previous_output(previous_output, boundaries, work_dir):
+    """前回出力のビデオをキーフレーム境界で1パス分割（ストリームコピー）"""
+    pattern = os.path.join(work_dir, 'prev_%04d.mp4')
+    cmd = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-i', input_path(previous_output),
+        '-map', '0:v:0',
+        '-c', 'copy',
+        '-f', 'segment',
+        '-segment_times', ','.join(f"{max(0.0, t - KEYFRAME_EPSILON):.6f}" for t in boundaries),
+        '-reset_timestamps', '1',
+        pattern
+    ]
+    result = run_ffmpeg(cmd, quiet=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"前回出力の分割失敗: {result.stderr.strip()}")
+    return [os.path.join(work_dir, 'prev_%04d.mp4' % i) for i in range(len(boundaries) + 1)]
+
+def encode_span(video_path, video_filter, start, end, output_path, encoder_args, is_last):
+    """元動画の指定GOP範囲だけを字幕付きで再エンコード（ビデオのみ）"""
+    cmd = ['ffmpeg', '-y', '-v', 'error', '-ss', f"{start:.6f}"]
+    if not is_last:
+        cmd += ['-t', f"{end - start:.6f}"]
+    cmd += [
+        '-copyts',
+        '-i', input_path(video_path),
+        '-map', '0:v:0',
+        '-vf', f"{video_filter},setpts=PTS-STARTPTS",
+    ] + video_encoder_args(encoder_args) + [output_path]
+    result = run_ffmpeg(cmd, label=os.path.basename(output_path), duration=None if is_last else end - start)
+    if result.returncode != 0:
+        raise RuntimeError(f"再エンコード失敗 ({start:.2f}s-{end:.2f}s): {result.stderr.strip()}")
+
+def video_encoder_args(encoder_args):
+    """エンコード設定からオーディオ関連の指定を除いたもの"""
+    args = []
+    skip = False
+    for value in encoder_args:
+        if skip:
+            skip = False
+            continue
+        if value.startswith('-c:a') or value.startswith('-b:a'):
+            skip = True
+            continue
+        args.append(value)
+    return args
+
+def incremental_rerender(video_path, video_filter, encoder_args, previous_output,
+                         old_subtitle, new_subtitle, output_path):
+    """前回出力のうち字幕が変わったGOPだけを再エンコードして差し替える
+
+    変わっていないGOPは前回出力からストリームコピーし、concatで結合する。
+    エンコード設定・フィルタ・元動画が前回と同じであることは呼び出し側で確認する。
+    戻り値: 再エンコードした秒数（変更なしなら0.0）
+    """
+    ranges = changed_time_ranges(load_cues(old_subtitle), load_cues(new_subtitle))
+    ranges = merge_time_ranges(ranges, padding=CUE_MARGIN)
+
+    if not ranges:
+        print(f"  ✅ 字幕の変更なし - 前回の出力をそのまま使用")
+        if os.path.abspath(previous_output) != os.path.abspath(output_path):
+            with atomic_output(output_path) as output:
+                shutil.copy2(previous_output, output.path)
+                output.commit()
+        return 0.0
+
+    keyframes, duration = probe_keyframes(previous_output)
+    spans = snap_to_gops(ranges, keyframes, duration)
+
+    encoded_seconds = sum(end - start for start, end in spans)
+    print(f"  🧩 差分再エンコード: {len(spans)}区間 / {encoded_seconds:.1f}秒 (全体 {duration:.1f}秒)")
+
+    # 分割境界（0と終端を除く）
+    boundaries = sorted({t for span in spans for t in span if 0.0 < t < duration})
+    edges = [0.0] + boundaries + [duration]
+
+    work_dir = make_work_dir('incremental_render_')
+    try:
+        previous_segments = split_previous_output(previous_output, boundaries, work_dir)
+
+        segment_paths = []
+        for index, (start, end) in enumerate(zip(edges[:-1], edges[1:])):
+            if any(span_start <= start < span_end for span_start, span_end in spans):
+                encoded_path = os.path.join(work_dir, f"new_{index:04d}.mp4")
+                print(f"    🔄 {start:.2f}s - {end:.2f}s を再エンコード")
+                encode_span(video_path, video_filter, start, end, encoded_path, encoder_args,
+                            is_last=(index == len(edges) - 2))
+                segment_paths.append(encoded_path)
+            else:
+                segment_paths.append(previous_segments[index])
+
+        concat_list = os.path.join(work_dir, 'concat.txt')
+        with open(concat_list, 'w', encoding='utf-8') as f:
+            for segment_path in segment_paths:
+                f.write(f"file '{segment_path}'\n")
+
+        # 結合したビデオに前回出力のオーディオをそのまま付ける
+        # 出力先の隣の一時ファイルに書いて置き換える（キャッシュとハードリンクされていても中身は書き換えない）
+        with atomic_output(output_path) as output:
+            cmd = [
+                'ffmpeg', '-y', '-v', 'error',
+                '-f', 'concat', '-safe', '0', '-i', concat_list,
+                '-i', input_path(previous_output),
+                '-map', '0:v:0', '-map', '1:a?',
+                '-c', 'copy',
+                '-movflags', '+faststart',
+                output.path
+            ]
+            result = run_ffmpeg(cmd, quiet=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"結合失敗: {result.stderr.strip()}")
+            output.commit()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return encoded_seconds
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import sqlite3
+import argparse
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+import multiprocessing
+from contextlib import closing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from metrics import add_metrics_arguments, create_registry, send_metrics, start_metrics_server
+
+# キュー設定（環境変数で上書き可能）
+DEFAULT_DB_PATH = os.environ.get('JOB_QUEUE_DB', '.job_queue.sqlite')
+DEFAULT_LOG_DIR = os.environ.get('JOB_QUEUE_LOG_DIR', '.job_logs')
+DEFAULT_HOST = os.environ.get('JOB_QUEUE_HOST', '127.0.0.1')
+DEFAULT_PORT = int(os.environ.get('JOB_QUEUE_PORT', '8765'))
+
+# ワーカーのハートビート間隔と、途絶えたとみなすまでの秒数
+HEARTBEAT_INTERVAL = 5.0
+STALE_AFTER = float(os.environ.get('JOB_QUEUE_STALE_AFTER', '60'))
+
+# ジョブの状態
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+# ジョブ種別と実行するスクリプト（既存のエントリポイントをそのまま使う）
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+JOB_TYPES = {
+    'transcribe': 'video_to_text_with_custom_styles.py',
+    'process': 'process_markers.py',
+    'apply': 'apply_subtitles.py',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    args TEXT NOT NULL,
+    state TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 1,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    progress TEXT,
+    error TEXT,
+    returncode INTEGER,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (state, priority DESC, id);
+"""
+
+class JobQueue:
+    """SQLiteに保存するジョブキュー（複数プロセスから同時に使える）"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or DEFAULT_DB_PATH
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def submit(self, job_type, args, priority=0, max_attempts=1):
+        """ジョブを登録してIDを返す"""
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"不明なジョブ種別: {job_type} (選択肢: {', '.join(JOB_TYPES)})")
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                'INSERT INTO jobs (type, args, state, priority, max_attempts, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_type, json.dumps(list(args), ensure_ascii=False), QUEUED, priority, max(1, max_attempts), time.time())
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker):
+        """優先度の高い順に1件取り出して running にする（BEGIN IMMEDIATE で排他）
+
+        ハートビートが途絶えた running のジョブは先に queued へ戻す（試行回数を使い切っていれば failed）。
+        """
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            now = time.time()
+            # ワーカーごと落ちるジョブ（OOMなど）を無限に再投入しないよう、試行回数の上限も見る
+            conn.execute(
+                'UPDATE jobs SET worker = NULL, '
+                'state = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END, '
+                'error = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END, '
+                'finished_at = CASE WHEN attempts >= max_attempts THEN ? ELSE finished_at END '
+                'WHERE state = ? AND heartbeat_at < ?',
+                (FAILED, QUEUED, 'ワーカー応答なし（試行回数の上限）', 'ワーカー応答なしのため再投入', now,
+                 RUNNING, now - STALE_AFTER)
+            )
+            row = conn.execute(
+                'SELECT * FROM jobs WHERE state = ? AND cancel_requested = 0 ORDER BY priority DESC, id LIMIT 1',
+                (QUEUED,)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute(
+                'UPDATE jobs SET state = ?, worker = ?, attempts = attempts + 1, started_at = ?, heartbeat_at = ?, '
+                'progress = NULL WHERE id = ?',
+                (RUNNING, worker, now, now, row['id'])
+            )
+            conn.execute('COMMIT')
+            return self.get(row['id'])
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat(self, job_id, progress=None):
+        """実行中であることを記録し、キャンセル要求の有無を返す"""
+        with closing(self._connect()) as conn:
+            if progress is None:
+                conn.execute('UPDATE jobs SET heartbeat_at = ? WHERE id = ?', (time.time(), job_id))
+            else:
+                conn.execute('UPDATE jobs SET heartbeat_at = ?, progress = ? WHERE id = ?',
+                             (time.time(), progress, job_id))
+            row = conn.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            return bool(row and row['cancel_requested'])
+
+    def finish(self, job_id, returncode, error=None, cancelled=False):
+        """終了を記録（失敗時は試行回数が残っていれば queued に戻す）"""
+        with closing(self._connect()) as conn:
+            job = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if cancelled:
+                state = CANCELLED
+            elif returncode == 0:
+                state = DONE
+            elif job['attempts'] < job['max_attempts']:
+                state = QUEUED
+            else:
+                state = FAILED
+            conn.execute(
+                'UPDATE jobs SET state = ?, returncode = ?, error = ?, finished_at = ?, worker = NULL WHERE id = ?',
+                (state, returncode, error, None if state == QUEUED else time.time(), job_id)
+            )
+            return state
+
+    def cancel(self, job_id):
+        """キャンセル（待機中ならすぐ、実行中ならワーカーが停止する）"""
+        with closing(self._connect()) as conn:
+            conn.execute('UPDATE jobs SET cancel_requested = 1 WHERE id = ?', (job_id,))
+            conn.execute('UPDATE jobs SET state = ?, finished_at = ? WHERE id = ? AND state = ?',
+                         (CANCELLED, time.time(), job_id, QUEUED))
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return job_to_dict(row) if row else None
+
+    def list(self, state=None, limit=50):
+        with closing(self._connect()) as conn:
+            if state:
+                rows = conn.execute('SELECT * FROM jobs WHERE state = ? ORDER BY id DESC LIMIT ?', (state, limit))
+            else:
+                rows = conn.execute('SELECT * FROM jobs ORDER BY id DESC LIMIT ?', (limit,))
+            return [job_to_dict(row) for row in rows]
+
+    def count_by_state(self):
+        """{状態: ジョブ数}（メトリクス用）"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall()
+        return {state: count for state, count in rows}
+
+def job_to_dict(row):
+    job = dict(row)
+    job['args'] = json.loads(job['args'])
+    return job
+
+def log_path(job_id, log_dir=None):
+    return os.path.join(log_dir or DEFAULT_LOG_DIR, f"job_{job_id}.log")
+
+# ---------------------------------------------------------------- ワーカー
+
+def run_job(queue, job, log_dir):
+    """ジョブのスクリプトを子プロセスで実行し、出力をログファイルに書く"""
+    cmd = [sys.executable, '-u', os.path.join(SCRIPT_DIR, JOB_TYPES[job['type']])] + job['args']
+    path = log_path(job['id'], log_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'a', encoding='utf-8') as log:
+        log.write(f"\n===== 試行 {job['attempts']}/{job['max_attempts']}: {' '.join(cmd)}\n")
+        log.flush()
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                   errors='replace', cwd=SCRIPT_DIR, start_new_session=True)
+
+        state = {'last_line': None, 'cancelled': False}
+
+        def pump_output():
+            for line in process.stdout:
+                log.write(line)
+                log.flush()
+                if line.strip():
+                    state['last_line'] = line.strip()
+
+        reader = threading.Thread(target=pump_output, daemon=True)
+        reader.start()
+
+        while process.poll() is None:
+            reader.join(timeout=HEARTBEAT_INTERVAL)
+            if queue.heartbeat(job['id'], state['last_line']) and not state['cancelled']:
+                state['cancelled'] = True
+                log.write("\n🛑 キャンセル要求により停止\n")
+                os.killpg(process.pid, signal.SIGTERM)
+        reader.join()
+
+    queue.heartbeat(job['id'], state['last_line'])
+    error = None if process.returncode == 0 else f"終了コード {process.returncode}"
+    return queue.finish(job['id'], process.returncode, error, cancelled=state['cancelled'])
+
+def worker_loop(db_path, log_dir, poll_interval=2.0, once=False):
+    """ジョブを1件ずつ取り出して実行し続ける"""
+    queue = JobQueue(db_path)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"👷 ワーカー起動: {worker}")
+    while True:
+        job = queue.claim(worker)
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        print(f"▶️ [{worker}] ジョブ {job['id']} ({job['type']}) 開始")
+        state = run_job(queue, job, log_dir)
+        print(f"⏹️ [{worker}] ジョブ {job['id']} → {state}")
+
+def run_workers(db_path, log_dir, processes, once=False):
+    """ワーカーを複数プロセスで起動"""
+    if processes <= 1:
+        worker_loop(db_path, log_dir, once=once)
+        return
+    workers = [multiprocessing.Process(target=worker_loop, args=(db_path, log_dir), kwargs={'once': once})
+               for _ in range(processes)]
+    for process in workers:
+        process.start()
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
+
+# ---------------------------------------------------------------- HTTP API
+
+class JobAPIHandler(BaseHTTPRequestHandler):
+    """ローカル用の小さなHTTP API
+
+    POST /jobs                {"type": "apply", "args": [...], "priority": 0, "max_attempts": 1}
+    GET  /jobs[?state=...]    一覧
+    GET  /jobs/<id>           状態
+    POST /jobs/<id>/cancel    キャンセル
+    GET  /jobs/<id>/log       ログをストリーミング（ジョブ終了まで送り続ける）
+    GET  /metrics             Prometheus形式のメトリクス（キューの深さ・段階ごとの時間など）
+    """
+
+    queue = None
+    log_dir = None
+    metrics = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_id(self, parts):
+        try:
+            return int(parts[1])
+        except (IndexError, ValueError):
+            return None
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        parts = [part for part in path.split('/') if part]
+        if parts == ['metrics']:
+            send_metrics(self, self.metrics)
+            return
+        if parts == ['jobs']:
+            params = dict(item.split('=', 1) for item in query.split('&') if '=' in item)
+            self._send_json(200, self.queue.list(params.get('state')))
+            return
+        job_id = self._job_id(parts)
+        job = self.queue.get(job_id) if job_id else None
+        if parts[:1] != ['jobs'] or job is None:
+            self._send_json(404, {'error': 'not found'})
+        elif len(parts) == 2:
+            self._send_json(200, job)
+        elif parts[2:] == ['log']:
+            self._stream_log(job_id)
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        parts = [part for part in self.path.split('?')[0].split('/') if part]
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': 'invalid json'})
+            return
+
+        if parts == ['jobs']:
+            try:
+                job_id = self.queue.submit(payload.get('type'), payload.get('args', []),
+                                           int(payload.get('priority', 0)), int(payload.get('max_attempts', 1)))
+            except ValueError as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            self._send_json(201, self.queue.get(job_id))
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'cancel' and self._job_id(parts):
+            job = self.queue.cancel(self._job_id(parts))
+            self._send_json(200 if job else 404, job or {'error': 'not found'})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def _stream_log(self, job_id):
+        """ログを chunked で送り、ジョブが終わったら閉じる"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        path = log_path(job_id, self.log_dir)
+        offset = 0
+        try:
+            while True:
+                finished = self.queue.get(job_id)['state'] in FINISHED_STATES
+                if os.path.exists(path):
+                    with open(path, 'rb') as f:
+                        f.seek(offset)
+                        data = f.read()
+                    if data:
+                        offset += len(data)
+                        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                        self.wfile.flush()
+                if finished:
+                    break
+                time.sleep(1.0)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+def serve(db_path, log_dir, host, port):
+    """HTTP APIを起動"""
+    JobAPIHandler.queue = JobQueue(db_path)
+    JobAPIHandler.log_dir = log_dir
+    JobAPIHandler.metrics = create_registry(queue_db=db_path)
+    server = ThreadingHTTPServer((host, port), JobAPIHandler)
+    print(f"🌐 ジョブAPI: http://{host}:{port}/jobs")
+    print(f"📈 メトリクス: http://{host}:{port}/metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+# ---------------------------------------------------------------- CLIクライアント
+
+def api_request(url, method='GET', payload=None):
+    data = None if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    request = urllib.request.Request(url, data=data, method=method, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read() or b'null')
+    except urllib.error.HTTPError as e:
+        raise SystemExit(f"❌ {e.code}: {e.read().decode('utf-8', 'replace')}")
+    except urllib.error.URLError as e:
+        raise SystemExit(f"❌ ジョブAPIに接続できません ({url}): {e.reason}")
+
+def print_job(job):
+    elapsed = ''
+    if job.get('started_at'):
+        elapsed = f" {(job.get('finished_at') or time.time()) - job['started_at']:.0f}秒"
+    print(f"  #{job['id']:<4} {job['state']:<9} {job['type']:<10} p={job['priority']:<3} "
+          f"試行 {job['attempts']}/{job['max_attempts']}{elapsed}  {' '.join(job['args'])}")
+    if job.get('progress') and job['state'] == RUNNING:
+        print(f"        {job['progress']}")
+    if job.get('error') and job['state'] != DONE:
+        print(f"        ⚠️ {job['error']}")
+
+def parse_arguments():
+    """引数解析"""
+    parser = argparse.ArgumentParser(description='字幕処理のローカルジョブキュー（SQLite + HTTP API）')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='SQLiteファイル')
+    parser.add_argument('--log-dir', default=DEFAULT_LOG_DIR, help='ジョブログの保存先')
+    parser.add_argument('--url', default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", help='ジョブAPIのURL（クライアント用）')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    server = sub.add_parser('serve', help='HTTP APIを起動')
+    server.add_argument('--host', default=DEFAULT_HOST)
+    server.add_argument('--port', type=int, default=DEFAULT_PORT)
+
+    worker = sub.add_parser('worker', help='ワーカーを起動')
+    worker.add_argument('--processes', type=int, default=1, help='ワーカープロセス数')
+    worker.add_argument('--once', action='store_true', help='キューが空になったら終了')
+    add_metrics_arguments(worker)
+
+    submit = sub.add_parser('submit', help='ジョブを登録（-- 以降はスクリプトへの引数）')
+    submit.add_argument('type', choices=list(JOB_TYPES))
+    submit.add_argument('--priority', type=int, default=0, help='大きいほど先に実行')
+    submit.add_argument('--retries', type=int, default=0, help='失敗時の再試行回数')
+    submit.add_argument('args', nargs='*', help='スクリプトへの引数（オプションは -- の後に書く）')
+
+    status = sub.add_parser('status', help='ジョブの状態を表示')
+    status.add_argument('job_id', nargs='?', type=int)
+    status.add_argument('--state', choices=[QUEUED, RUNNING, DONE, FAILED, CANCELLED])
+
+    cancel = sub.add_parser('cancel', help='ジョブをキャンセル')
+    cancel.add_argument('job_id', type=int)
+
+    logs = sub.add_parser('logs', help='ジョブのログを表示（終了まで追従）')
+    logs.add_argument('job_id', type=int)
+
+    # -- 以降はスクリプトにそのまま渡す（--size などをこちらの引数と混同しないように）
+    argv = sys.argv[1:]
+    script_args = []
+    if '--' in argv:
+        script_args = argv[argv.index('--') + 1:]
+        argv = argv[:argv.index('--')]
+    args = parser.parse_args(argv)
+    if args.command == 'submit':
+        args.args = args.args + script_args
+    return args
+
+def main():
+    """メイン処理"""
+    args = parse_arguments()
+    jobs_url = f"{args.url.rstrip('/')}/jobs"
+
+    if args.command == 'serve':
+        serve(args.db, args.log_dir, args.host, args.port)
+    elif args.command == 'worker':
+        start_metrics_server(args.metrics_port, args.metrics_host, queue_db=args.db)
+        run_workers(args.db, args.log_dir, args.processes, args.once)
+    elif args.command == 'submit':
+        job = api_request(jobs_url, 'POST', {'type': args.type, 'args': args.args,
+                                             'priority': args.priority, 'max_attempts': args.retries + 1})
+        print(f"📥 ジョブ登録: #{job['id']} ({job['type']})")
+    elif args.command == 'status':
+        if args.job_id:
+            print_job(api_request(f"{jobs_url}/{args.job_id}"))
+        else:
+            url = f"{jobs_url}?state={args.state}" if args.state else jobs_url
+            jobs = api_request(url)
+            print(f"📋 ジョブ: {len(jobs)}件")
+            for job in jobs:
+                print_job(job)
+    elif args.command == 'cancel':
+        job = api_request(f"{jobs_url}/{args.job_id}/cancel", 'POST', {})
+        print(f"🛑 キャンセル: #{job['id']} ({job['state']})")
+    elif args.command == 'logs':
+        try:
+            with urllib.request.urlopen(f"{jobs_url}/{args.job_id}/log") as response:
+                for line in response:
+                    sys.stdout.write(line.decode('utf-8', 'replace'))
+                    sys.stdout.flush()
+        except urllib.error.URLError as e:
+            raise SystemExit(f"❌ ジョブAPIに接続できません: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,11 @@ show_help() {
     echo "  3. process    - マーカーを処理してASS変換"
     echo "  4. apply      - 字幕を動画に合成"
     echo "  list          - 利用可能なファイルを表示"
+    echo "  preview       - 前回の合成から変わった箇所だけを短いクリップで確認"
+    echo "  cache         - レンダーキャッシュの確認・削除"
+    echo "  build         - 変更があった段階だけを再実行（generate → process → apply）"
+    echo "  watch         - videos/ と output/ を監視して自動で build（Ctrl+Cで終了）"
+    echo "  queue         - ジョブキューに登録・状態確認・キャンセル"
     echo ""
     echo "⚠️  重要：processとapplyで同じスタイル引数を使用してください！"
     echo ""
@@ -36,6 +41,35 @@ show_help() {
     echo "  --margin NUM       マージン (デフォルト: 40)"
     echo "  --background COLOR 背景色 (black, white, gray, none)"
     echo "  --background-alpha NUM 背景透明度 (0.0-1.0, デフォルト: 0.8)"
+    echo "  --no-cache         レンダーキャッシュを使わず必ず再エンコード"
+    echo "  --incremental      前回の出力から字幕が変わったGOPだけを再エンコード"
+    echo "  --encoding-profile NAME エンコード設定 (preview, standard, archive)"
+    echo "  --target-time SEC  目標エンコード時間（試しエンコードでpresetを自動選択）"
+    echo "  --target-size MB   目標ファイルサイズ（試しエンコードでCRFを自動選択）"
+    echo ""
+    echo "preview の使い方（applyと同じスタイル引数を指定）:"
+    echo "  ./marker_workflow.sh preview <字幕ファイル> [--video 動画] [--against 比較元字幕] [--all]"
+    echo "                               [--padding 秒] [--height 360] [スタイル引数...]"
+    echo ""
+    echo "build の使い方（processとapplyと同じスタイル引数を指定）:"
+    echo "  ./marker_workflow.sh build --size 32 --color yellow --bold            # 古くなった段階だけ実行"
+    echo "  ./marker_workflow.sh build --dry-run --size 32 --color yellow --bold  # 実行計画だけ表示"
+    echo "  ./marker_workflow.sh build -j 3 --model small ...                     # 独立した処理を並列実行"
+    echo ""
+    echo "watch の使い方（buildと同じ引数 + 監視設定）:"
+    echo "  ./marker_workflow.sh watch --size 32 --color yellow --bold"
+    echo "  ./marker_workflow.sh watch --poll --settle 10 ...   # inotifyが使えない環境・遅いアップロード"
+    echo ""
+    echo "queue の操作（先に docker-compose up -d job-queue job-worker）:"
+    echo "  ./marker_workflow.sh queue submit apply --priority 5 -- --video-dir videos --subtitle-dir marker_output --output-dir merged_videos --size 32"
+    echo "  ./marker_workflow.sh queue status [ID]       # 一覧・状態"
+    echo "  ./marker_workflow.sh queue logs ID           # 進捗を終了まで表示"
+    echo "  ./marker_workflow.sh queue cancel ID"
+    echo ""
+    echo "cache の操作:"
+    echo "  ./marker_workflow.sh cache stats              # 使用量・ヒット数"
+    echo "  ./marker_workflow.sh cache list               # エントリ一覧"
+    echo "  ./marker_workflow.sh cache purge [--older-than 日数]"
     echo ""
     echo "🏷️ マーカー記法（edit時に使用）:"
     echo "  基本: ¥¥¥マーカー¥¥¥テキスト¥¥¥"
@@ -288,6 +322,18 @@ case "$1" in
                     STYLE_ARGS="$STYLE_ARGS --background-alpha $2"
                     shift 2
                     ;;
+                --no-cache)
+                    STYLE_ARGS="$STYLE_ARGS --no-cache"
+                    shift
+                    ;;
+                --incremental)
+                    STYLE_ARGS="$STYLE_ARGS --incremental"
+                    shift
+                    ;;
+                --encoding-profile|--target-time|--target-size)
+                    STYLE_ARGS="$STYLE_ARGS $1 $2"
+                    shift 2
+                    ;;
                 *)
                     echo "❌ 不明なオプション: $1"
                     show_help
@@ -338,6 +384,53 @@ case "$1" in
             echo "  - $file ($size)"
         done
         ;;
+    "preview")
+        echo "🔍 変更箇所のプレビュー"
+        shift  # "preview" を削除
+        
+        if [ -z "$1" ]; then
+            echo "❌ プレビューする字幕ファイルを指定してください"
+            echo "   ./marker_workflow.sh preview marker_output/xxx_markers_s32_yellow_bold.ass --size 32 --color yellow --bold"
+            exit 1
+        fi
+        
+        # 前回 apply で合成した字幕との差分だけを低解像度で書き出す
+        docker-compose -f docker-compose.yml run --rm apply-subtitles-with-marker \
+            python preview_subtitles.py "$@" --output-dir merged_videos/previews
+        
+        echo ""
+        echo "📁 プレビュークリップ:"
+        find merged_videos/previews -name "*.mp4" -type f 2>/dev/null | while read file; do
+            echo "  - $file"
+        done
+        ;;
+    "cache")
+        echo "📦 レンダーキャッシュ"
+        shift  # "cache" を削除
+        python3 render_cache.py "${1:-stats}" "${@:2}"
+        ;;
+    "build")
+        echo "🏗️ 変更があった段階だけを再実行"
+        shift  # "build" を削除
+        
+        # 入力・設定のハッシュを .build_state.json に記録し、古くなったノードだけ実行
+        docker-compose -f docker-compose.yml run --rm apply-subtitles-with-marker \
+            python build.py "$@"
+        ;;
+    "watch")
+        echo "👀 フォルダ監視を開始"
+        shift  # "watch" を削除
+        
+        # 動画の追加・SRTの編集を検知して、影響する段階だけを実行（モデルは常駐）
+        docker-compose -f docker-compose.yml run --rm apply-subtitles-with-marker \
+            python watch_folder.py "$@"
+        ;;
+    "queue")
+        shift  # "queue" を削除
+        
+        # クライアントは標準ライブラリだけなのでホストで実行（APIは job-queue サービス）
+        python3 job_queue.py "${@:-status}"
+        ;;
     *)
         show_help
         ;;
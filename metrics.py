@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Prometheus形式のメトリクス（常駐するワーカー・サービスの監視用）
+
+数値は実行レポート（run_report.py）と同じ計測から作る。
+- このプロセス内の段階・キャッシュ参照は run_report の通知で受け取る
+- 別プロセス（ジョブキューのジョブなど）の結果は .run_reports/runs.jsonl を追いかけて読む
+- キューの深さ・実行中のジョブ数・ワーカーのメモリは取得要求のたびに読む
+
+    python3 metrics.py --port 9108                          # 単独で起動（キュー・レポートを監視）
+    python3 job_queue.py worker --metrics-port 9108         # ワーカーと一緒に起動
+    python3 metrics.py --once                               # 現在の値を表示
+"""
+
+import os
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import run_report
+
+# メトリクスの公開設定（環境変数で上書き可能）
+# SUBTITLE_METRICS_PORT: 設定すると --metrics-port 対応のサービスがメトリクスを公開
+# SUBTITLE_METRICS_HOST: 待ち受けるアドレス（デフォルト: 127.0.0.1、ローカルのみ）
+DEFAULT_HOST = os.environ.get('SUBTITLE_METRICS_HOST', '127.0.0.1')
+DEFAULT_PORT = 9108
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# ヒストグラムのバケット
+STAGE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+REALTIME_FACTOR_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 4)
+FPS_BUCKETS = (5, 10, 25, 50, 100, 200, 400, 800, 1600)
+MODEL_LOAD_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 40, 80, 160)
+
+def metrics_port_default():
+    value = os.environ.get('SUBTITLE_METRICS_PORT')
+    return int(value) if value else None
+
+def add_metrics_arguments(parser):
+    parser.add_argument('--metrics-port', type=int, default=metrics_port_default(),
+                        help='メトリクスを公開するポート（SUBTITLE_METRICS_PORT、省略時は公開しない）')
+    parser.add_argument('--metrics-host', default=DEFAULT_HOST, help='メトリクスの待ち受けアドレス')
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels, extra=None):
+    items = list(labels) + list(extra or [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in items) + '}'
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class Metric:
+    """ラベルごとの値を持つメトリクス（counter / gauge）"""
+
+    def __init__(self, name, help_text, kind):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        self.values[tuple(sorted(labels.items()))] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{format_labels(labels)} {format_value(value)}")
+        return lines
+
+class Histogram(Metric):
+
+    def __init__(self, name, help_text, buckets):
+        super().__init__(name, help_text, 'histogram')
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                state['counts'][index] += 1
+        state['sum'] += value
+        state['count'] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, state in sorted(self.values.items(), key=lambda item: item[0]):
+            for bound, count in zip(self.buckets, state['counts']):
+                lines.append(f"{self.name}_bucket{format_labels(labels, [('le', format_value(float(bound)))])} {count}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {format_value(round(state['sum'], 6))}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {state['count']}")
+        return lines
+
+class MetricsRegistry:
+    """実行レポートの計測値を集計してPrometheus形式で出力"""
+
+    def __init__(self, queue_db=None, shared_dir=None, report_dir=None, from_start=False):
+        self.queue_db = queue_db
+        self.shared_dir = shared_dir
+        self.report_dir = report_dir or run_report.REPORT_DIR
+        self._lock = threading.Lock()
+        # None: 最初に読んだときの末尾から（起動前の実行は数えない）
+        self._offset = 0 if from_start else None
+        self.started = time.time()
+
+        self.runs = Metric('subtitle_runs_total', '終了した実行の数', 'counter')
+        self.stage_seconds = Histogram('subtitle_stage_duration_seconds', '段階ごとの処理時間', STAGE_BUCKETS)
+        self.stage_errors = Metric('subtitle_stage_errors_total', 'エラーで終わった段階の数', 'counter')
+        self.realtime_factor = Histogram('subtitle_transcribe_realtime_factor',
+                                         '文字起こしの実時間比（処理時間 / 音声の長さ）', REALTIME_FACTOR_BUCKETS)
+        self.audio_seconds = Metric('subtitle_transcribed_audio_seconds_total', '文字起こしした音声の長さ', 'counter')
+        self.render_fps = Histogram('subtitle_render_fps', '合成（FFmpeg）の処理fps', FPS_BUCKETS)
+        self.frames = Metric('subtitle_ffmpeg_frames_total', 'FFmpegが処理したフレーム数', 'counter')
+        self.model_load = Histogram('subtitle_model_load_seconds', 'Whisperモデルの読み込み時間', MODEL_LOAD_BUCKETS)
+        self.cache_requests = Metric('subtitle_cache_requests_total', 'キャッシュの参照数（result: hit / miss）',
+                                     'counter')
+        self.observed = [self.runs, self.stage_seconds, self.stage_errors, self.realtime_factor, self.audio_seconds,
+                         self.render_fps, self.frames, self.model_load, self.cache_requests]
+
+    # ------------------------------------------------------------ 計測値の取り込み
+
+    def observe_stage(self, command, entry):
+        stage = entry.get('stage', 'unknown')
+        self.stage_seconds.observe(entry.get('wall', 0.0), command=command, stage=stage)
+        if entry.get('error'):
+            self.stage_errors.inc(command=command, stage=stage)
+        if entry.get('realtime_factor') is not None:
+            self.realtime_factor.observe(entry['realtime_factor'], command=command)
+        if entry.get('audio_seconds'):
+            self.audio_seconds.inc(entry['audio_seconds'], command=command)
+        if entry.get('fps'):
+            self.render_fps.observe(entry['fps'], command=command, stage=stage)
+        if entry.get('frames'):
+            self.frames.inc(entry['frames'], command=command)
+        if stage == 'model_load' and not entry.get('error'):
+            self.model_load.observe(entry.get('wall', 0.0), model=entry.get('model', 'unknown'))
+
+    def observe_cache(self, name, hits=0, misses=0):
+        if hits:
+            self.cache_requests.inc(hits, cache=name, result='hit')
+        if misses:
+            self.cache_requests.inc(misses, cache=name, result='miss')
+
+    def observe_report(self, report):
+        """別プロセスの実行レポート（runs.jsonl の1行）を取り込む"""
+        command = report.get('command', 'unknown')
+        self.runs.inc(command=command, status=report.get('status', 'unknown'))
+        for entry in report.get('stages', []):
+            self.observe_stage(command, entry)
+        for name, counts in (report.get('cache') or {}).items():
+            self.observe_cache(name, counts.get('hits', 0), counts.get('misses', 0))
+
+    def on_event(self, kind, data):
+        """このプロセス内の run_report からの通知"""
+        with self._lock:
+            if kind == 'stage':
+                self.observe_stage(data['command'], data['entry'])
+            elif kind == 'cache':
+                self.observe_cache(data['cache'], hits=int(data['hit']), misses=int(not data['hit']))
+            elif kind == 'report':
+                self.runs.inc(command=data.get('command', 'unknown'), status=data.get('status', 'unknown'))
+
+    def follow_reports(self):
+        """runs.jsonl の新しい行を読む（起動前の行は読まない。このプロセスの行は通知で取り込み済み）"""
+        path = os.path.join(self.report_dir, run_report.INDEX_FILENAME)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            self._offset = 0
+            return
+        if self._offset is None:
+            self._offset = size
+            return
+        if size < self._offset:
+            # 削除・作り直された
+            self._offset = 0
+        if size == self._offset:
+            return
+        with open(path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        # 書き込み途中の最後の行は次回に回す
+        complete = data[:data.rfind(b'\n') + 1]
+        self._offset += len(complete)
+        pid = os.getpid()
+        for line in complete.splitlines():
+            try:
+                report = json.loads(line)
+            except ValueError:
+                continue
+            if report.get('pid') == pid:
+                continue
+            self.observe_report(report)
+
+    # ------------------------------------------------------------ 取得要求ごとに読む値
+
+    def queue_metrics(self):
+        """ジョブキュー（SQLite）と分散文字起こし（共有ディレクトリ）の深さ・実行中の数"""
+        depth = Metric('subtitle_queue_depth', '待機中のジョブ・パートの数', 'gauge')
+        in_flight = Metric('subtitle_jobs_in_flight', '実行中のジョブ・パートの数', 'gauge')
+        jobs = Metric('subtitle_queue_jobs', '状態ごとのジョブ・パートの数', 'gauge')
+        if self.queue_db and os.path.exists(self.queue_db):
+            from job_queue import JobQueue, QUEUED, RUNNING
+            try:
+                counts = JobQueue(self.queue_db).count_by_state()
+            except Exception as e:
+                print(f"⚠️ ジョブキューを読めません: {e}")
+                counts = None
+            if counts is not None:
+                depth.set(counts.get(QUEUED, 0), queue='job_queue')
+                in_flight.set(counts.get(RUNNING, 0), queue='job_queue')
+                for state, count in counts.items():
+                    jobs.set(count, queue='job_queue', state=state)
+        if self.shared_dir and os.path.isdir(self.shared_dir):
+            from distributed_transcribe import find_jobs
+            totals = {'pending': 0, 'running': 0, 'done': 0, 'failed': 0}
+            for job in find_jobs(self.shared_dir):
+                if not job.exists():
+                    continue
+                for state, parts in job.status().items():
+                    totals[state] = totals.get(state, 0) + len(parts)
+            depth.set(totals['pending'], queue='distributed')
+            in_flight.set(totals['running'], queue='distributed')
+            for state, count in totals.items():
+                jobs.set(count, queue='distributed', state=state)
+        return [depth, in_flight, jobs]
+
+    def cache_hit_ratio(self):
+        ratio = Metric('subtitle_cache_hit_ratio', 'キャッシュのヒット率（起動からの累計）', 'gauge')
+        totals = {}
+        for labels, count in self.cache_requests.values.items():
+            labels = dict(labels)
+            item = totals.setdefault(labels['cache'], {'hit': 0, 'miss': 0})
+            item[labels['result']] += count
+        for name, item in totals.items():
+            if item['hit'] + item['miss']:
+                ratio.set(round(item['hit'] / (item['hit'] + item['miss']), 4), cache=name)
+        return ratio
+
+    def memory_metrics(self):
+        # PIDをラベルにすると子プロセスが起動するたびに系列が増えるので、自プロセスと
+        # 子プロセスの名前ごとの合計だけを出す
+        rss = Metric('subtitle_worker_resident_memory_bytes',
+                     'ワーカー（process="self"）と子プロセス（FFmpegなど、名前ごとの合計）の常駐メモリ', 'gauge')
+        children = Metric('subtitle_worker_child_processes', '実行中の子プロセスの数（名前ごと）', 'gauge')
+        own_pid = os.getpid()
+        for pid, name, value in process_tree_rss(own_pid):
+            if pid == own_pid:
+                rss.set(value, process='self')
+            else:
+                rss.inc(value, process=name)
+                children.inc(process=name)
+        uptime = Metric('subtitle_metrics_uptime_seconds', 'メトリクス公開の開始からの秒数', 'gauge')
+        uptime.set(round(time.time() - self.started, 3))
+        return [rss, children, uptime]
+
+    def render(self):
+        with self._lock:
+            self.follow_reports()
+            lines = []
+            for metric in self.observed + [self.cache_hit_ratio()] + self.queue_metrics() + self.memory_metrics():
+                lines.extend(metric.render())
+                lines.append('')
+        return '\n'.join(lines)
+
+# ---------------------------------------------------------------- プロセスのメモリ
+
+def read_proc_stat(pid):
+    """(名前, 親PID, 常駐メモリ) を /proc から読む（読めなければ None）"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+        with open(f"/proc/{pid}/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    # 2番目の項目（comm）は括弧で囲まれ、空白を含むことがある
+    name = stat[stat.find('(') + 1:stat.rfind(')')]
+    ppid = int(stat[stat.rfind(')') + 2:].split()[1])
+    return name, ppid, resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+def process_tree_rss(root_pid):
+    """root_pid とその子孫プロセスの [(pid, 名前, 常駐メモリ)]"""
+    processes = {}
+    try:
+        pids = [int(name) for name in os.listdir('/proc') if name.isdigit()]
+    except OSError:
+        return []
+    for pid in pids:
+        info = read_proc_stat(pid)
+        if info:
+            processes[pid] = info
+    tree = {root_pid}
+    changed = True
+    while changed:
+        changed = False
+        for pid, (_, ppid, _) in processes.items():
+            if ppid in tree and pid not in tree:
+                tree.add(pid)
+                changed = True
+    return [(pid, processes[pid][0], processes[pid][2]) for pid in sorted(tree) if pid in processes]
+
+# ---------------------------------------------------------------- HTTP
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        send_metrics(self, self.registry)
+
+def send_metrics(handler, registry):
+    """Prometheus形式で応答（job_queue の HTTP API からも使う）"""
+    body = registry.render().encode('utf-8')
+    handler.send_response(200)
+    handler.send_header('Content-Type', CONTENT_TYPE)
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+def create_registry(queue_db=None, shared_dir=None, report_dir=None):
+    """集計を作り、このプロセス内の run_report の通知を受け取るように登録"""
+    registry = MetricsRegistry(queue_db, shared_dir, report_dir)
+    run_report.add_listener(registry.on_event)
+    registry.follow_reports()
+    return registry
+
+def start_metrics_server(port, host=None, queue_db=None, shared_dir=None, report_dir=None):
+    """バックグラウンドのスレッドで /metrics を公開して registry を返す（port が None なら何もしない）"""
+    if not port:
+        return None
+    host = host or DEFAULT_HOST
+    registry = create_registry(queue_db, shared_dir, report_dir)
+    handler = type('BoundMetricsHandler', (MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print(f"📈 メトリクス: http://{host}:{port}/metrics")
+    return registry
+
+def main():
+    from job_queue import DEFAULT_DB_PATH
+    from distributed_transcribe import DEFAULT_SHARED_DIR
+
+    parser = argparse.ArgumentParser(description='Prometheus形式のメトリクスを公開')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='待ち受けるアドレス')
+    parser.add_argument('--port', type=int, default=metrics_port_default() or DEFAULT_PORT, help='ポート')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='ジョブキューのSQLiteファイル')
+    parser.add_argument('--shared-dir', default=DEFAULT_SHARED_DIR, help='分散文字起こしの共有ディレクトリ')
+    parser.add_argument('--report-dir', default=run_report.REPORT_DIR, help='実行レポートの保存先')
+    parser.add_argument('--once', action='store_true', help='これまでの全実行を集計して表示し終了')
+    args = parser.parse_args()
+
+    if args.once:
+        print(MetricsRegistry(args.db, args.shared_dir, args.report_dir, from_start=True).render())
+        return
+    start_metrics_server(args.port, args.host, args.db, args.shared_dir, args.report_dir)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n👋 メトリクスの公開を終了します")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import shutil
+import argparse
+
+from apply_subtitles import parse_style_args, prepare_subtitle_file, build_subtitle_filter
+from render_cache import last_render
+from subtitle_cues import load_cues, load_ass_header, changed_time_ranges, merge_time_ranges
+from ffmpeg_runner import run_ffmpeg
+from workspace import make_work_dir, atomic_output, input_path
+from run_report import run_report
+
+# プレビュー用の軽量エンコード設定
+PREVIEW_ENCODER_ARGS = ['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '30', '-c:a', 'aac', '-b:a', '96k']
+
+def parse_arguments():
+    """引数解析（スタイル引数は apply_subtitles.py と共通）"""
+    parser = argparse.ArgumentParser(description='編集した字幕の変更箇所だけを短いクリップでプレビュー')
+
+    parser.add_argument('subtitle', help='プレビューする字幕ファイル（SRT/ASS）')
+    parser.add_argument('--video', help='元動画（省略時は前回の合成記録から取得）')
+    parser.add_argument('--against', help='比較元の字幕ファイル（省略時は前回合成した字幕）')
+    parser.add_argument('--all', action='store_true', help='差分を取らず全キューをプレビュー')
+    parser.add_argument('--padding', type=float, default=1.0, help='変更箇所の前後に付ける秒数')
+    parser.add_argument('--height', type=int, default=360, help='プレビューの縦解像度')
+    parser.add_argument('--max-clips', type=int, default=20, help='作成するクリップの上限')
+    parser.add_argument('--output-dir', default='previews', help='プレビュー出力ディレクトリ')
+
+    # スタイル引数は parse_style_args() が解析するので、ここでは読み飛ばすだけ
+    for option in ['--size', '--color', '--outline', '--position', '--margin', '--background', '--background-alpha']:
+        parser.add_argument(option, help=argparse.SUPPRESS)
+    for flag in ['--bold', '--italic', '--no-cache']:
+        parser.add_argument(flag, action='store_true', help=argparse.SUPPRESS)
+
+    return parser.parse_args()
+
+def render_preview_clip(video_path, video_filter, start, end, output_path, height):
+    """指定範囲だけを低解像度・ultrafastでレンダリング
+
+    -ss を入力側に置いて正確にシークし、-copyts で元のタイムスタンプを保つことで
+    字幕フィルタが本番と同じ時刻のキューを描画する。
+    """
+    cmd = [
+        'ffmpeg', '-y',
+        '-ss', f"{start:.3f}",
+        '-t', f"{end - start:.3f}",
+        '-copyts',
+        '-i', input_path(video_path),
+        '-vf', f"{video_filter},scale=-2:{height},setpts=PTS-STARTPTS",
+        '-af', 'asetpts=PTS-STARTPTS',
+    ]
+
+    with atomic_output(output_path) as output:
+        result = run_ffmpeg(cmd + PREVIEW_ENCODER_ARGS + [output.path], label=os.path.basename(output_path),
+                            duration=end - start)
+        if result.returncode != 0:
+            print(f"    📝 FFmpegエラー: {result.stderr}")
+            return False
+        output.commit()
+    return True
+
+def preview_subtitles():
+    """字幕の変更箇所をプレビュー"""
+
+    args = parse_arguments()
+    style_args = parse_style_args()
+    started = time.time()
+
+    print("🔍 字幕プレビュー（変更箇所のみ）")
+    print(f"📄 字幕: {args.subtitle}")
+
+    if not os.path.exists(args.subtitle):
+        print(f"❌ 字幕ファイルが見つかりません: {args.subtitle}")
+        return False
+
+    record = last_render(args.subtitle)
+    video_path = args.video or (record or {}).get('video_path')
+    if not video_path or not os.path.exists(video_path):
+        print("❌ 元動画が特定できません（--video で指定してください）")
+        return False
+    print(f"📹 動画: {video_path}")
+
+    new_cues = load_cues(args.subtitle)
+
+    # 比較元を決定
+    baseline = args.against or (record or {}).get('subtitle_snapshot')
+    if args.all or not baseline:
+        if not args.all:
+            print("⚠️ 前回の合成記録がないため全キューをプレビューします")
+        ranges = [(cue['start'], cue['end']) for cue in new_cues]
+    else:
+        print(f"📋 比較元: {baseline}")
+        if load_ass_header(baseline) != load_ass_header(args.subtitle):
+            # スタイル定義が変わると全キューの見た目が変わる
+            print("⚠️ スタイル定義（ASSヘッダー）が変わっているため全キューをプレビューします")
+            ranges = [(cue['start'], cue['end']) for cue in new_cues]
+        else:
+            ranges = changed_time_ranges(load_cues(baseline), new_cues)
+
+    ranges = merge_time_ranges(ranges, padding=args.padding)
+    if not ranges:
+        print("✅ 変更されたキューはありません")
+        return True
+
+    print(f"📊 変更範囲: {len(ranges)}箇所")
+    if len(ranges) > args.max_clips:
+        print(f"⚠️ 上限 {args.max_clips} 箇所までプレビューします")
+        ranges = ranges[:args.max_clips]
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    work_dir = make_work_dir('subtitle_preview_')
+    created = 0
+    try:
+        # 本番の apply と同じ手順で字幕とフィルタを準備
+        subtitle_file_to_use, has_markers, _ = prepare_subtitle_file(args.subtitle, style_args, work_dir)
+        _, _, video_filter = build_subtitle_filter(subtitle_file_to_use, style_args, has_markers)
+
+        base_name = os.path.splitext(os.path.basename(args.subtitle))[0]
+        for index, (start, end) in enumerate(ranges, 1):
+            output_path = os.path.join(args.output_dir, f"{base_name}_preview{index:02d}_{int(start)}s.mp4")
+            print(f"  🎬 {index}/{len(ranges)}: {start:.2f}s - {end:.2f}s")
+            if render_preview_clip(video_path, video_filter, start, end, output_path, args.height):
+                print(f"    ✅ {output_path}")
+                created += 1
+            else:
+                print(f"    ❌ 失敗")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n🎉 プレビュー完了: {created}/{len(ranges)}クリップ ({time.time() - started:.1f}秒)")
+    return created == len(ranges)
+
+if __name__ == "__main__":
+    with run_report('preview_subtitles'):
+        success = preview_subtitles()
+    sys.exit(0 if success else 1)
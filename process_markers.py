@@ -7,8 +7,25 @@ import sys
 import argparse
 from pathlib import Path
 
-def parse_arguments():
-    """引数解析"""
+from run_report import run_report, stage
+from profiling import add_profile_arguments
+from subtitle_logging import get_logger, log_counts
+from style_presets import color_to_bgr, with_alpha, position_to_alignment, get_preset, preset_names
+
+log = get_logger('process_markers')
+
+# マーカーの色名 → ASSの色タグ（判定はこの順番）
+MARKER_COLOR_TAGS = {
+    'red': r'\c&H0000FF&',
+    'blue': r'\c&HFF0000&',
+    'green': r'\c&H00FF00&',
+    'yellow': r'\c&H00FFFF&',
+    'white': r'\c&HFFFFFF&',
+    'black': r'\c&H000000&',
+}
+
+def parse_arguments(argv=None):
+    """引数解析（argv省略時はsys.argvを使用）"""
     parser = argparse.ArgumentParser(description='マーカー処理（スタイル引数対応）')
     
     # 基本引数
@@ -27,32 +44,11 @@ def parse_arguments():
     # 背景オプションを追加
     parser.add_argument('--background', default='none', help='背景色 (black, white, gray, none)')
     parser.add_argument('--background-alpha', type=float, default=0.8, help='背景透明度 (0.0-1.0)')
+    # style_config.py のプリセット（指定するとデフォルトスタイルはプリセットのものになる）
+    parser.add_argument('--preset', choices=preset_names(), help='スタイルプリセット')
+    add_profile_arguments(parser)
     
-    return parser.parse_args()
-
-def color_to_ass_bgr(color_name):
-    """色名をASS BGR形式に変換"""
-    colors = {
-        'white': '&H00FFFFFF',
-        'red': '&H000000FF',
-        'blue': '&H00FF0000',
-        'green': '&H0000FF00',
-        'yellow': '&H0000FFFF',
-        'black': '&H00000000',
-        'cyan': '&H00FFFF00',
-        'magenta': '&H00FF00FF',
-        'gray': '&H00808080'
-    }
-    return colors.get(color_name.lower(), '&H00FFFFFF')
-
-def position_to_alignment(position):
-    """位置をASS alignment値に変換"""
-    positions = {
-        'bottom': 2,
-        'center': 5,
-        'top': 8
-    }
-    return positions.get(position.lower(), 2)
+    return parser.parse_args(argv)
 
 def parse_marker(marker_text):
     """マーカーテキストを解析してスタイル情報を抽出（数値サイズ対応版）"""
@@ -68,67 +64,71 @@ def parse_marker(marker_text):
     # マーカーを小文字で処理
     marker_lower = marker_text.lower()
     
-    print(f"    🔍 マーカー解析: '{marker_text}' -> '{marker_lower}'")
-    
     # サイズの処理（数値指定を優先）
     # size数値パターン（例：size48, size32）
     size_match = re.search(r'size(\d+)', marker_lower)
     if size_match:
         style['fontsize'] = int(size_match.group(1))
-        print(f"      📏 数値サイズ指定: {style['fontsize']}")
     else:
         # 従来のlarge/smallパターン
         if 'large' in marker_lower:
             style['fontsize'] = 36
-            print(f"      📏 large -> 36")
         elif 'small' in marker_lower:
             style['fontsize'] = 18
-            print(f"      📏 small -> 18")
     
     # 色の処理（従来通り）
-    if 'red' in marker_lower:
-        style['color'] = 'red'
-        print(f"      🎨 色: red")
-    elif 'blue' in marker_lower:
-        style['color'] = 'blue'
-        print(f"      🎨 色: blue")
-    elif 'green' in marker_lower:
-        style['color'] = 'green'
-        print(f"      🎨 色: green")
-    elif 'yellow' in marker_lower:
-        style['color'] = 'yellow'
-        print(f"      🎨 色: yellow")
-    elif 'white' in marker_lower:
-        style['color'] = 'white'
-        print(f"      🎨 色: white")
-    elif 'black' in marker_lower:
-        style['color'] = 'black'
-        print(f"      🎨 色: black")
+    for color in MARKER_COLOR_TAGS:
+        if color in marker_lower:
+            style['color'] = color
+            break
     
     # スタイルの処理（従来通り）
     if 'bold' in marker_lower:
         style['bold'] = 1
-        print(f"      💪 太字")
     
     if 'italic' in marker_lower:
         style['italic'] = 1
-        print(f"      📐 斜体")
     
-    print(f"      ✅ 解析結果: {style}")
+    log.debug("    🔍 マーカー解析: '%s' -> %s", marker_text, style)
     return style
 
+def build_reset_tag(default_style_args):
+    """マーカーの後でデフォルトスタイルに戻すタグ"""
+    # デフォルトのフォントサイズ・色に戻す（プリセットの色は &H.. 形式、不明な色は白にフォールバック）
+    color = default_style_args['color']
+    if color.upper().startswith('&H'):
+        color_tag = f"\\c&H{color[-6:].upper()}&"
+    else:
+        color_tag = MARKER_COLOR_TAGS.get(color.lower(), r'\c&HFFFFFF&')
+    default_reset_tags = [f"\\fs{default_style_args['size']}", color_tag]
+    
+    # デフォルトの太字・斜体設定に戻す
+    default_reset_tags.append(r'\b1' if default_style_args.get('bold', False) else r'\b0')
+    default_reset_tags.append(r'\i1' if default_style_args.get('italic', False) else r'\i0')
+    
+    return '{' + ''.join(default_reset_tags) + '}'
+
 def process_srt_with_markers(srt_content, default_style_args):
-    """SRTファイルのマーカーを処理（デバッグ強化版）"""
+    """SRTファイルのマーカーを処理
+
+    マーカーごとの詳細は debug レベル（SUBTITLE_LOG_LEVEL=debug）でのみ出力し、
+    通常は種類ごとの件数を1行にまとめて出力する。
+    """
     
     # マーカーパターン: ¥¥¥marker¥¥¥text¥¥¥
     marker_pattern = r'¥¥¥([^¥]+)¥¥¥([^¥]*)¥¥¥'
     
+    # リセットタグはデフォルト設定だけで決まるので1回だけ作る
+    reset_tag = build_reset_tag(default_style_args)
+    log.debug("  📋 デフォルト設定: size=%s, color=%s, bold=%s, italic=%s / リセットタグ: '%s'",
+              default_style_args['size'], default_style_args['color'], default_style_args['bold'],
+              default_style_args['italic'], reset_tag)
+    counts = {'markers': 0, 'size': 0, 'color': 0, 'bold': 0, 'italic': 0, 'unstyled': 0}
+    
     def replace_marker(match):
         marker_text = match.group(1)
         content = match.group(2)
-        
-        print(f"  🎯 マーカー発見: '{marker_text}' 適用対象: '{content}'")
-        print(f"  📋 使用するデフォルト設定: size={default_style_args['size']}, color={default_style_args['color']}, bold={default_style_args['bold']}, italic={default_style_args['italic']}")
+        counts['markers'] += 1
         
         style = parse_marker(marker_text)
         
@@ -137,100 +137,43 @@ def process_srt_with_markers(srt_content, default_style_args):
         
         if style['fontsize']:
             tags.append(f"\\fs{style['fontsize']}")
-            print(f"      📏 マーカーサイズタグ: \\fs{style['fontsize']}")
+            counts['size'] += 1
         
         if style['color']:
-            # 色名からASSタグに変換
-            if style['color'] == 'red':
-                tags.append(r'\c&H0000FF&')
-            elif style['color'] == 'blue':
-                tags.append(r'\c&HFF0000&')
-            elif style['color'] == 'green':
-                tags.append(r'\c&H00FF00&')
-            elif style['color'] == 'yellow':
-                tags.append(r'\c&H00FFFF&')
-            elif style['color'] == 'white':
-                tags.append(r'\c&HFFFFFF&')
-            elif style['color'] == 'black':
-                tags.append(r'\c&H000000&')
-            print(f"      🎨 マーカー色タグ: 最後に追加されたタグ")
+            tags.append(MARKER_COLOR_TAGS[style['color']])
+            counts['color'] += 1
         
         if style['bold']:
             tags.append(r'\b1')
-            print(f"      💪 マーカー太字タグ: \\b1")
+            counts['bold'] += 1
         
         if style['italic']:
             tags.append(r'\i1')
-            print(f"      📐 マーカー斜体タグ: \\i1")
+            counts['italic'] += 1
         
         # タグを組み合わせ
         if tags:
             start_tag = '{' + ''.join(tags) + '}'
-            print(f"      🏁 完成したマーカータグ: '{start_tag}'")
-            
-            # 明示的にDefaultスタイルに戻すタグを作成
-            default_reset_tags = []
-            
-            # デフォルトのフォントサイズに戻す
-            default_reset_tags.append(f"\\fs{default_style_args['size']}")
-            print(f"      📏 リセットサイズタグ: \\fs{default_style_args['size']}")
-            
-            # デフォルトの色に戻す
-            default_color = default_style_args['color'].lower()
-            if default_color == 'red':
-                default_reset_tags.append(r'\c&H0000FF&')
-            elif default_color == 'blue':
-                default_reset_tags.append(r'\c&HFF0000&')
-            elif default_color == 'green':
-                default_reset_tags.append(r'\c&H00FF00&')
-            elif default_color == 'yellow':
-                default_reset_tags.append(r'\c&H00FFFF&')
-            elif default_color == 'white':
-                default_reset_tags.append(r'\c&HFFFFFF&')
-            elif default_color == 'black':
-                default_reset_tags.append(r'\c&H000000&')
-            else:
-                default_reset_tags.append(r'\c&HFFFFFF&')  # フォールバック
-            print(f"      🎨 リセット色タグ: 追加完了 ({default_color})")
-            
-            # デフォルトの太字・斜体設定に戻す
-            if default_style_args.get('bold', False):
-                default_reset_tags.append(r'\b1')
-                print(f"      💪 リセット太字タグ: \\b1 (太字を維持)")
-            else:
-                default_reset_tags.append(r'\b0')
-                print(f"      💪 リセット太字タグ: \\b0 (太字を解除)")
-                
-            if default_style_args.get('italic', False):
-                default_reset_tags.append(r'\i1')
-                print(f"      📐 リセット斜体タグ: \\i1 (斜体を維持)")
-            else:
-                default_reset_tags.append(r'\i0')
-                print(f"      📐 リセット斜体タグ: \\i0 (斜体を解除)")
-            
-            reset_tag = '{' + ''.join(default_reset_tags) + '}'
-            
             result = f"{start_tag}{content}{reset_tag}"
-            print(f"    ✨ 最終変換結果: '{result}'")
-            print(f"    🔄 完成したリセットタグ: '{reset_tag}'")
-            print(f"    📊 期待される動作:")
-            print(f"       マーカー部分「{content}」のサイズ: {style.get('fontsize', 'デフォルト')}")
-            print(f"       リセット後のサイズ: {default_style_args['size']}")
+            log.debug("  🎯 マーカー '%s' 適用対象: '%s' -> '%s'", marker_text, content, result)
             return result
         else:
-            print(f"    ⚠️ スタイルが適用されませんでした")
+            counts['unstyled'] += 1
+            log.debug("    ⚠️ スタイルが適用されませんでした: '%s'", marker_text)
             return content
     
     # マーカーを置換
     processed_content = re.sub(marker_pattern, replace_marker, srt_content)
     
+    log_counts(log, f"  🎯 マーカー {counts['markers']}個を処理（サイズ {counts['size']}・色 {counts['color']}"
+                    f"・太字 {counts['bold']}・斜体 {counts['italic']}、スタイルなし {counts['unstyled']}）", counts)
     return processed_content
 
-def srt_to_ass_with_style(srt_content, video_name, args):
-    """SRTをスタイル適用済みASSに変換"""
+def build_style_line(args):
+    """コマンドライン引数のスタイルから Style: 行を作る"""
     
     # 色とアライメントを変換
-    primary_color = color_to_ass_bgr(args.color)
+    primary_color = color_to_bgr(args.color)
     alignment = position_to_alignment(args.position)
     bold_value = 1 if args.bold else 0
     italic_value = 1 if args.italic else 0
@@ -253,13 +196,25 @@ def srt_to_ass_with_style(srt_content, video_name, args):
     border_style = 1  # デフォルト（アウトラインのみ）
     
     if args.background != 'none':
-        background_color_hex = color_to_ass_bgr(args.background)
         # 透明度を考慮
-        alpha_value = int(args.background_alpha * 255)
-        back_color = f"&H{alpha_value:02X}{background_color_hex[3:]}"
+        back_color = with_alpha(color_to_bgr(args.background), args.background_alpha)
         border_style = 4  # 背景ボックスを有効
         print(f"  🎨 背景色設定: {back_color}")
     
+    return (f"Style: Default,{args.font},{args.size},{primary_color},&H000000FF,&H00000000,{back_color},"
+            f"{bold_value},{italic_value},0,0,100,100,0,0,{border_style},{args.outline},2,{alignment},30,30,"
+            f"{args.margin},1")
+
+def srt_to_ass_with_style(srt_content, video_name, args):
+    """SRTをスタイル適用済みASSに変換"""
+    
+    if args.preset:
+        # コンパイル済みのプリセットの Style: 行を使う
+        style_line = get_preset(args.preset).style_line()
+        print(f"🎨 適用するデフォルトスタイル: プリセット {args.preset}")
+    else:
+        style_line = build_style_line(args)
+    
     # ASSヘッダー（スタイル適用済み）
     ass_header = f"""[Script Info]
 Title: {video_name}
@@ -270,7 +225,7 @@ ScaledBorderAndShadow: yes
 
 [V4+ Styles]
 Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
-Style: Default,{args.font},{args.size},{primary_color},&H000000FF,&H00000000,{back_color},{bold_value},{italic_value},0,0,100,100,0,0,{border_style},{args.outline},2,{alignment},30,30,{args.margin},1
+{style_line}
 
 [Events]
 Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
@@ -317,6 +272,74 @@ def srt_time_to_ass_time(srt_time):
     
     return f"{int(hours)}:{minutes}:{seconds}.{centiseconds:02d}"
 
+def marker_ass_filename(filename, args):
+    """マーカーSRTのファイル名から出力ASSのファイル名を作成（スタイル情報を含む）"""
+    base_name = os.path.splitext(filename)[0]
+    if args.preset:
+        style_suffix = args.preset
+    else:
+        style_suffix = f"s{args.size}_{args.color}"
+        if args.bold:
+            style_suffix += "_bold"
+        if args.italic:
+            style_suffix += "_italic"
+        if args.background != 'none':
+            style_suffix += f"_bg{args.background}"
+    
+    if filename.endswith('_editable.srt'):
+        return filename.replace('_editable.srt', f'_markers_{style_suffix}.ass')
+    return f"{base_name}_markers_{style_suffix}.ass"
+
+def process_marker_file(input_path, output_dir, args):
+    """1つのSRTファイルのマーカーを処理してスタイル適用済みASSを書き出す
+
+    戻り値: 出力ASSのパス（マーカーが無い場合はNone）
+    """
+    filename = os.path.basename(input_path)
+    
+    # ファイルを読み込み
+    with open(input_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    # マーカーがあるかチェック
+    if '¥¥¥' not in content:
+        print(f"  ⚠️ マーカーが見つかりません - スキップ")
+        return None
+    
+    print(f"  🎨 マーカーを発見 - 処理中...")
+    
+    # デフォルトスタイルの情報を渡す
+    if args.preset:
+        default_style = get_preset(args.preset).marker_defaults()
+    else:
+        default_style = {
+            'size': args.size,
+            'color': args.color,
+            'bold': args.bold,
+            'italic': args.italic
+        }
+    
+    print(f"  🔄 デフォルトスタイル設定: {default_style}")
+    
+    # マーカーを処理
+    processed_content = process_srt_with_markers(content, default_style)
+    
+    # スタイル適用済みASSに変換
+    video_name = os.path.splitext(filename)[0].replace('_editable', '')
+    ass_content = srt_to_ass_with_style(processed_content, video_name, args)
+    
+    # 出力ファイルパス
+    ass_filename = marker_ass_filename(filename, args)
+    output_path = os.path.join(output_dir, ass_filename)
+    
+    # ASSファイルを書き出し
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(ass_content)
+    
+    file_size = os.path.getsize(output_path)
+    print(f"  ✅ 完了: {ass_filename} ({file_size} bytes)")
+    return output_path
+
 def process_markers_in_directory(args):
     """ディレクトリ内のマーカー付きSRTファイルを処理（スタイル適用）"""
     
@@ -340,59 +363,9 @@ def process_markers_in_directory(args):
             print(f"\n📝 処理中: {filename}")
             
             try:
-                # ファイルを読み込み
-                with open(input_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # マーカーがあるかチェック
-                if '¥¥¥' not in content:
-                    print(f"  ⚠️ マーカーが見つかりません - スキップ")
-                    continue
-                
-                print(f"  🎨 マーカーを発見 - 処理中...")
-                
-                # デフォルトスタイルの情報を渡す
-                default_style = {
-                    'size': args.size,
-                    'color': args.color,
-                    'bold': args.bold,
-                    'italic': args.italic
-                }
-                
-                print(f"  🔄 デフォルトスタイル設定: {default_style}")
-                
-                # マーカーを処理
-                processed_content = process_srt_with_markers(content, default_style)
-                
-                # スタイル適用済みASSに変換
-                base_name = os.path.splitext(filename)[0]
-                video_name = base_name.replace('_editable', '')
-                ass_content = srt_to_ass_with_style(processed_content, video_name, args)
-                
-                # ファイル名を生成（スタイル情報を含む）
-                style_suffix = f"s{args.size}_{args.color}"
-                if args.bold:
-                    style_suffix += "_bold"
-                if args.italic:
-                    style_suffix += "_italic"
-                if args.background != 'none':
-                    style_suffix += f"_bg{args.background}"
-                
-                if filename.endswith('_editable.srt'):
-                    ass_filename = filename.replace('_editable.srt', f'_markers_{style_suffix}.ass')
-                else:
-                    ass_filename = f"{base_name}_markers_{style_suffix}.ass"
-                
-                # 出力ファイルパス
-                output_path = os.path.join(output_dir, ass_filename)
-                
-                # ASSファイルを書き出し
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write(ass_content)
-                
-                file_size = os.path.getsize(output_path)
-                print(f"  ✅ 完了: {ass_filename} ({file_size} bytes)")
-                processed_count += 1
+                with stage('markers', file=filename):
+                    if process_marker_file(input_path, output_dir, args):
+                        processed_count += 1
                 
             except Exception as e:
                 print(f"  ❌ エラー: {e}")
@@ -413,4 +386,5 @@ def main():
     process_markers_in_directory(args)
 
 if __name__ == "__main__":
-    main()
+    with run_report('process_markers'):
+        main()
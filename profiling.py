@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# プロファイリングの設定（無効時は何もしない）
+# SUBTITLE_PROFILE / --profile: cpu（cProfile）, memory（tracemalloc）, ffmpeg（-benchmark）, all をカンマ区切り
+# SUBTITLE_PROFILE_STAGES / --profile-stages: 対象の段階（例: transcribe,render、省略時は全段階）
+# SUBTITLE_PROFILE_DIR: 出力先（デフォルト: .profiles）
+PROFILE_MODES = ('cpu', 'memory', 'ffmpeg')
+PROFILE_DIR = os.environ.get('SUBTITLE_PROFILE_DIR', '.profiles')
+TOP_ALLOCATIONS = 25
+TRACEMALLOC_FRAMES = 10
+
+BENCH_TIME_PATTERN = re.compile(r'bench: utime=([\d.]+)s stime=([\d.]+)s rtime=([\d.]+)s')
+BENCH_RSS_PATTERN = re.compile(r'bench: maxrss=(\d+)\s*(?:KiB|kB)')
+
+def argv_value(option, argv=None):
+    """sys.argv から --option 値 / --option=値 を取得（argparse を通さない呼び出し元でも使えるように）"""
+    args = sys.argv[1:] if argv is None else argv
+    for index, arg in enumerate(args):
+        if arg == option and index + 1 < len(args):
+            return args[index + 1]
+        if arg.startswith(option + '='):
+            return arg.split('=', 1)[1]
+    return None
+
+def parse_modes(value):
+    modes = set()
+    for item in (value or '').split(','):
+        item = item.strip().lower()
+        if item in ('all', '1', 'true', 'yes', 'on'):
+            modes.update(PROFILE_MODES)
+        elif item in PROFILE_MODES:
+            modes.add(item)
+        elif item:
+            print(f"⚠️ 不明なプロファイル指定: {item}（{', '.join(PROFILE_MODES)}, all）")
+    return frozenset(modes)
+
+def parse_stages(value):
+    return frozenset(item.strip() for item in (value or '').split(',') if item.strip())
+
+# 起動時に1回だけ決める（段階ごとの判定は集合の参照だけ）
+MODES = parse_modes(argv_value('--profile') or os.environ.get('SUBTITLE_PROFILE'))
+STAGES = parse_stages(argv_value('--profile-stages') or os.environ.get('SUBTITLE_PROFILE_STAGES'))
+
+def profiling_enabled():
+    return bool(MODES)
+
+def ffmpeg_benchmark_enabled():
+    return 'ffmpeg' in MODES
+
+# add_profile_arguments で追加する引数名（キャッシュキーなどから除外する）
+PROFILE_OPTIONS = ('profile', 'profile_stages')
+
+def add_profile_arguments(parser):
+    """argparse を使うエントリーポイントに --profile / --profile-stages を追加（値は上で読む）"""
+    parser.add_argument('--profile', help=f"段階ごとのプロファイル（{','.join(PROFILE_MODES)},all）")
+    parser.add_argument('--profile-stages', help='プロファイルする段階（カンマ区切り、省略時は全段階）')
+
+def safe_filename(value, limit=80):
+    return re.sub(r'[^\w.-]+', '_', value).strip('_')[:limit] or 'run'
+
+def parse_ffmpeg_benchmark(line, benchmark):
+    """FFmpegの -benchmark 出力（bench: utime=... / bench: maxrss=...）を読み取る"""
+    match = BENCH_TIME_PATTERN.search(line)
+    if match:
+        benchmark['utime'], benchmark['stime'], benchmark['rtime'] = (float(value) for value in match.groups())
+        return True
+    match = BENCH_RSS_PATTERN.search(line)
+    if match:
+        benchmark['maxrss_kb'] = int(match.group(1))
+        return True
+    return False
+
+class StageProfiler:
+    """段階ごとに cProfile / tracemalloc を動かして結果を保存
+
+    出力: <PROFILE_DIR>/<コマンド>_<日時>_<PID>/<連番>_<段階>_<ファイル>.prof / .alloc.txt
+    cProfile は同時に1つしか動かせないので、並列に動く段階（レンダリングワーカー）や
+    入れ子の段階では先に始まったものだけを計測する。
+    """
+
+    def __init__(self):
+        command = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0]
+        self.run_dir = os.path.join(PROFILE_DIR, f"{safe_filename(command)}_{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}")
+        self.counter = 0
+        self._lock = threading.Lock()
+        self._cpu_busy = False
+
+    def output_base(self, name, file):
+        with self._lock:
+            self.counter += 1
+            index = self.counter
+        os.makedirs(self.run_dir, exist_ok=True)
+        label = f"{index:03d}_{safe_filename(name)}" + (f"_{safe_filename(file)}" if file else '')
+        return os.path.join(self.run_dir, label)
+
+    @contextmanager
+    def profile(self, name, file=None):
+        base = self.output_base(name, file)
+        profiler = self._start_cpu() if 'cpu' in MODES else None
+        memory = self._start_memory() if 'memory' in MODES else None
+        try:
+            yield
+        finally:
+            # 計測を止めてから書き出す（プロファイラ自身の処理を結果に含めない）
+            if profiler is not None:
+                profiler.disable()
+            if memory is not None:
+                self._finish_memory(memory, base, name, file)
+            if profiler is not None:
+                self._finish_cpu(profiler, base)
+
+    def _start_cpu(self):
+        import cProfile
+        with self._lock:
+            if self._cpu_busy:
+                return None
+            self._cpu_busy = True
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # 他のプロファイラが動いている
+            with self._lock:
+                self._cpu_busy = False
+            return None
+        return profiler
+
+    def _finish_cpu(self, profiler, base):
+        with self._lock:
+            self._cpu_busy = False
+        path = base + '.prof'
+        profiler.dump_stats(path)
+        print(f"  🔬 cProfile: {path}")
+
+    def _start_memory(self):
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        return tracemalloc.take_snapshot()
+
+    def _finish_memory(self, before, base, name, file):
+        import tracemalloc
+        current, peak = tracemalloc.get_traced_memory()
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        after = tracemalloc.take_snapshot().filter_traces(ignore)
+        stats = after.compare_to(before.filter_traces(ignore), 'lineno')
+        net = sum(stat.size_diff for stat in stats)
+        path = base + '.alloc.txt'
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"stage: {name}\nfile: {file or '-'}\n")
+            f.write(f"peak: {peak / 1024:.1f} KiB\ncurrent: {current / 1024:.1f} KiB\nnet: {net / 1024:+.1f} KiB\n\n")
+            f.write(f"top {TOP_ALLOCATIONS} allocations (size diff):\n")
+            for stat in sorted(stats, key=lambda s: s.size_diff, reverse=True)[:TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
+        print(f"  🔬 tracemalloc: {path}（ピーク {peak / (1024 * 1024):.1f} MiB）")
+
+    def record_ffmpeg(self, label, benchmark):
+        """FFmpegの -benchmark の結果を ffmpeg_bench.jsonl に追記"""
+        os.makedirs(self.run_dir, exist_ok=True)
+        line = json.dumps(dict(benchmark, label=label, time=time.time()), ensure_ascii=False)
+        with self._lock, open(os.path.join(self.run_dir, 'ffmpeg_bench.jsonl'), 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+_profiler = None
+
+def get_profiler():
+    global _profiler
+    if _profiler is None:
+        _profiler = StageProfiler()
+    return _profiler
+
+@contextmanager
+def profile_stage(name, file=None):
+    """段階をプロファイル（対象外の段階・無効時は何もしない）"""
+    if not MODES - {'ffmpeg'} or (STAGES and name not in STAGES):
+        yield
+        return
+    with get_profiler().profile(name, file):
+        yield
+
+def record_ffmpeg_benchmark(label, benchmark):
+    if benchmark:
+        get_profiler().record_ffmpeg(label, benchmark)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import shutil
+import fcntl
+import hashlib
+import argparse
+from contextlib import contextmanager
+
+from workspace import atomic_output
+from run_report import record_cache
+
+# キャッシュ設定（環境変数で上書き可能）
+DEFAULT_CACHE_DIR = os.environ.get('RENDER_CACHE_DIR', '.render_cache')
+DEFAULT_MAX_BYTES = int(os.environ.get('RENDER_CACHE_MAX_BYTES', str(20 * 1024 ** 3)))
+
+INDEX_FILENAME = 'index.json'
+LOCK_FILENAME = 'index.lock'
+OBJECTS_DIRNAME = 'objects'
+RENDERS_DIRNAME = 'renders'
+
+# 動画の同一性判定で読むサンプルサイズ（先頭・中央・末尾）
+VIDEO_SAMPLE_BYTES = 1024 * 1024
+
+def cache_enabled():
+    """キャッシュが有効かどうか（--no-cache または RENDER_CACHE=0 で無効）"""
+    if '--no-cache' in sys.argv[1:]:
+        return False
+    return os.environ.get('RENDER_CACHE', '1').lower() not in ('0', 'false', 'no', 'off')
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """ファイル全体のSHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def video_identity(path):
+    """動画ファイルの同一性キー（サイズ＋先頭・中央・末尾のサンプルハッシュ）
+
+    数GBの動画を毎回全読みしないよう、サイズと3箇所のサンプルだけを見る。
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(path, 'rb') as f:
+        for offset in (0, max(0, size // 2 - VIDEO_SAMPLE_BYTES // 2), max(0, size - VIDEO_SAMPLE_BYTES)):
+            f.seek(offset)
+            digest.update(f.read(VIDEO_SAMPLE_BYTES))
+    return f"{size}-{digest.hexdigest()}"
+
+def make_cache_key(video_path, subtitle_path, filter_name, force_style, encoder_args):
+    """レンダリング結果を一意に決めるキーを作成
+
+    動画の同一性・実際にFFmpegへ渡す字幕ファイルの内容・フィルタ種別と
+    force_style（ASSヘッダーは字幕内容に含まれる）・エンコーダ設定から作る。
+    """
+    key_source = {
+        'video': video_identity(video_path),
+        'subtitle': file_sha256(subtitle_path),
+        'filter': filter_name,
+        'force_style': force_style or '',
+        'encoder': list(encoder_args),
+    }
+    payload = json.dumps(key_source, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+def link_or_copy(src, dst):
+    """ハードリンクを試し、別ファイルシステムなどで失敗したらコピー
+
+    一時ファイルに作ってから置き換えるので、コピー途中のファイルが dst に見えることはない。
+    """
+    with atomic_output(dst) as output:
+        try:
+            os.link(src, output.path)
+            method = 'link'
+        except OSError:
+            shutil.copy2(src, output.path)
+            method = 'copy'
+        output.commit()
+    return method
+
+class RenderCache:
+    """字幕合成結果のコンテンツアドレス型キャッシュ（サイズ上限付きLRU）"""
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        self.objects_dir = os.path.join(self.cache_dir, OBJECTS_DIRNAME)
+        self.index_path = os.path.join(self.cache_dir, INDEX_FILENAME)
+        self.lock_path = os.path.join(self.cache_dir, LOCK_FILENAME)
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    def object_path(self, key):
+        """キーに対応するキャッシュ本体のパス"""
+        return os.path.join(self.objects_dir, key[:2], f"{key}.mp4")
+
+    @contextmanager
+    def _locked_index(self):
+        """インデックスを排他ロックして読み書きする"""
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                index = self._read_index()
+                yield index
+                self._write_index(index)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.index_path)
+
+    def lookup(self, key, output_path):
+        """キャッシュヒット時は出力先へリンク/コピーしてTrueを返す"""
+        object_path = self.object_path(key)
+        with self._locked_index() as index:
+            entry = index.get(key)
+            if entry is None or not os.path.exists(object_path):
+                index.pop(key, None)
+                record_cache('render', False)
+                return False
+            method = link_or_copy(object_path, output_path)
+            entry['last_access'] = time.time()
+            entry['hits'] = entry.get('hits', 0) + 1
+        record_cache('render', True)
+        print(f"  ♻️ キャッシュヒット ({method}): {key[:12]}")
+        return True
+
+    def store(self, key, output_path, metadata=None):
+        """レンダリング結果をキャッシュに登録し、上限を超えたら古いものから削除"""
+        object_path = self.object_path(key)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        link_or_copy(output_path, object_path)
+        now = time.time()
+        with self._locked_index() as index:
+            index[key] = dict(metadata or {},
+                              size=os.path.getsize(object_path),
+                              created=now,
+                              last_access=now,
+                              hits=0)
+            self._evict(index)
+
+    def _evict(self, index):
+        """合計サイズが上限以下になるまで最終アクセスの古い順に削除"""
+        total = sum(entry.get('size', 0) for entry in index.values())
+        for key, entry in sorted(index.items(), key=lambda item: item[1].get('last_access', 0)):
+            if total <= self.max_bytes:
+                break
+            object_path = self.object_path(key)
+            if os.path.exists(object_path):
+                os.remove(object_path)
+            total -= entry.get('size', 0)
+            del index[key]
+            print(f"  🧹 キャッシュ削除: {key[:12]} ({entry.get('output_name', '')})")
+
+    def entries(self):
+        """キャッシュエントリ一覧（最終アクセスの新しい順）"""
+        with self._locked_index() as index:
+            return sorted(index.items(), key=lambda item: item[1].get('last_access', 0), reverse=True)
+
+    def purge(self, older_than_days=None):
+        """キャッシュを削除（日数指定時はそれより古いものだけ）"""
+        removed = 0
+        cutoff = None if older_than_days is None else time.time() - older_than_days * 86400
+        with self._locked_index() as index:
+            for key in list(index):
+                if cutoff is not None and index[key].get('last_access', 0) >= cutoff:
+                    continue
+                object_path = self.object_path(key)
+                if os.path.exists(object_path):
+                    os.remove(object_path)
+                del index[key]
+                removed += 1
+        return removed
+
+def render_records_dir(cache_dir=None, variant=None):
+    """合成記録の保存先（variant ごとにサブディレクトリを分ける）"""
+    renders_dir = os.path.join(cache_dir or DEFAULT_CACHE_DIR, RENDERS_DIRNAME)
+    return os.path.join(renders_dir, variant) if variant else renders_dir
+
+def record_render(subtitle_path, video_path, output_path, details=None, cache_dir=None, variant=None):
+    """合成に使った字幕のスナップショットを保存
+
+    プレビューや差分再レンダリングの比較元として使う。details にはフィルタや
+    エンコード設定など、前回出力を再利用できるか判定するための情報を入れる。
+    同じ字幕を複数のスタイルで合成する場合は variant（出力ファイル名など）で記録を分ける。
+    variant を付けた記録とは別に、字幕ファイル名だけの記録（最後の合成）も更新する。
+    """
+    subtitle_name = os.path.basename(subtitle_path)
+    record = None
+    for key in ([variant, None] if variant else [None]):
+        renders_dir = render_records_dir(cache_dir, key)
+        os.makedirs(renders_dir, exist_ok=True)
+        snapshot_path = os.path.join(renders_dir, subtitle_name)
+        shutil.copy2(subtitle_path, snapshot_path)
+        entry = {
+            'subtitle_name': subtitle_name,
+            'subtitle_snapshot': snapshot_path,
+            'video_path': video_path,
+            'output_path': output_path,
+            'variant': variant,
+            'rendered_at': time.time(),
+        }
+        entry.update(details or {})
+        with open(f"{snapshot_path}.json", 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+        record = record or entry
+    return record
+
+def last_render(subtitle_name, cache_dir=None, variant=None):
+    """字幕ファイル名（と variant）に対応する前回の合成記録を返す（無ければNone）"""
+    record_path = os.path.join(render_records_dir(cache_dir, variant), f"{os.path.basename(subtitle_name)}.json")
+    try:
+        with open(record_path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(record.get('subtitle_snapshot', '')):
+        return None
+    return record
+
+def parse_arguments():
+    """引数解析"""
+    parser = argparse.ArgumentParser(description='字幕合成レンダーキャッシュの確認・削除')
+    parser.add_argument('command', choices=['list', 'stats', 'purge'], help='実行する操作')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='キャッシュディレクトリ')
+    parser.add_argument('--older-than', type=float, help='purge時: 指定日数より古いものだけ削除')
+    return parser.parse_args()
+
+def main():
+    """メイン処理"""
+    args = parse_arguments()
+    cache = RenderCache(args.cache_dir)
+
+    if args.command == 'list':
+        entries = cache.entries()
+        print(f"📦 キャッシュ: {args.cache_dir} ({len(entries)}件)")
+        for key, entry in entries:
+            last_access = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry.get('last_access', 0)))
+            print(f"  - {key[:12]} {entry.get('size', 0) / (1024*1024):8.1f} MB  "
+                  f"hits={entry.get('hits', 0):<3} {last_access}  {entry.get('output_name', '')}")
+    elif args.command == 'stats':
+        entries = cache.entries()
+        total = sum(entry.get('size', 0) for _, entry in entries)
+        hits = sum(entry.get('hits', 0) for _, entry in entries)
+        print(f"📦 キャッシュ: {args.cache_dir}")
+        print(f"  📊 エントリ数: {len(entries)}")
+        print(f"  💾 使用量: {total / (1024*1024):.1f} MB / {cache.max_bytes / (1024*1024):.1f} MB")
+        print(f"  ♻️ 累計ヒット: {hits}")
+    elif args.command == 'purge':
+        removed = cache.purge(args.older_than)
+        print(f"🧹 {removed}件のキャッシュを削除しました")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+import resource
+import threading
+from contextlib import contextmanager
+
+from profiling import profile_stage, profiling_enabled
+
+# 実行レポートの保存先（環境変数で上書き可能）
+# SUBTITLE_REPORT_DIR: レポートの保存先（デフォルト: .run_reports）
+# SUBTITLE_RUN_REPORT=0: レポートを作らない
+REPORT_DIR = os.environ.get('SUBTITLE_REPORT_DIR', '.run_reports')
+# 全実行のレポートを1行ずつ追記するファイル（集計用）
+INDEX_FILENAME = 'runs.jsonl'
+
+_current = None
+_local = threading.local()
+# 段階の完了・キャッシュの参照・レポートの保存を受け取る関数（metrics.py が登録する）
+_listeners = []
+
+def reports_enabled():
+    return os.environ.get('SUBTITLE_RUN_REPORT', '1').lower() not in ('0', 'false', 'no', 'off')
+
+def io_counters():
+    """このプロセスと回収済みの子プロセスの読み書きバイト数（/proc/self/io、取得できなければ空）"""
+    counters = {}
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('rchar', 'wchar', 'read_bytes', 'write_bytes'):
+                    counters[key] = int(value)
+    except OSError:
+        pass
+    return counters
+
+def cpu_seconds():
+    """自プロセスと回収済みの子プロセス（FFmpegなど）のCPU時間"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+def peak_rss():
+    """最大常駐メモリ（バイト）: (自プロセス, 子プロセスの最大)"""
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale)
+
+def io_delta(before, after):
+    return {key: after[key] - before[key] for key in after if key in before}
+
+def add_listener(callback):
+    """callback(kind, data) を登録（kind: 'stage', 'cache', 'report'）"""
+    _listeners.append(callback)
+
+def remove_listener(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+def notify(kind, data):
+    for callback in list(_listeners):
+        try:
+            callback(kind, data)
+        except Exception as e:
+            print(f"⚠️ 計測の通知でエラー: {e}")
+
+def _stage_stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+def add_derived_metrics(entry):
+    """fps・実時間比などの派生値を追加"""
+    if entry.get('frames') and entry.get('ffmpeg_seconds'):
+        entry['fps'] = round(entry['frames'] / entry['ffmpeg_seconds'], 2)
+    if entry.get('audio_seconds'):
+        entry['realtime_factor'] = round(entry['wall'] / entry['audio_seconds'], 4)
+    return entry
+
+class RunReport:
+    """1回の実行の段階別・ファイル別の計測結果
+
+    段階は stage() で囲む。CPU時間・読み書きバイト数はプロセス全体の差分なので、
+    並列に動く段階（レンダリングワーカーなど）では互いの分が含まれる。
+    """
+
+    def __init__(self, command, argv=None):
+        self.command = command
+        self.argv = list(sys.argv[1:] if argv is None else argv)
+        self.run_id = f"{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}"
+        self.started = time.time()
+        self.stages = []
+        self.ffmpeg = {'runs': 0, 'frames': 0, 'ffmpeg_seconds': 0.0, 'media_seconds': 0.0}
+        self.cache = {}
+        self._perf_start = time.perf_counter()
+        self._cpu_start = cpu_seconds()
+        self._io_start = io_counters()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, file=None, **metrics):
+        """段階を計測（yield した辞書に audio_seconds などの指標を追加できる）"""
+        entry = dict(metrics, stage=name)
+        if file:
+            entry['file'] = file
+        stack = _stage_stack()
+        stack.append(entry)
+        perf_start = time.perf_counter()
+        cpu_start = cpu_seconds()
+        io_start = io_counters()
+        try:
+            yield entry
+        except BaseException as e:
+            entry['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            stack.pop()
+            entry['wall'] = round(time.perf_counter() - perf_start, 6)
+            entry['cpu'] = round(cpu_seconds() - cpu_start, 6)
+            entry.update({f"{key}_delta": value for key, value in io_delta(io_start, io_counters()).items()})
+            entry['peak_rss'] = peak_rss()[0]
+            add_derived_metrics(entry)
+            with self._lock:
+                self.stages.append(entry)
+            if _listeners:
+                notify('stage', {'command': self.command, 'entry': entry})
+
+    def record_ffmpeg(self, label, stats):
+        """FFmpegの実行結果（フレーム数・処理時間）を実行中の段階と全体に加算"""
+        values = {
+            'frames': stats.get('frame') or 0,
+            'ffmpeg_seconds': stats.get('elapsed') or 0.0,
+            'media_seconds': stats.get('out_time') or 0.0,
+        }
+        benchmark = stats.get('benchmark') or {}
+        for key in ('utime', 'stime', 'rtime'):
+            if key in benchmark:
+                values[f"ffmpeg_{key}"] = benchmark[key]
+        stack = _stage_stack()
+        with self._lock:
+            self.ffmpeg['runs'] += 1
+            for key, value in values.items():
+                self.ffmpeg[key] = self.ffmpeg.get(key, 0) + value
+            if stack:
+                entry = stack[-1]
+                entry['ffmpeg_runs'] = entry.get('ffmpeg_runs', 0) + 1
+                for key, value in values.items():
+                    entry[key] = entry.get(key, 0) + value
+
+    def record_cache(self, name, hit):
+        """キャッシュの参照結果（ヒット/ミス）を実行中の段階と全体に加算"""
+        key = 'hits' if hit else 'misses'
+        stack = _stage_stack()
+        with self._lock:
+            counts = self.cache.setdefault(name, {'hits': 0, 'misses': 0})
+            counts[key] += 1
+            if stack:
+                stack[-1][f"cache_{key}"] = stack[-1].get(f"cache_{key}", 0) + 1
+
+    def to_dict(self, status):
+        own_rss, children_rss = peak_rss()
+        ffmpeg = dict(self.ffmpeg)
+        if ffmpeg['frames'] and ffmpeg['ffmpeg_seconds']:
+            ffmpeg['fps'] = round(ffmpeg['frames'] / ffmpeg['ffmpeg_seconds'], 2)
+        return {
+            'run_id': self.run_id,
+            'command': self.command,
+            'argv': self.argv,
+            'status': status,
+            'host': os.uname().nodename if hasattr(os, 'uname') else None,
+            'pid': os.getpid(),
+            'started': self.started,
+            'finished': time.time(),
+            'wall': round(time.perf_counter() - self._perf_start, 6),
+            'cpu': round(cpu_seconds() - self._cpu_start, 6),
+            'peak_rss': own_rss,
+            'peak_rss_children': children_rss,
+            'io': io_delta(self._io_start, io_counters()),
+            'ffmpeg': ffmpeg,
+            'cache': self.cache,
+            'stages': self.stages,
+        }
+
+    def write(self, status, directory=None):
+        """レポートをJSONで保存し、集計用の runs.jsonl にも1行追記"""
+        directory = directory or REPORT_DIR
+        report = self.to_dict(status)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.command}_{self.run_id}.json")
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+        # 1回の write で追記するので、同時に実行しても行が混ざらない
+        line = json.dumps(report, ensure_ascii=False, separators=(',', ':')) + '\n'
+        fd = os.open(os.path.join(directory, INDEX_FILENAME), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line.encode('utf-8'))
+        finally:
+            os.close(fd)
+        return path, report
+
+def format_bytes(value):
+    value = float(value or 0)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024 or unit == 'GB':
+            return f"{value:.1f}{unit}" if unit != 'B' else f"{int(value)}B"
+        value /= 1024
+
+def summarize_stages(stages):
+    """段階名ごとに集計（回数・合計時間・CPU・フレーム・音声の長さ）"""
+    summary = {}
+    for entry in stages:
+        item = summary.setdefault(entry['stage'], {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'frames': 0,
+                                                   'ffmpeg_seconds': 0.0, 'audio_seconds': 0.0, 'errors': 0})
+        item['count'] += 1
+        item['wall'] += entry.get('wall', 0.0)
+        item['cpu'] += entry.get('cpu', 0.0)
+        item['frames'] += entry.get('frames', 0)
+        item['ffmpeg_seconds'] += entry.get('ffmpeg_seconds', 0.0)
+        item['audio_seconds'] += entry.get('audio_seconds', 0.0) or 0.0
+        item['errors'] += 1 if entry.get('error') else 0
+    return summary
+
+def print_summary(report, path=None):
+    """人が読む形の要約を表示"""
+    io = report['io']
+    print(f"\n📊 実行レポート: {report['command']} ({report['status']})")
+    print(f"  ⏱️ 経過 {report['wall']:.1f}秒  CPU {report['cpu']:.1f}秒"
+          f"  最大メモリ {format_bytes(report['peak_rss'])}"
+          f"（子プロセス {format_bytes(report['peak_rss_children'])}）")
+    if io:
+        print(f"  💽 読み込み {format_bytes(io.get('rchar'))}  書き込み {format_bytes(io.get('wchar'))}"
+              f"（ディスク 読み {format_bytes(io.get('read_bytes'))} / 書き {format_bytes(io.get('write_bytes'))}）")
+    if report['ffmpeg']['runs']:
+        ffmpeg = report['ffmpeg']
+        print(f"  🎬 FFmpeg {ffmpeg['runs']}回  {ffmpeg['frames']}フレーム  {ffmpeg['ffmpeg_seconds']:.1f}秒"
+              f"{'  ' + str(ffmpeg['fps']) + ' fps' if ffmpeg.get('fps') else ''}")
+    for name, counts in report.get('cache', {}).items():
+        print(f"  ♻️ キャッシュ {name}: ヒット {counts['hits']} / ミス {counts['misses']}")
+    for name, item in summarize_stages(report['stages']).items():
+        extra = []
+        if item['frames'] and item['ffmpeg_seconds']:
+            extra.append(f"{item['frames'] / item['ffmpeg_seconds']:.1f} fps")
+        if item['audio_seconds']:
+            extra.append(f"実時間比 {item['wall'] / item['audio_seconds']:.3f}")
+        if item['errors']:
+            extra.append(f"エラー {item['errors']}")
+        print(f"  {name:<12} {item['wall']:8.1f}秒  CPU {item['cpu']:8.1f}秒  x{item['count']}"
+              f"{'  ' + '  '.join(extra) if extra else ''}")
+    if path:
+        print(f"  💾 {path}")
+
+# ---------------------------------------------------------------- 呼び出し側のAPI
+
+def start_report(command, argv=None):
+    """実行レポートを開始（無効なら None）"""
+    global _current
+    _current = RunReport(command, argv) if reports_enabled() else None
+    return _current
+
+def current_report():
+    return _current
+
+def discard_report():
+    """実行レポートを保存せずに終了"""
+    global _current
+    _current = None
+
+def finish_report(status='ok', quiet=False):
+    """実行レポートを保存して要約を表示"""
+    global _current
+    report, _current = _current, None
+    if report is None:
+        return None
+    try:
+        path, data = report.write(status)
+    except OSError as e:
+        print(f"⚠️ 実行レポートを保存できません: {e}")
+        return None
+    if _listeners:
+        notify('report', data)
+    if not quiet:
+        print_summary(data, path)
+    return path
+
+@contextmanager
+def stage(name, file=None, **metrics):
+    """段階を計測（レポートが無効なら何もしない）
+
+        with stage('transcribe', file=filename) as entry:
+            entry['audio_seconds'] = 動画の長さ
+
+    プロファイリング（profiling.py）が有効なら段階ごとに cProfile / tracemalloc も動かす。
+    """
+    if profiling_enabled():
+        with profile_stage(name, file), _measure_stage(name, file, metrics) as entry:
+            yield entry
+        return
+    with _measure_stage(name, file, metrics) as entry:
+        yield entry
+
+@contextmanager
+def _measure_stage(name, file, metrics):
+    if _current is None:
+        yield dict(metrics)
+        return
+    with _current.stage(name, file, **metrics) as entry:
+        yield entry
+
+def record_ffmpeg(label, stats):
+    if _current is not None:
+        _current.record_ffmpeg(label, stats)
+
+def record_cache(name, hit):
+    """キャッシュの参照結果を記録（name: 'render', 'build' など）"""
+    if _current is not None:
+        _current.record_cache(name, hit)
+    if _listeners:
+        notify('cache', {'cache': name, 'hit': hit})
+
+def probe_media_seconds(path):
+    """実時間比の計算用に動画・音声の長さを取得（レポート無効時・取得失敗時は None）"""
+    if _current is None:
+        return None
+    from ffmpeg_runner import probe_duration
+    try:
+        return probe_duration(path)
+    except (RuntimeError, ValueError, OSError):
+        return None
+
+@contextmanager
+def run_report(command):
+    """エントリーポイント全体を囲んで実行レポートを作る
+
+        if __name__ == "__main__":
+            with run_report('apply_subtitles'):
+                main()
+
+    --help（終了コード0）や引数の誤り（argparse の終了コード2）で段階を1つも実行せずに
+    SystemExit した場合はレポートを残さない。それ以外の終了コードは失敗として記録する。
+    """
+    report = start_report(command)
+    status = 'ok'
+    try:
+        yield report
+    except SystemExit as e:
+        if (report is not None and e.code in (0, 2)
+                and not report.stages and not report.ffmpeg['runs']):
+            discard_report()
+            raise
+        status = 'ok' if e.code in (None, 0) else 'failed'
+        raise
+    except KeyboardInterrupt:
+        status = 'interrupted'
+        raise
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        finish_report(status)
+
+# ---------------------------------------------------------------- 集計
+
+def load_reports(directory=None, command=None, since=None):
+    """runs.jsonl（なければ個別のJSON）から実行レポートを読み込む"""
+    directory = directory or REPORT_DIR
+    reports = []
+    index_path = os.path.join(directory, INDEX_FILENAME)
+    if os.path.exists(index_path):
+        with open(index_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    reports.append(json.loads(line))
+                except ValueError:
+                    continue
+    else:
+        for path in sorted(glob.glob(os.path.join(glob.escape(directory), '*.json'))):
+            with open(path, encoding='utf-8') as f:
+                reports.append(json.load(f))
+    return [report for report in reports
+            if (command is None or report['command'] == command) and (since is None or report['started'] >= since)]
+
+def percentile(values, ratio):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(ratio * (len(values) - 1))))]
+
+def aggregate(reports):
+    """コマンド・段階ごとに複数回の実行を集計"""
+    result = {}
+    for report in reports:
+        command = result.setdefault(report['command'], {'runs': 0, 'failed': 0, 'wall': [], 'stages': {}})
+        command['runs'] += 1
+        command['failed'] += 0 if report['status'] == 'ok' else 1
+        command['wall'].append(report['wall'])
+        for entry in report['stages']:
+            item = command['stages'].setdefault(entry['stage'], {'wall': [], 'fps': [], 'realtime_factor': []})
+            item['wall'].append(entry['wall'])
+            if entry.get('fps'):
+                item['fps'].append(entry['fps'])
+            if entry.get('realtime_factor'):
+                item['realtime_factor'].append(entry['realtime_factor'])
+    return result
+
+def print_aggregate(result):
+    for name, command in sorted(result.items()):
+        walls = command['wall']
+        print(f"\n📋 {name}: {command['runs']}回（失敗 {command['failed']}）"
+              f"  平均 {sum(walls) / len(walls):.1f}秒  p95 {percentile(walls, 0.95):.1f}秒")
+        for stage_name, item in command['stages'].items():
+            walls = item['wall']
+            extra = []
+            if item['fps']:
+                extra.append(f"平均 {sum(item['fps']) / len(item['fps']):.1f} fps")
+            if item['realtime_factor']:
+                extra.append(f"実時間比 {sum(item['realtime_factor']) / len(item['realtime_factor']):.3f}")
+            print(f"  {stage_name:<12} x{len(walls):<5} 合計 {sum(walls):9.1f}秒  平均 {sum(walls) / len(walls):7.2f}秒"
+                  f"  p50 {percentile(walls, 0.5):7.2f}秒  p95 {percentile(walls, 0.95):7.2f}秒"
+                  f"{'  ' + '  '.join(extra) if extra else ''}")
+
+def parse_arguments():
+    """引数解析"""
+    parser = argparse.ArgumentParser(description='実行レポートの集計')
+    parser.add_argument('--dir', default=REPORT_DIR, help='レポートの保存先')
+    parser.add_argument('--command', help='集計するコマンド（例: apply_subtitles）')
+    parser.add_argument('--hours', type=float, help='直近N時間の実行だけを集計')
+    parser.add_argument('--json', action='store_true', help='集計結果をJSONで出力')
+    return parser.parse_args()
+
+def main():
+    """メイン処理"""
+    args = parse_arguments()
+    since = time.time() - args.hours * 3600 if args.hours else None
+    reports = load_reports(args.dir, args.command, since)
+    if not reports:
+        print(f"📭 実行レポートがありません: {args.dir}")
+        return
+    result = aggregate(reports)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_aggregate(result)
+
+if __name__ == "__main__":
+    main()
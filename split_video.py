@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import sys
+import csv
+import json
+import time
+import glob
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from ffmpeg_runner import run_ffmpeg
+from incremental_render import probe_keyframes, KEYFRAME_EPSILON
+from run_report import run_report, stage
+from workspace import input_path
+
+# 分割マニフェストのファイル名（split/videos/<名前>.split.json）
+MANIFEST_SUFFIX = '.split.json'
+
+# 無音検出の設定
+SILENCE_NOISE = '-35dB'
+SILENCE_MIN_DURATION = 0.4
+
+SILENCE_START_PATTERN = re.compile(r'silence_start: (-?\d+(?:\.\d+)?)')
+SILENCE_END_PATTERN = re.compile(r'silence_end: (-?\d+(?:\.\d+)?)')
+
+def part_filename(base_name, index):
+    return f"{base_name}_part{index:02d}.mp4"
+
+def manifest_path(output_dir, base_name):
+    return os.path.join(output_dir, f"{base_name}{MANIFEST_SUFFIX}")
+
+def detect_silences(video_path, noise=SILENCE_NOISE, min_duration=SILENCE_MIN_DURATION):
+    """音声の無音区間 [(開始, 終了), ...] を silencedetect で取得（音声だけをデコード）"""
+    cmd = [
+        'ffmpeg', '-v', 'info', '-nostats',
+        '-i', input_path(video_path),
+        '-map', '0:a:0', '-vn',
+        '-af', f"silencedetect=n={noise}:d={min_duration}",
+        '-f', 'null', '-'
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, errors='replace')
+    if result.returncode != 0:
+        print(f"⚠️ 無音検出に失敗したためキーフレームのみで分割します")
+        return []
+
+    silences = []
+    start = None
+    for line in result.stderr.splitlines():
+        match = SILENCE_START_PATTERN.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = SILENCE_END_PATTERN.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    return silences
+
+def silence_distance(time_point, silences):
+    """時刻から最も近い無音区間までの距離（無音区間内なら0）"""
+    if not silences:
+        return float('inf')
+    return min(0.0 if start <= time_point <= end else min(abs(time_point - start), abs(time_point - end))
+               for start, end in silences)
+
+def choose_cut_points(keyframes, duration, segment_length, window, silences=None, min_tail=1.0):
+    """分割位置を決める
+
+    目標は segment_length の倍数（誤差が積み重ならないよう前の分割位置ではなく
+    0秒からの倍数）。ストリームコピーで切れるのはキーフレームだけなので、目標から
+    ±window 秒以内のキーフレームを候補にし、無音区間が分かっていれば無音に近い
+    キーフレームを優先する。候補がなければ目標に最も近いキーフレームを使う。
+    """
+    cuts = []
+    last_cut = 0.0
+    index = 1
+    while index * segment_length < duration - min_tail:
+        target = index * segment_length
+        index += 1
+        candidates = [kf for kf in keyframes if kf > last_cut + min_tail and kf < duration - min_tail]
+        if not candidates:
+            break
+        nearby = [kf for kf in candidates if abs(kf - target) <= window]
+        if nearby and silences:
+            cut = min(nearby, key=lambda kf: (round(silence_distance(kf, silences), 1), abs(kf - target)))
+        else:
+            cut = min(nearby or candidates, key=lambda kf: abs(kf - target))
+        if cuts and abs(cut - cuts[-1]) < KEYFRAME_EPSILON:
+            continue
+        cuts.append(cut)
+        last_cut = cut
+    return cuts
+
+def read_segment_list(list_path):
+    """segment muxer の CSV（ファイル名,開始,終了）を読む"""
+    entries = []
+    with open(list_path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if len(row) >= 3:
+                entries.append((row[0], float(row[1]), float(row[2])))
+    return entries
+
+def split_video(input_video, segment_length=600, output_dir='split/videos', snap='keyframe', window=None):
+    """キーフレーム位置で動画を1パスで分割し、各パートの実際の開始時刻をマニフェストに記録"""
+    if not os.path.isfile(input_video):
+        print(f"❌ ファイルが見つかりません: {input_video}")
+        return None
+
+    base_name = os.path.splitext(os.path.basename(input_video))[0]
+    window = segment_length * 0.1 if window is None else window
+
+    print("🔄 動画分割開始")
+    print(f"📹 入力ファイル: {input_video}")
+    print(f"⏱️  分割時間: {segment_length}秒 ({segment_length / 60:.1f}分)")
+    print(f"🎯 分割位置: {'無音に近いキーフレーム' if snap == 'silence' else 'キーフレーム'} (目標±{window:.0f}秒)")
+    print(f"📁 出力先: {output_dir}/")
+
+    started = time.time()
+    # キーフレームの位置はパケットのフラグだけを読んで取得（デコードなし）
+    keyframes, duration = probe_keyframes(input_video)
+    print(f"📊 動画情報:")
+    print(f"  総時間: {duration:.1f}秒 ({duration / 60:.1f}分)")
+    print(f"  キーフレーム: {len(keyframes)}個")
+
+    silences = None
+    if snap == 'silence':
+        silences = detect_silences(input_video)
+        print(f"  無音区間: {len(silences)}個")
+
+    cuts = choose_cut_points(keyframes, duration, segment_length, window, silences)
+    print(f"  分割数: {len(cuts) + 1}個")
+
+    # 出力先と同じファイルシステムの作業ディレクトリに書き、完成後に置き換える
+    os.makedirs(output_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix='.split_', dir=output_dir)
+    try:
+        list_path = os.path.join(work_dir, 'segments.csv')
+        cmd = [
+            'ffmpeg', '-y', '-v', 'error',
+            '-i', input_path(input_video),
+            '-map', '0:v:0', '-map', '0:a?',
+            '-c', 'copy',
+            '-f', 'segment',
+            '-reset_timestamps', '1',
+            '-avoid_negative_ts', 'make_zero',
+            '-segment_list', list_path,
+            '-segment_list_type', 'csv',
+        ]
+        if cuts:
+            cmd += ['-segment_times', ','.join(f"{max(0.0, t - KEYFRAME_EPSILON):.6f}" for t in cuts)]
+        else:
+            cmd += ['-segment_time', str(duration + 1)]
+        cmd.append(os.path.join(work_dir, 'part%02d.mp4'))
+
+        print("\n🎬 分割処理開始（1パス）...")
+        result = run_ffmpeg(cmd, label=base_name, duration=duration)
+        if result.returncode != 0:
+            print(f"❌ 分割失敗: {result.stderr}")
+            return None
+
+        segments = read_segment_list(list_path)
+        if len(segments) == len(cuts) + 1:
+            # 切れ目は選んだキーフレームそのもの（リストの時刻はオーディオの先行分だけずれることがある）
+            edges = [0.0] + cuts + [duration]
+            segments = [(segment_file, start, end)
+                        for (segment_file, _, _), start, end in zip(segments, edges[:-1], edges[1:])]
+
+        # 前回の分割の残り（パート数が減った場合など）を削除してから配置
+        for old_part in glob.glob(os.path.join(glob.escape(output_dir), f"{glob.escape(base_name)}_part[0-9][0-9].mp4")):
+            os.remove(old_part)
+
+        parts = []
+        for index, (segment_file, start, end) in enumerate(segments):
+            filename = part_filename(base_name, index)
+            os.replace(os.path.join(work_dir, segment_file), os.path.join(output_dir, filename))
+            parts.append({
+                'index': index,
+                'file': filename,
+                'start': round(start, 6),
+                'end': round(end, 6),
+                'duration': round(end - start, 6),
+            })
+            size = os.path.getsize(os.path.join(output_dir, filename))
+            print(f"  📹 Part {index + 1}/{len(segments)}: {filename}")
+            print(f"     開始時間: {start:.3f}秒 ({int(start) // 60}分{start % 60:.3f}秒)  長さ: {end - start:.3f}秒"
+                  f"  サイズ: {size / (1024 * 1024):.1f} MB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    manifest = {
+        'source': os.path.abspath(input_video),
+        'source_duration': duration,
+        'segment_length': segment_length,
+        'snap': snap,
+        'created': time.time(),
+        'parts': parts,
+    }
+    path = manifest_path(output_dir, base_name)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+    print(f"\n🎉 分割完了! ({time.time() - started:.1f}秒)")
+    print(f"📋 マニフェスト: {path}")
+    return manifest
+
+def load_manifest(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def find_manifests(directory):
+    """ディレクトリ内の分割マニフェストを {元動画のベース名: マニフェスト} で返す"""
+    manifests = {}
+    for path in sorted(glob.glob(os.path.join(glob.escape(directory), f"*{MANIFEST_SUFFIX}"))):
+        base_name = os.path.basename(path)[:-len(MANIFEST_SUFFIX)]
+        manifests[base_name] = load_manifest(path)
+    return manifests
+
+def parse_arguments():
+    """引数解析"""
+    parser = argparse.ArgumentParser(description='動画をキーフレーム位置で1パス分割（分割専用フォルダ対応）')
+    parser.add_argument('input_video', help='入力動画ファイル')
+    parser.add_argument('segment_length', nargs='?', type=float, default=600, help='分割時間（秒、デフォルト: 600）')
+    parser.add_argument('--output-dir', default='split/videos', help='分割した動画の出力先')
+    parser.add_argument('--snap', choices=['keyframe', 'silence'], default='keyframe',
+                        help='分割位置の決め方（silence: 目標付近の無音に近いキーフレームを優先）')
+    parser.add_argument('--window', type=float, help='目標位置から探す範囲（秒、デフォルト: 分割時間の10%%）')
+    return parser.parse_args()
+
+def main():
+    """メイン処理"""
+    args = parse_arguments()
+
+    # 分割専用のフォルダ構造を作成
+    for directory in ('split/videos', 'split/output', 'split/merged_videos', 'split/marker_output'):
+        os.makedirs(directory, exist_ok=True)
+
+    with stage('split', file=os.path.basename(args.input_video)):
+        manifest = split_video(args.input_video, args.segment_length, args.output_dir, args.snap, args.window)
+    if manifest is None:
+        sys.exit(1)
+
+    print("")
+    print("📁 作成されたフォルダ構造:")
+    print("  split/")
+    print("  ├── videos/         # 分割された動画ファイル + 分割マニフェスト")
+    print("  ├── output/         # 字幕ファイル（SRT/ASS）")
+    print("  ├── marker_output/  # マーカー処理済み字幕")
+    print("  └── merged_videos/  # 字幕付き動画")
+    print("")
+    print("📋 次のステップ:")
+    print("  ./split_workflow.sh generate  # 分割動画の字幕生成")
+
+if __name__ == "__main__":
+    with run_report('split_video'):
+        main()
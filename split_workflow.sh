@@ -128,20 +128,14 @@ case "$1" in
         
         echo "📊 発見された分割SRTファイル: ${srt_count}個"
         
-        # ベース名を自動検出
-        first_srt=$(find split/output -name "*_part00_editable.srt" -type f 2>/dev/null | head -1)
-        base_name=$(basename "$first_srt" | sed 's/_part00_editable\.srt$//')
-        
-        echo "🔍 自動検出されたベース名: $base_name"
-        echo "⏱️  分割時間: ${segment_length}秒"
-        
-        # 統合スクリプトを実行
-        ./combine_split_subtitles.sh "$base_name" "$segment_length"
+        # ベース名は分割マニフェスト（split/videos/*.split.json）から自動検出し、
+        # 各パートの開始時刻もマニフェストの値を使う（分割時間はマニフェストがない場合のみ）
+        python3 combine_split.py --segment-length "$segment_length" || exit 1
         
         echo ""
         echo "✅ Step 6 完了"
         echo "📝 通常のワークフローで続行可能:"
-        echo "   nano output/${base_name}_merged_editable.srt"
+        echo "   nano output/*_merged_editable.srt"
         echo "   ./marker_workflow.sh process --size 32 --color yellow --bold"
         echo "   ./marker_workflow.sh apply --size 32 --color yellow --bold"
         ;;
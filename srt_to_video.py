@@ -2,11 +2,17 @@
 # -*- coding: utf-8 -*-
 
 import os
-import subprocess
 import glob
 import argparse
 from pathlib import Path
 
+from ffmpeg_runner import run_ffmpeg
+from encoding_profiles import ENCODING_PROFILES, DEFAULT_PROFILE, resolve_encoder_args, write_encoding_log
+from workspace import atomic_output, input_path, escape_filter_path
+from run_report import run_report
+from subtitle_index import SubtitleIndex, find_pairs_file, PAIRS_FILENAME
+from style_presets import color_to_bgr, with_alpha, position_to_alignment, get_preset, preset_names
+
 def parse_arguments():
     """引数解析"""
     parser = argparse.ArgumentParser(description='SRTファイルから引数指定でスタイル付き動画作成')
@@ -21,30 +27,28 @@ def parse_arguments():
     # 新しく背景色のオプションを追加
     parser.add_argument('--background', default='none', help='背景色 (black, white, gray, none)')
     parser.add_argument('--background-alpha', type=float, default=0.8, help='背景の透明度 (0.0-1.0)')
+    # style_config.py のプリセット（指定すると上のスタイル引数の代わりにプリセットを使う）
+    parser.add_argument('--preset', choices=preset_names(), help='スタイルプリセット')
+    
+    # 動画と字幕の対応付け
+    parser.add_argument('--pairs', help=f"対応付けファイル（デフォルト: output/ の {PAIRS_FILENAME}）")
+    
+    # エンコード設定
+    parser.add_argument('--encoding-profile', default=DEFAULT_PROFILE, choices=list(ENCODING_PROFILES),
+                        help='エンコードプロファイル (preview, standard, archive)')
+    parser.add_argument('--target-time', type=float, help='目標エンコード時間（秒）- 試しエンコードでpresetを選ぶ')
+    parser.add_argument('--target-size', type=float, help='目標ファイルサイズ（MB）- 試しエンコードでCRFを選ぶ')
     
     return parser.parse_args()
 
-def color_to_hex(color_name):
-    """色名をFFmpeg用16進数に変換"""
-    colors = {
-        'white': '&H00FFFFFF',
-        'red': '&H000000FF',     # BGR: 0000FF (赤)
-        'blue': '&H00FF0000',    # BGR: FF0000 (青)
-        'green': '&H0000FF00',   # BGR: 00FF00 (緑)
-        'yellow': '&H0000FFFF',  # BGR: 00FFFF (黄)
-        'black': '&H00000000',   # BGR: 000000 (黒)
-        'cyan': '&H00FFFF00',    # BGR: FFFF00 (シアン)
-        'magenta': '&H00FF00FF', # BGR: FF00FF (マゼンタ)
-        'gray': '&H00808080'     # BGR: 808080 (グレー)
-    }
-    return colors.get(color_name.lower(), '&H00FFFFFF')
-
 def create_styled_video():
     """SRTからスタイル付き動画を作成"""
     
     args = parse_arguments()
     
     print("🎬 SRTからスタイル付き動画作成")
+    if args.preset:
+        print(f"🎨 プリセット: {args.preset}")
     print(f"📏 サイズ: {args.size}")
     print(f"🎨 色: {args.color}")
     print(f"💪 太字: {args.bold}")
@@ -55,6 +59,10 @@ def create_styled_video():
     print(f"🎯 背景: {args.background}")
     if args.background != 'none':
         print(f"👻 背景透明度: {args.background_alpha}")
+    if args.target_time or args.target_size:
+        print(f"⏱️ 目標: 時間={args.target_time or '-'}秒 サイズ={args.target_size or '-'}MB")
+    else:
+        print(f"🎞️ エンコード: {args.encoding_profile}")
     
     # ディレクトリ作成
     os.makedirs("merged_videos", exist_ok=True)
@@ -78,6 +86,9 @@ def create_styled_video():
     print(f"\n📹 動画ファイル: {len(video_files)}個")
     print(f"📝 SRTファイル: {len(srt_files)}個")
     
+    # SRTをベース名で索引しておく（動画ごとに全SRTを調べ直さない）
+    srt_index = SubtitleIndex(srt_files, args.pairs or find_pairs_file("output"))
+    
     processed_count = 0
     
     # 各動画に対して処理
@@ -85,20 +96,23 @@ def create_styled_video():
         video_name = os.path.splitext(os.path.basename(video_file))[0]
         
         # 対応するSRTファイルを探す
-        matching_srt = find_matching_srt(video_name, srt_files)
+        matching_srt = srt_index.best(video_file)
         
         if not matching_srt:
             print(f"⚠️ {video_name} に対応するSRTが見つかりません")
             continue
         
         # 出力ファイル名
-        style_suffix = f"s{args.size}_{args.color}"
-        if args.bold == 'true':
-            style_suffix += "_bold"
-        if args.italic == 'true':
-            style_suffix += "_italic"
-        if args.background != 'none':
-            style_suffix += f"_bg{args.background}"
+        if args.preset:
+            style_suffix = args.preset
+        else:
+            style_suffix = f"s{args.size}_{args.color}"
+            if args.bold == 'true':
+                style_suffix += "_bold"
+            if args.italic == 'true':
+                style_suffix += "_italic"
+            if args.background != 'none':
+                style_suffix += f"_bg{args.background}"
         
         output_file = f"merged_videos/{video_name}_{style_suffix}_styled.mp4"
         
@@ -118,90 +132,91 @@ def create_styled_video():
     
     print(f"\n🎉 処理完了: {processed_count}個のスタイル付き動画を作成")
 
-def find_matching_srt(video_name, srt_files):
-    """動画に対応するSRTファイルを検索"""
+def build_force_style(args):
+    """スタイル引数から subtitles フィルタの force_style を作る"""
+    
+    # 色をBGR形式に変換
+    color_hex = color_to_bgr(args.color)
+    
+    # 位置の設定
+    alignment = position_to_alignment(args.position)
+    
+    # スタイル文字列を構築
+    style_options = [
+        f"FontSize={args.size}",
+        f"PrimaryColour={color_hex}",
+        f"OutlineColour=&H00000000",
+        f"Outline={args.outline}",
+        f"Alignment={alignment}",
+        f"MarginV={args.margin}"
+    ]
+    
+    # 背景色の設定
+    if args.background != 'none':
+        # 透明度を考慮（0x80 = 50%, 0xFF = 100%）
+        background_color_with_alpha = with_alpha(color_to_bgr(args.background), args.background_alpha)
     
-    for srt_file in srt_files:
-        srt_name = os.path.splitext(os.path.basename(srt_file))[0]
-        
-        # 完全一致または部分一致
-        if video_name == srt_name or video_name in srt_name or srt_name in video_name:
-            return srt_file
+        style_options.extend([
+            f"BackColour={background_color_with_alpha}",
+            "BorderStyle=4"  # 背景ボックスを有効にする
+        ])
     
-    return None
+    # 太字・斜体の設定
+    if args.bold == 'true':
+        style_options.append("Bold=1")
+    if args.italic == 'true':
+        style_options.append("Italic=1")
+    
+    return ','.join(style_options)
 
 def merge_with_style(video_file, srt_file, output_file, args):
     """FFmpegでスタイル付き字幕を合成（背景対応版）"""
     
     try:
-        # 色を16進数に変換
-        color_hex = color_to_hex(args.color)
-        
-        # 位置の設定
-        alignment = 2  # bottom
-        if args.position == 'top':
-            alignment = 8
-        elif args.position == 'center':
-            alignment = 5
-        
-        # スタイル文字列を構築
-        style_options = [
-            f"FontSize={args.size}",
-            f"PrimaryColour={color_hex}",
-            f"OutlineColour=&H00000000",
-            f"Outline={args.outline}",
-            f"Alignment={alignment}",
-            f"MarginV={args.margin}"
-        ]
-        
-        # 背景色の設定
-        if args.background != 'none':
-            background_color = color_to_hex(args.background)
-            # 透明度を考慮（0x80 = 50%, 0xFF = 100%）
-            alpha_value = int(args.background_alpha * 255)
-            background_color_with_alpha = f"&H{alpha_value:02X}{background_color[3:]}"
-            
-            style_options.extend([
-                f"BackColour={background_color_with_alpha}",
-                "BorderStyle=4"  # 背景ボックスを有効にする
-            ])
-        
-        # 太字・斜体の設定
-        if args.bold == 'true':
-            style_options.append("Bold=1")
-        if args.italic == 'true':
-            style_options.append("Italic=1")
-        
-        force_style = ','.join(style_options)
-        
-        # FFmpegコマンド
-        cmd = [
-            'ffmpeg', '-y',
-            '-i', video_file,
-            '-vf', f"subtitles={srt_file}:force_style='{force_style}'",
-            '-c:a', 'copy',
-            '-c:v', 'libx264',
-            '-preset', 'medium',
-            '-crf', '23',
-            output_file
-        ]
+        if args.preset:
+            # コンパイル済みのプリセットの force_style をそのまま使う
+            force_style = get_preset(args.preset).force_style
+        else:
+            force_style = build_force_style(args)
         
+        video_filter = f"subtitles={escape_filter_path(srt_file)}:force_style='{force_style}'"
         print(f"  🔧 スタイル: {force_style}")
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=3600)
+        # エンコード設定（プロファイル、または目標時間・サイズから試しエンコードで決定）
+        encoder, decision = resolve_encoder_args(video_file, video_filter, {
+            'profile': args.encoding_profile,
+            'target_time': args.target_time,
+            'target_size': args.target_size,
+        })
+        
+        # 一時ファイルに書き出し、成功したら出力先に置き換える
+        with atomic_output(output_file) as output:
+            # FFmpegコマンド
+            cmd = [
+                'ffmpeg', '-y',
+                '-i', input_path(video_file),
+                '-vf', video_filter,
+            ] + encoder + [output.path]
+            
+            # 固定の制限時間ではなく、進捗が止まった場合だけ強制終了する
+            result = run_ffmpeg(cmd, label=os.path.basename(output_file))
+            if result.returncode == 0:
+                output.commit()
         
         if result.returncode == 0:
+            write_encoding_log(output_file, decision, encoder, result.stats['elapsed'])
             return True
+        elif result.stalled:
+            print(f"  ⏰ タイムアウト（進捗停止）")
+            return False
         else:
             print(f"  📝 FFmpegエラー: {result.stderr}")
             return False
             
-    except subprocess.TimeoutExpired:
-        print(f"  ⏰ タイムアウト")
-        return False
     except Exception as e:
         print(f"  ❌ エラー: {e}")
         return False
 
 if __name__ == "__main__":
-    create_styled_video()
+    with run_report('srt_to_video'):
+        create_styled_video()
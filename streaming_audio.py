@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""長時間の音声を一定の長さずつ読み込んで文字起こしする
+
+whisper の transcribe(パス) は音声全体を float32 の配列として読み込むため、6時間の録音では
+音声だけで約1.4GBになる。ここでは FFmpeg のパイプから 16kHz モノラルの PCM を一定の
+長さ（ウィンドウ）ずつ読み、ウィンドウごとに文字起こしする。
+
+ウィンドウの境界で発話が切れないよう、最後の区切りより後ろの音声は次のウィンドウの先頭に
+持ち越し、直前の文章はプロンプトとして次のウィンドウに渡す。メモリはウィンドウ＋持ち越し分
+だけなので、入力の長さに関係なく一定になる。
+"""
+
+import os
+import threading
+import subprocess
+from collections import deque
+
+from workspace import input_path
+
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2
+
+# ストリーミングの設定（環境変数で上書き可能）
+# SUBTITLE_STREAMING_AUDIO: auto（長い入力だけ）/ 1（常に）/ 0（使わない）
+# SUBTITLE_AUDIO_WINDOW: 1回に読み込む秒数（デフォルト: 600）
+# SUBTITLE_STREAMING_THRESHOLD: auto のとき、これより長い入力をストリーミングする秒数（デフォルト: 3600）
+STREAMING_MODE = os.environ.get('SUBTITLE_STREAMING_AUDIO', 'auto').lower()
+WINDOW_SECONDS = float(os.environ.get('SUBTITLE_AUDIO_WINDOW', '600'))
+STREAMING_THRESHOLD = float(os.environ.get('SUBTITLE_STREAMING_THRESHOLD', '3600'))
+# ウィンドウ末尾のこの秒数に掛かる区間は確定させず、次のウィンドウで認識し直す
+BOUNDARY_MARGIN = 5.0
+# 持ち越す音声の上限（無音が続いて区切りが見つからない場合）
+MAX_CARRY_SECONDS = 30.0
+# 次のウィンドウに渡すプロンプトの文字数
+PROMPT_CHARS = 200
+
+def streaming_enabled(duration):
+    """この長さ（秒、不明なら None）の入力をストリーミングで処理するか"""
+    if STREAMING_MODE in ('1', 'true', 'yes', 'on', 'always'):
+        return True
+    if STREAMING_MODE in ('0', 'false', 'no', 'off', 'never'):
+        return False
+    return duration is not None and duration > STREAMING_THRESHOLD
+
+def source_args(source):
+    """入力ファイルのパス、または FFmpeg の入力引数のリスト（-f lavfi -i ... など）"""
+    if isinstance(source, (list, tuple)):
+        return list(source)
+    return ['-i', input_path(source)]
+
+class AudioStream:
+    """FFmpegのパイプから 16kHz モノラルの音声を一定の長さずつ読む
+
+        with AudioStream(path, window_seconds=600) as stream:
+            for samples in stream:   # float32 の numpy 配列（最後以外は window_seconds 秒）
+                ...
+    """
+
+    def __init__(self, source, window_seconds=None, sample_rate=SAMPLE_RATE):
+        self.source = source
+        self.sample_rate = sample_rate
+        self.window_seconds = window_seconds or WINDOW_SECONDS
+        self.window_bytes = int(self.window_seconds * sample_rate) * BYTES_PER_SAMPLE
+        self.samples_read = 0
+        self.process = None
+        self._stderr_tail = deque(maxlen=20)
+        self._stderr_thread = None
+
+    def __enter__(self):
+        cmd = ['ffmpeg', '-nostdin', '-v', 'error', '-threads', '0'] + source_args(self.source) + [
+            '-vn', '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(self.sample_rate), '-'
+        ]
+        self.process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE)
+        self._stderr_thread = threading.Thread(target=self._read_stderr, daemon=True)
+        self._stderr_thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.stdout.close()
+        self.process.wait()
+        self._stderr_thread.join(timeout=5)
+        return False
+
+    def _read_stderr(self):
+        for line in self.process.stderr:
+            self._stderr_tail.append(line.decode('utf-8', 'replace').rstrip())
+
+    def _read_window(self):
+        """1ウィンドウ分のバイト列を読む（途中で終わった場合は読めた分だけ）"""
+        buffer = bytearray(self.window_bytes)
+        view = memoryview(buffer)
+        filled = 0
+        while filled < self.window_bytes:
+            count = self.process.stdout.readinto(view[filled:])
+            if not count:
+                break
+            filled += count
+        # 奇数バイトで終わった場合は最後の1バイトを捨てる
+        filled -= filled % BYTES_PER_SAMPLE
+        del view
+        return buffer if filled == self.window_bytes else buffer[:filled]
+
+    def __iter__(self):
+        import numpy as np
+        while True:
+            data = self._read_window()
+            if not data:
+                break
+            samples = np.frombuffer(data, np.int16).astype(np.float32)
+            samples /= 32768.0
+            del data
+            self.samples_read += len(samples)
+            yield samples
+        if self.process.wait() != 0:
+            raise RuntimeError(f"音声の読み込みに失敗: {' / '.join(self._stderr_tail)}")
+
+    @property
+    def seconds_read(self):
+        return self.samples_read / self.sample_rate
+
+def choose_cut(segments, duration, final):
+    """確定させる区間の終わり（秒）を決める
+
+    ウィンドウ末尾 BOUNDARY_MARGIN 秒に掛からない最後の区間の終わりで切る。
+    区切りが見つからなければ MAX_CARRY_SECONDS 秒だけ残して切る。
+    """
+    if final:
+        return duration
+    limit = duration - BOUNDARY_MARGIN
+    cut = 0.0
+    for segment in segments:
+        if segment['end'] <= limit:
+            cut = max(cut, segment['end'])
+    return max(cut, duration - MAX_CARRY_SECONDS, 0.0)
+
+def shift_segment(segment, offset):
+    """区間（と単語）の時刻をストリーム全体の時刻に直す"""
+    shifted = dict(segment, start=segment['start'] + offset, end=segment['end'] + offset)
+    if segment.get('words'):
+        shifted['words'] = [dict(word, start=word['start'] + offset, end=word['end'] + offset)
+                            for word in segment['words']]
+    return shifted
+
+def transcribe_streaming(model, source, window_seconds=None, duration=None, **options):
+    """音声をウィンドウごとに文字起こしして、model.transcribe と同じ形の結果を返す
+
+    options は model.transcribe にそのまま渡す（language, word_timestamps など）。
+    """
+    import numpy as np
+    state = {
+        'segments': [],
+        'carry': np.zeros(0, dtype=np.float32),
+        'carry_start': 0.0,
+        'prompt': options.pop('initial_prompt', None),
+        'language': options.get('language'),
+    }
+
+    def transcribe_window(window, final):
+        carry = state['carry']
+        audio = np.concatenate([carry, window]) if len(carry) else window
+        state['carry'] = carry = None
+        result = model.transcribe(audio, initial_prompt=state['prompt'], **options)
+        state['language'] = state['language'] or result.get('language')
+
+        cut = choose_cut(result['segments'], len(audio) / SAMPLE_RATE, final)
+        kept = [segment for segment in result['segments'] if final or segment['end'] <= cut]
+        for segment in kept:
+            state['segments'].append(dict(shift_segment(segment, state['carry_start']), id=len(state['segments'])))
+        if kept:
+            state['prompt'] = ''.join(segment['text'] for segment in kept)[-PROMPT_CHARS:]
+
+        # 確定しなかった末尾の音声を次のウィンドウに持ち越す（コピーしてウィンドウ全体を解放）
+        state['carry'] = np.zeros(0, dtype=np.float32) if final else audio[int(cut * SAMPLE_RATE):].copy()
+        state['carry_start'] += cut
+
+    with AudioStream(source, window_seconds) as stream:
+        window_samples = stream.window_bytes // BYTES_PER_SAMPLE
+        for window in stream:
+            # ウィンドウより短ければ最後（ちょうど割り切れた場合は下で持ち越し分を処理）
+            transcribe_window(window, final=len(window) < window_samples)
+            del window
+            progress = f" / {duration:.0f}秒" if duration else ''
+            print(f"  🎧 {stream.seconds_read:.0f}秒{progress} 読み込み済み（確定 {len(state['segments'])}区間、"
+                  f"持ち越し {len(state['carry']) / SAMPLE_RATE:.1f}秒）", flush=True)
+    if len(state['carry']):
+        transcribe_window(np.zeros(0, dtype=np.float32), final=True)
+
+    return {
+        'text': ''.join(segment['text'] for segment in state['segments']),
+        'segments': state['segments'],
+        'language': state['language'],
+    }
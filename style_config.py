@@ -94,7 +94,8 @@ COLOR_PALETTE = {
     'orange': '&H000080FF',
     'purple': '&H00800080',
     'pink': '&H00FF80FF',
-    'lime': '&H0080FF00'
+    'lime': '&H0080FF00',
+    'gray': '&H00808080'
 }
 
 # フォントリスト
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""style_config.py のスタイルを名前付きプリセットとして使う
+
+BASE_STYLES / CUSTOM_STYLES の各スタイルを default の値で補い、最初に1回だけ
+ASSの Style: 行と subtitles フィルタの force_style 文字列に変換しておく。
+色名（COLOR_PALETTE）の変換もここにまとめる。
+
+    python3 apply_subtitles.py --preset youtube,news     # 1回のデコードで2本を書き出す
+    python3 process_markers.py ./output ./output --preset cinema
+    python3 style_presets.py                             # プリセット一覧
+"""
+
+import sys
+
+from style_config import BASE_STYLES, CUSTOM_STYLES, COLOR_PALETTE
+
+DEFAULT_PRESET = 'default'
+
+# 背景なしのときの BackColour（半透明黒、影の色として使われる）
+DEFAULT_BACK_COLOR = '&H80000000'
+
+POSITION_ALIGNMENTS = {'bottom': 2, 'center': 5, 'top': 8}
+
+def color_to_bgr(color, default='&H00FFFFFF'):
+    """色名（COLOR_PALETTE）または &H.. 形式をASS/FFmpeg用のBGR形式に変換（不明な色は default）"""
+    if color.upper().startswith('&H'):
+        return color.upper()
+    return COLOR_PALETTE.get(color.lower(), default)
+
+def with_alpha(color, alpha):
+    """BGR形式の色に透明度（0.0-1.0、ASSのアルファ値）を付ける"""
+    return f"&H{int(alpha * 255):02X}{color[-6:]}"
+
+def position_to_alignment(position):
+    """位置をASS alignment値に変換"""
+    return POSITION_ALIGNMENTS.get(position.lower(), 2)
+
+class StylePreset:
+    """コンパイル済みのスタイル（Style: 行と force_style は作成時に1回だけ作る）"""
+
+    def __init__(self, name, style):
+        self.name = name
+        self.style = style
+        self.font_name = style['font_name']
+        self.font_size = style['font_size']
+        self.primary_color = color_to_bgr(style['primary_color'])
+        self.outline_color = color_to_bgr(style['outline_color'], '&H00000000')
+        self.bold = 1 if style.get('bold') else 0
+        self.italic = 1 if style.get('italic') else 0
+        self.background = bool(style.get('background'))
+        self.back_color = color_to_bgr(style['background_color']) if self.background else DEFAULT_BACK_COLOR
+        # 背景ありは BorderStyle=4（背景ボックス）、なしは 1（アウトラインのみ）
+        self.border_style = 4 if self.background else 1
+
+        self._style_fields = (
+            f"{self.font_name},{self.font_size},{self.primary_color},&H000000FF,{self.outline_color},"
+            f"{self.back_color},{self.bold},{self.italic},0,0,100,100,0,0,{self.border_style},"
+            f"{style['outline_width']},2,{style['alignment']},30,30,{style['margin_v']},1"
+        )
+        options = [
+            f"FontName={self.font_name}",
+            f"FontSize={self.font_size}",
+            f"PrimaryColour={self.primary_color}",
+            f"OutlineColour={self.outline_color}",
+            f"Outline={style['outline_width']}",
+            f"Bold={self.bold}",
+            f"Italic={self.italic}",
+            f"Alignment={style['alignment']}",
+            f"MarginV={style['margin_v']}",
+        ]
+        if self.background:
+            options += [f"BackColour={self.back_color}", f"BorderStyle={self.border_style}"]
+        self.force_style = ','.join(options)
+
+    def style_line(self, style_name='Default'):
+        """ASSの [V4+ Styles] に書く Style: 行"""
+        return f"Style: {style_name},{self._style_fields}"
+
+    def marker_defaults(self):
+        """process_markers のリセットタグ用のデフォルト設定"""
+        return {'size': self.font_size, 'color': self.primary_color, 'bold': bool(self.bold),
+                'italic': bool(self.italic)}
+
+_presets = None
+
+def load_presets():
+    """全プリセットをコンパイル（2回目以降はコンパイル済みのものを返す）"""
+    global _presets
+    if _presets is None:
+        base = BASE_STYLES[DEFAULT_PRESET]
+        styles = dict(BASE_STYLES, **CUSTOM_STYLES)
+        _presets = {name: StylePreset(name, dict(base, **style)) for name, style in styles.items()}
+    return _presets
+
+def preset_names():
+    return list(dict(BASE_STYLES, **CUSTOM_STYLES))
+
+def get_preset(name):
+    presets = load_presets()
+    if name not in presets:
+        raise ValueError(f"不明なスタイルプリセット: {name} (選択肢: {', '.join(presets)})")
+    return presets[name]
+
+def parse_preset_names(value):
+    """'youtube,news' → [StylePreset, ...]（重複は除く、順番はそのまま）"""
+    names = []
+    for name in (value or '').split(','):
+        name = name.strip().lower()
+        if name and name not in names:
+            names.append(name)
+    return [get_preset(name) for name in names]
+
+def parse_preset_args(argv=None):
+    """コマンドライン引数から --preset NAME[,NAME...] を解析（指定がなければ []）"""
+    args = sys.argv[1:] if argv is None else argv
+    for index, arg in enumerate(args):
+        if arg == '--preset' and index + 1 < len(args):
+            return parse_preset_names(args[index + 1])
+        if arg.startswith('--preset='):
+            return parse_preset_names(arg.split('=', 1)[1])
+    return []
+
+def main():
+    """プリセット一覧を表示"""
+    for name, preset in load_presets().items():
+        print(f"🎨 {name}")
+        print(f"  {preset.style_line()}")
+        print(f"  force_style: {preset.force_style}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import difflib
+
+# SRT: 00:01:23,456 / ASS: 0:01:23.45
+SRT_TIME_PATTERN = re.compile(r'(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})')
+ASS_TIME_PATTERN = re.compile(r'(\d+):(\d{1,2}):(\d{1,2})(?:\.(\d{1,2}))?')
+
+def srt_time_to_seconds(srt_time):
+    """SRT時間を秒に変換"""
+    match = SRT_TIME_PATTERN.match(srt_time.strip())
+    if not match:
+        raise ValueError(f"SRT時間の形式が不正です: {srt_time}")
+    hours, minutes, seconds, millis = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int(millis.ljust(3, '0')) / 1000
+
+def ass_time_to_seconds(ass_time):
+    """ASS時間を秒に変換"""
+    match = ASS_TIME_PATTERN.match(ass_time.strip())
+    if not match:
+        raise ValueError(f"ASS時間の形式が不正です: {ass_time}")
+    hours, minutes, seconds, centis = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int((centis or '0').ljust(2, '0')) / 100
+
+def seconds_to_srt_time(seconds):
+    """秒をSRT時間に変換（ミリ秒単位で丸める）"""
+    total_ms = int(round(seconds * 1000))
+    hours, rest = divmod(total_ms, 3600 * 1000)
+    minutes, rest = divmod(rest, 60 * 1000)
+    secs, millis = divmod(rest, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+def seconds_to_ass_time(seconds):
+    """秒をASS時間に変換（センチ秒単位で丸める）"""
+    total_cs = int(round(seconds * 100))
+    hours, rest = divmod(total_cs, 3600 * 100)
+    minutes, rest = divmod(rest, 60 * 100)
+    secs, centis = divmod(rest, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centis:02d}"
+
+def parse_srt(content):
+    """SRT文字列を字幕キューのリストに変換
+
+    キューは {'start': 秒, 'end': 秒, 'text': 本文} の辞書。
+    """
+    cues = []
+    blocks = re.split(r'\n\s*\n', content.replace('\r\n', '\n').replace('\ufeff', '').strip())
+    for block in blocks:
+        lines = block.strip().split('\n')
+        # 番号行は省略されていても受け付ける
+        for index, line in enumerate(lines[:2]):
+            if ' --> ' in line:
+                start_time, end_time = line.split(' --> ', 1)
+                try:
+                    cues.append({
+                        'start': srt_time_to_seconds(start_time),
+                        'end': srt_time_to_seconds(end_time),
+                        'text': '\n'.join(lines[index + 1:]),
+                    })
+                except ValueError:
+                    pass
+                break
+    return cues
+
+def parse_ass(content):
+    """ASS文字列のDialogue行を字幕キューのリストに変換（タグはそのまま保持）
+
+    書き戻せるよう Layer と Style〜Effect の欄も 'layer' / 'fields' に残す。
+    """
+    cues = []
+    for line in content.replace('\r\n', '\n').split('\n'):
+        if not line.startswith('Dialogue:'):
+            continue
+        parts = line.split(',', 9)
+        if len(parts) < 10:
+            continue
+        try:
+            cues.append({
+                'start': ass_time_to_seconds(parts[1]),
+                'end': ass_time_to_seconds(parts[2]),
+                'text': parts[9].strip(),
+                'layer': parts[0][len('Dialogue:'):].strip(),
+                'fields': parts[3:9],
+            })
+        except ValueError:
+            continue
+    return cues
+
+def load_cues(path):
+    """拡張子に応じてSRT/ASSファイルを読み込みキューのリストを返す"""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if os.path.splitext(path)[1].lower() == '.ass':
+        return parse_ass(content)
+    return parse_srt(content)
+
+def load_ass_header(path):
+    """ASSの [Events] 以外の部分（[Script Info]・[V4+ Styles] など）を返す（SRTは空文字）
+
+    スタイル定義だけが変わった場合はキューを比べても分からないので、これも比較する。
+    """
+    if os.path.splitext(path)[1].lower() != '.ass':
+        return ''
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    lines = []
+    in_events = False
+    for line in content.replace('\r\n', '\n').replace('\ufeff', '').split('\n'):
+        line = line.strip()
+        if line.startswith('[') and line.endswith(']'):
+            in_events = line.lower() == '[events]'
+        if line and not in_events:
+            lines.append(line)
+    return '\n'.join(lines)
+
+def cue_signature(cue):
+    """比較用のキュー表現（時間はミリ秒単位、ASSは Layer と Style〜Effect の欄も含む）"""
+    return (int(round(cue['start'] * 1000)), int(round(cue['end'] * 1000)), cue['text'],
+            cue.get('layer'), tuple(cue.get('fields', ())))
+
+def changed_time_ranges(old_cues, new_cues):
+    """新旧キューを比較し、焼き込み結果が変わる時間範囲のリストを返す
+
+    削除されたキューの表示区間も変更として扱う。
+    """
+    matcher = difflib.SequenceMatcher(
+        a=[cue_signature(cue) for cue in old_cues],
+        b=[cue_signature(cue) for cue in new_cues],
+        autojunk=False,
+    )
+    ranges = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        affected = old_cues[i1:i2] + new_cues[j1:j2]
+        if affected:
+            ranges.append((min(cue['start'] for cue in affected), max(cue['end'] for cue in affected)))
+    return ranges
+
+def merge_time_ranges(ranges, padding=0.0, duration=None):
+    """時間範囲に前後の余白を付けて重なるものを結合"""
+    padded = []
+    for start, end in sorted(ranges):
+        start = max(0.0, start - padding)
+        end = end + padding
+        if duration is not None:
+            end = min(end, duration)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], max(padded[-1][1], end))
+        else:
+            padded.append((start, end))
+    return padded
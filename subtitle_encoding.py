@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""字幕ファイルの文字エンコーディングの判定とUTF-8への変換
+
+chardet はファイル全体を純Pythonで解析するため、大きな字幕では毎回数秒かかる。
+ここでは安い判定から順に試し、chardet は先頭の一部（SAMPLE_BYTES）にだけ使う。
+
+    1. BOM（UTF-8 / UTF-16 / UTF-32）
+    2. ISO-2022-JP のエスケープシーケンス
+    3. 先頭の一部を UTF-8 として厳密にデコードできるか
+    4. chardet（先頭の一部だけ。信頼度が低ければ EUC-JP / CP932 で厳密にデコードできるものを選ぶ）
+
+判定結果はファイル内容のハッシュごとに ENCODING_CACHE_PATH に保存し、同じ字幕は次回から判定しない。
+
+    python subtitle_encoding.py /input_subtitles --output-dir /tmp/subtitles_utf8
+    python subtitle_encoding.py /input_subtitles --in-place --workers 8
+    python subtitle_encoding.py a.srt b.srt --check          # 判定結果の表示だけ
+"""
+
+import os
+import sys
+import json
+import time
+import codecs
+import fcntl
+import hashlib
+import argparse
+
+from workspace import atomic_output
+from run_report import run_report, stage, record_cache
+
+# 判定の設定（環境変数で上書き可能）
+# SUBTITLE_ENCODING_SAMPLE: chardet と UTF-8 判定に使う先頭のバイト数（デフォルト: 64KB）
+# SUBTITLE_ENCODING_CACHE: 判定結果のキャッシュファイル（空にすると無効）
+SAMPLE_BYTES = int(os.environ.get('SUBTITLE_ENCODING_SAMPLE', str(64 * 1024)))
+ENCODING_CACHE_PATH = os.environ.get('SUBTITLE_ENCODING_CACHE', '.encoding_cache.json')
+# キャッシュに残す件数（古く使われたものから捨てる）
+CACHE_MAX_ENTRIES = 10000
+
+SUBTITLE_EXTENSIONS = ('.srt', '.ass', '.ssa', '.vtt')
+
+# UTF-32 の BOM は UTF-16 の BOM で始まるので先に調べる
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+ISO2022JP_ESCAPES = (b'\x1b$B', b'\x1b$@', b'\x1b(J', b'\x1b$(D')
+
+# chardet の結果を上位互換のエンコーディングに置き換える（機種依存文字でデコードに失敗しないように）
+ENCODING_ALIASES = {
+    'shift_jis': 'cp932',
+    'windows-31j': 'cp932',
+    'ascii': 'utf-8',
+}
+# chardet の信頼度がこれより低ければ採用せず、FALLBACK_ENCODINGS で厳密にデコードできるものを選ぶ
+MIN_CONFIDENCE = 0.5
+# 判定できなかったときに試す順番（CP932 の字幕は EUC-JP ではほぼデコードできないが、逆はできてしまうので EUC-JP が先）
+FALLBACK_ENCODINGS = ['utf-8', 'euc-jp', 'cp932', 'iso-2022-jp']
+
+def normalize_encoding_name(encoding):
+    """chardet の返す名前を Python のコーデック名にそろえる"""
+    if not encoding:
+        return None
+    name = encoding.lower()
+    try:
+        name = codecs.lookup(name).name
+    except LookupError:
+        pass
+    return ENCODING_ALIASES.get(name, name)
+
+def content_hash(raw_data):
+    return hashlib.sha256(raw_data).hexdigest()
+
+def is_utf8_prefix(sample, complete):
+    """先頭の一部が UTF-8 として正しいか（途中で切れた最後の文字は complete=False なら許す）"""
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=complete)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+def chardet_detect(sample):
+    """chardet で判定（遅いので呼び出し側で必ずサンプルに切ってから渡す）"""
+    import chardet
+    detected = chardet.detect(sample)
+    return normalize_encoding_name(detected.get('encoding')), detected.get('confidence') or 0.0
+
+def detect_encoding(raw_data, sample_bytes=None, partial=False):
+    """エンコーディングを判定して {'encoding', 'confidence', 'method'} を返す
+
+    見るのは先頭 sample_bytes バイトだけなので、ファイルが大きくても時間は変わらない。
+    partial: raw_data がファイルの一部を切り出したもの（末尾で文字が切れていてもよい）
+    """
+    sample_bytes = sample_bytes or SAMPLE_BYTES
+    for bom, encoding in BOMS:
+        if raw_data.startswith(bom):
+            return {'encoding': encoding, 'confidence': 1.0, 'method': 'bom'}
+
+    sample = raw_data[:sample_bytes]
+    complete = not partial and len(sample) == len(raw_data)
+    if any(escape in sample for escape in ISO2022JP_ESCAPES):
+        return {'encoding': 'iso-2022-jp', 'confidence': 1.0, 'method': 'escape'}
+    if is_utf8_prefix(sample, complete):
+        return {'encoding': 'utf-8', 'confidence': 1.0, 'method': 'utf-8'}
+
+    encoding, confidence = chardet_detect(sample)
+    if encoding and confidence >= MIN_CONFIDENCE:
+        return {'encoding': encoding, 'confidence': confidence, 'method': 'chardet'}
+    for candidate in FALLBACK_ENCODINGS:
+        try:
+            codecs.getincrementaldecoder(candidate)().decode(sample, final=complete)
+        except UnicodeDecodeError:
+            continue
+        return {'encoding': candidate, 'confidence': confidence, 'method': 'fallback'}
+    return {'encoding': encoding or 'utf-8', 'confidence': confidence, 'method': 'chardet'}
+
+def decode_subtitle(raw_data, detection):
+    """判定結果でデコードし、失敗したら候補を順に試す
+
+    サンプルより後ろで失敗した場合は、失敗した行から SAMPLE_BYTES バイトだけを判定し直す。
+    (テキスト, 実際に使ったエンコーディング) を返す。すべて失敗したら UnicodeDecodeError。
+    """
+    candidates = [detection['encoding']]
+    try:
+        return raw_data.decode(detection['encoding']), detection['encoding']
+    except UnicodeDecodeError as e:
+        error = e
+        # 改行は CP932 / EUC-JP の2バイト目に現れないので、行頭から読めば文字の途中から始まらない
+        start = raw_data.rfind(b'\n', 0, e.start) + 1
+        candidates.append(detect_encoding(raw_data[start:start + SAMPLE_BYTES], partial=True)['encoding'])
+    except LookupError as e:
+        error = e
+
+    for encoding in candidates[1:] + FALLBACK_ENCODINGS:
+        if not encoding or encoding == candidates[0]:
+            continue
+        try:
+            return raw_data.decode(encoding), encoding
+        except (UnicodeDecodeError, LookupError):
+            continue
+    raise error
+
+class EncodingCache:
+    """内容のハッシュ → 判定結果 のキャッシュ（JSONファイル、保存時にファイルロックして結合）"""
+
+    def __init__(self, path=None):
+        self.path = ENCODING_CACHE_PATH if path is None else path
+        self.entries = self._load() if self.path else {}
+        self.updates = {}
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, digest):
+        entry = self.updates.get(digest) or self.entries.get(digest)
+        if entry:
+            self.updates[digest] = dict(entry, used=time.time())
+        return entry
+
+    def put(self, digest, detection):
+        self.updates[digest] = dict(detection, used=time.time())
+
+    def save(self):
+        if not self.path or not self.updates:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                entries = self._load()
+                entries.update(self.updates)
+                if len(entries) > CACHE_MAX_ENTRIES:
+                    newest = sorted(entries.items(), key=lambda item: item[1].get('used', 0))[-CACHE_MAX_ENTRIES:]
+                    entries = dict(newest)
+                with atomic_output(self.path) as output:
+                    with open(output.path, 'w', encoding='utf-8') as f:
+                        json.dump(entries, f, ensure_ascii=False)
+                    output.commit()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        self.entries = entries
+        self.updates = {}
+
+def convert_to_utf8(srt_path, output_path=None, cache=None):
+    """字幕ファイルを判定してUTF-8に変換（output_path が None なら判定だけ）
+
+    結果の辞書（encoding, confidence, method, cached, changed, seconds）を返す。
+    """
+    started = time.perf_counter()
+    with open(srt_path, 'rb') as f:
+        raw_data = f.read()
+
+    digest = content_hash(raw_data)
+    cached = cache.get(digest) if cache is not None else None
+    if cache is not None and cache.path:
+        record_cache('encoding', cached is not None)
+    detection = dict(cached) if cached else detect_encoding(raw_data)
+    detection.pop('used', None)
+
+    text, encoding = decode_subtitle(raw_data, detection)
+    if encoding != detection['encoding']:
+        detection = {'encoding': encoding, 'confidence': 1.0, 'method': 'fallback'}
+    if cache is not None:
+        cache.put(digest, detection)
+
+    # BOMなしのUTF-8はそのままのバイト列でよい
+    changed = encoding != 'utf-8'
+    if output_path and (changed or os.path.abspath(output_path) != os.path.abspath(srt_path)):
+        with atomic_output(output_path) as output:
+            with open(output.path, 'wb') as f:
+                f.write(text.encode('utf-8') if changed else raw_data)
+            output.commit()
+
+    return dict(detection, path=srt_path, output=output_path, hash=digest, cached=cached is not None,
+                changed=changed, bytes=len(raw_data), seconds=time.perf_counter() - started)
+
+# ---------------------------------------------------------------- ディレクトリ一括変換
+
+_worker_cache = None
+
+def _init_worker(cache_path):
+    global _worker_cache
+    _worker_cache = EncodingCache(cache_path)
+
+def _convert_task(srt_path, output_path):
+    """ワーカープロセスで1ファイルを変換（キャッシュの保存は親プロセスでまとめて行う）"""
+    try:
+        return convert_to_utf8(srt_path, output_path, _worker_cache)
+    except Exception as e:
+        return {'path': srt_path, 'output': output_path, 'error': str(e)}
+
+def find_subtitles(paths):
+    """ファイル・ディレクトリの一覧から字幕ファイルを集める（ディレクトリは直下だけ）"""
+    subtitles = []
+    for path in paths:
+        if os.path.isdir(path):
+            subtitles.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                             if name.lower().endswith(SUBTITLE_EXTENSIONS))
+        elif os.path.exists(path):
+            subtitles.append(path)
+        else:
+            print(f"⚠️ 見つかりません: {path}")
+    return subtitles
+
+def convert_many(subtitles, output_dir=None, in_place=False, workers=None, cache_path=None):
+    """字幕ファイルをまとめて変換（chardet はGILを離さないのでプロセスで並列化）"""
+    cache = EncodingCache(cache_path)
+    tasks = []
+    for path in subtitles:
+        if in_place:
+            output_path = path
+        elif output_dir:
+            output_path = os.path.join(output_dir, os.path.basename(path))
+        else:
+            output_path = None
+        tasks.append((path, output_path))
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks) or 1))
+    if workers == 1:
+        results = [convert_to_utf8(path, output_path, cache) for path, output_path in tasks]
+    else:
+        # multiprocessing の読み込みは重いので並列にするときだけ（--check などの起動を遅くしない）
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(cache.path,)) as executor:
+            results = list(executor.map(_convert_task, *zip(*tasks)))
+        for result in results:
+            if 'error' not in result:
+                record_cache('encoding', result['cached'])
+                cache.put(result['hash'], {key: result[key] for key in ('encoding', 'confidence', 'method')})
+    cache.save()
+    return results
+
+def print_result(result):
+    name = os.path.basename(result['path'])
+    if 'error' in result:
+        print(f"  ❌ {name}: {result['error']}")
+        return
+    source = 'キャッシュ' if result['cached'] else result['method']
+    action = '変換' if result['changed'] else 'そのまま'
+    if not result['output']:
+        action = '判定のみ'
+    print(f"  📄 {name}: {result['encoding']} (信頼度: {result['confidence']:.2f}, {source}) "
+          f"{action} {result['seconds'] * 1000:.1f}ms")
+
+def parse_arguments():
+    """引数解析"""
+    parser = argparse.ArgumentParser(description='字幕ファイルのエンコーディングをUTF-8に統一')
+    parser.add_argument('paths', nargs='+', help='字幕ファイルまたはディレクトリ')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--output-dir', help='変換した字幕の出力先')
+    target.add_argument('--in-place', action='store_true', help='元のファイルを置き換える')
+    target.add_argument('--check', action='store_true', help='判定結果を表示するだけ')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='並列数（デフォルト: CPU数）')
+    parser.add_argument('--no-cache', action='store_true', help='判定結果のキャッシュを使わない')
+    return parser.parse_args()
+
+def main():
+    """メイン処理"""
+    args = parse_arguments()
+    if not (args.output_dir or args.in_place or args.check):
+        raise SystemExit("❌ --output-dir / --in-place / --check のいずれかを指定してください")
+
+    subtitles = find_subtitles(args.paths)
+    print(f"🔤 エンコーディング判定: {len(subtitles)}ファイル（並列 {args.workers}）")
+    with stage('subtitle_encoding', files=len(subtitles)) as entry:
+        results = convert_many(subtitles, args.output_dir, args.in_place, args.workers,
+                               cache_path='' if args.no_cache else None)
+        entry['bytes'] = sum(result.get('bytes', 0) for result in results)
+
+    for result in results:
+        print_result(result)
+    failed = sum(1 for result in results if 'error' in result)
+    converted = sum(1 for result in results if result.get('changed') and result.get('output'))
+    cached = sum(1 for result in results if result.get('cached'))
+    print(f"\n🎉 完了: {len(results) - failed}ファイル（変換 {converted}、キャッシュ {cached}、失敗 {failed}）")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    with run_report('subtitle_encoding'):
+        main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""動画と字幕ファイルの対応付け（実行ごとに1回だけ索引を作る）
+
+字幕ファイル名を「ベース名 + 種類の接尾辞」に分解し、ベース名 → 字幕ファイル の辞書を作る。
+動画ごとに全字幕を調べ直さないので、動画数・字幕数に比例した時間で対応付けできる。
+
+    <ベース名>.srt / .ass                    plain（手で用意した字幕）
+    <ベース名>_editable.srt                  editable（video_to_text が出力する編集用SRT）
+    <ベース名>_styled.ass                    styled
+    <ベース名>_markers_s24_white_bold.ass    markers（process_markers の出力、スタイル情報付き）
+    <ベース名>_markers_youtube.ass           markers（--preset 指定時はプリセット名）
+    <ベース名>_merged.srt / _merged_styled.ass   merged（combine_split の出力）
+
+ベース名は字幕生成時と同じ safe_base_name で正規化してから比べる（記号の除去・50文字で切り詰め）。
+自動の対応付けでは足りない場合は、字幕ディレクトリの subtitle_pairs.json で明示できる。
+
+    {"動画.mp4": "別名の字幕.srt", "動画2": ["a.ass", "b.srt"], "合成しない動画.mp4": []}
+
+    python subtitle_index.py --video-dir ./videos --subtitle-dir ./output     # 対応付けの確認
+"""
+
+import os
+import re
+import sys
+import json
+import zlib
+import argparse
+
+from style_presets import preset_names
+
+# 明示的な対応付けのファイル名（字幕ディレクトリに置く）
+PAIRS_FILENAME = 'subtitle_pairs.json'
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.wmv')
+SUBTITLE_EXTENSIONS = ('.ass', '.srt')
+
+# process_markers.marker_ass_filename のスタイル情報（s<サイズ>_<色>[_bold][_italic][_bg<色>] またはプリセット名）
+# 色は --color / --background の値そのまま（Yellow のような大文字も入る）
+MARKER_STYLE = r's\d+_[^_]+(?:_bold)?(?:_italic)?(?:_bg[^_]+)?|' + '|'.join(map(re.escape, preset_names()))
+SUBTITLE_NAME_PATTERN = re.compile(
+    r'(?P<base>.+)_(?P<kind>editable|styled|merged|markers(?:_(?P<style>' + MARKER_STYLE + r'))?)'
+)
+# 1つだけ選ぶときの優先順（編集済みの字幕を優先）
+KIND_PRIORITY = ['markers', 'editable', 'plain', 'styled', 'merged', 'merged_styled']
+
+# is_safe_character を満たす文字だけの50文字以内の名前（\w は str.isalnum と '_'）
+SAFE_NAME = re.compile(r'[\w\-\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FAF\uFF00-\uFFEF]{1,50}')
+
+def is_safe_character(char):
+    """安全な文字かどうか判定（日本語対応）"""
+    # ASCII英数字、ハイフン、アンダースコア
+    if char.isalnum() or char in ('-', '_'):
+        return True
+
+    # 日本語文字範囲
+    char_code = ord(char)
+
+    # ひらがな (U+3040-U+309F)
+    if 0x3040 <= char_code <= 0x309F:
+        return True
+
+    # カタカナ (U+30A0-U+30FF)
+    if 0x30A0 <= char_code <= 0x30FF:
+        return True
+
+    # 漢字 (U+4E00-U+9FAF)
+    if 0x4E00 <= char_code <= 0x9FAF:
+        return True
+
+    # 全角英数字 (U+FF00-U+FFEF)
+    if 0xFF00 <= char_code <= 0xFFEF:
+        return True
+
+    return False
+
+def safe_base_name(base_name):
+    """出力ファイル名に使える安全なベース名を作成"""
+    # すでに安全な名前（生成した字幕ファイルはすべてこれ）は1文字ずつ調べない
+    if SAFE_NAME.fullmatch(base_name):
+        return base_name
+    safe_name = "".join(c for c in base_name if is_safe_character(c))[:50]
+    if not safe_name:  # 全て除外された場合のフォールバック（実行ごとに変わらないよう crc32 を使う）
+        safe_name = f"video_{zlib.crc32(base_name.encode('utf-8')) % 10000:04d}"
+    return safe_name
+
+def parse_subtitle_name(filename):
+    """字幕ファイル名を (ベース名, 種類, マーカーのスタイル) に分解"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    match = SUBTITLE_NAME_PATTERN.fullmatch(stem)
+    if not match:
+        return stem, 'plain', None
+    base, kind = match.group('base'), match.group('kind')
+    if kind.startswith('markers'):
+        kind = 'markers'
+        # 統合済みSRT（<ベース名>_merged.srt）から作ったマーカーASS
+        inner_base, inner_kind, _ = parse_subtitle_name(base)
+        if inner_kind == 'merged':
+            base = inner_base
+    elif kind == 'styled' and base.endswith('_merged'):
+        # <ベース名>_merged_styled.ass（ベース名は後ろから最長に取るので _merged が残る）
+        base, kind = base[:-len('_merged')], 'merged_styled'
+    return base, kind, match.group('style')
+
+def video_key(video_name):
+    """動画のファイル名（パス・拡張子はあってもなくてもよい）から索引のキーを作る"""
+    name = os.path.basename(video_name)
+    stem, extension = os.path.splitext(name)
+    if extension.lower() in VIDEO_EXTENSIONS:
+        name = stem
+    return safe_base_name(name)
+
+def load_pairs(path):
+    """subtitle_pairs.json を読み込む（字幕のパスはファイルの場所からの相対パス）
+
+    戻り値: {動画のキー: [字幕パス, ...]}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: 動画名 → 字幕 の辞書を指定してください")
+    directory = os.path.dirname(os.path.abspath(path))
+    pairs = {}
+    for video_name, subtitles in data.items():
+        if isinstance(subtitles, str):
+            subtitles = [subtitles]
+        pairs[video_key(video_name)] = [os.path.join(directory, subtitle) for subtitle in subtitles]
+    return pairs
+
+def find_pairs_file(subtitle_dir):
+    """字幕ディレクトリに subtitle_pairs.json があればそのパス"""
+    path = os.path.join(subtitle_dir, PAIRS_FILENAME)
+    return path if os.path.exists(path) else None
+
+class SubtitleIndex:
+    """ベース名 → 字幕ファイル の索引
+
+        index = SubtitleIndex(subtitle_files, pairs_path)
+        for video_file in video_files:
+            subtitles = index.match(video_file)      # 見つからなければ []
+    """
+
+    def __init__(self, subtitle_files, pairs_path=None):
+        self.by_key = {}
+        self.kinds = {}
+        self.pairs = load_pairs(pairs_path) if pairs_path else {}
+        for subtitle_file in subtitle_files:
+            self.add(subtitle_file)
+
+    def add(self, subtitle_file):
+        base, kind, _ = parse_subtitle_name(subtitle_file)
+        self.by_key.setdefault(safe_base_name(base), []).append(subtitle_file)
+        self.kinds[subtitle_file] = kind
+
+    def match(self, video_file):
+        """動画に対応する字幕ファイルの一覧（subtitle_pairs.json の指定を優先）"""
+        key = video_key(video_file)
+        if key in self.pairs:
+            return list(self.pairs[key])
+        return list(self.by_key.get(key, []))
+
+    def best(self, video_file, kinds=None):
+        """対応する字幕を1つだけ選ぶ（kinds の順、省略時は KIND_PRIORITY の順）"""
+        priority = kinds or KIND_PRIORITY
+        candidates = [subtitle for subtitle in self.match(video_file)
+                      if self.kinds.get(subtitle, 'plain') in priority]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda subtitle: priority.index(self.kinds.get(subtitle, 'plain')))
+
+    def unmatched(self, video_files):
+        """どの動画にも対応しなかった字幕ファイル"""
+        used = {os.path.abspath(subtitle) for video_file in video_files for subtitle in self.match(video_file)}
+        return [subtitle for subtitles in self.by_key.values() for subtitle in subtitles
+                if os.path.abspath(subtitle) not in used]
+
+def list_files(directory, extensions):
+    names = sorted(os.listdir(directory))
+    return [os.path.join(directory, name) for name in names if name.lower().endswith(extensions)]
+
+def parse_arguments():
+    """引数解析"""
+    parser = argparse.ArgumentParser(description='動画と字幕ファイルの対応付けを表示')
+    parser.add_argument('--video-dir', default='/input_videos', help='動画ディレクトリ')
+    parser.add_argument('--subtitle-dir', default='/input_subtitles', help='字幕ディレクトリ')
+    parser.add_argument('--pairs', help=f"対応付けファイル（デフォルト: 字幕ディレクトリの {PAIRS_FILENAME}）")
+    parser.add_argument('--json', action='store_true', help='JSONで出力')
+    return parser.parse_args()
+
+def main():
+    """メイン処理"""
+    args = parse_arguments()
+    video_files = list_files(args.video_dir, VIDEO_EXTENSIONS)
+    pairs_path = args.pairs or find_pairs_file(args.subtitle_dir)
+    index = SubtitleIndex(list_files(args.subtitle_dir, SUBTITLE_EXTENSIONS), pairs_path)
+    pairs = {os.path.basename(video_file): index.match(video_file) for video_file in video_files}
+
+    if args.json:
+        json.dump(pairs, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return
+
+    if pairs_path:
+        print(f"📋 対応付けファイル: {pairs_path}")
+    for video_name, subtitles in pairs.items():
+        if not subtitles:
+            print(f"⚠️ {video_name}: 字幕なし")
+            continue
+        print(f"📹 {video_name}")
+        for subtitle in subtitles:
+            print(f"  📄 {os.path.basename(subtitle)} ({index.kinds.get(subtitle, 'plain')})")
+    unmatched = index.unmatched(video_files)
+    if unmatched:
+        print(f"\n📝 対応する動画がない字幕: {len(unmatched)}個")
+        for subtitle in unmatched:
+            print(f"  - {os.path.basename(subtitle)}")
+
+if __name__ == "__main__":
+    main()
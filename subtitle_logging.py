@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import logging
+
+# ログの設定（環境変数で上書き可能）
+# SUBTITLE_LOG_LEVEL: 全体のレベル（debug, info, warning, error、デフォルト: info）
+#   モジュールごとに変える場合: SUBTITLE_LOG_LEVEL=info,process_markers=debug
+# SUBTITLE_LOG_FORMAT=json: 1行1件のJSONで出力（コンテナのログ収集向け）
+ROOT_LOGGER = 'subtitle'
+DEFAULT_LEVEL = 'info'
+
+_configured = False
+
+class StdoutHandler(logging.StreamHandler):
+    """その時点の sys.stdout に書く（print と順番が入れ替わらず、redirect_stdout も効く）"""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+class JsonFormatter(logging.Formatter):
+    """{time, level, logger, message, ...fields} の1行JSON"""
+
+    def format(self, record):
+        data = {
+            'time': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'message': record.getMessage().strip(),
+        }
+        data.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+def parse_level(value):
+    level = logging.getLevelName(value.strip().upper())
+    if not isinstance(level, int):
+        print(f"⚠️ 不明なログレベル: {value}（debug, info, warning, error）")
+        return logging.INFO
+    return level
+
+def parse_level_spec(spec):
+    """'info,process_markers=debug' → (全体のレベル, {モジュール名: レベル})"""
+    default = parse_level(DEFAULT_LEVEL)
+    modules = {}
+    for item in (spec or '').split(','):
+        if not item.strip():
+            continue
+        name, sep, value = item.partition('=')
+        if sep:
+            modules[name.strip()] = parse_level(value)
+        else:
+            default = parse_level(name)
+    return default, modules
+
+def configure_logging(level=None, log_format=None):
+    """ログ出力を設定（get_logger から自動で呼ばれる。引数で環境変数より優先して指定できる）"""
+    global _configured
+    root = logging.getLogger(ROOT_LOGGER)
+    default, modules = parse_level_spec(level or os.environ.get('SUBTITLE_LOG_LEVEL'))
+    root.setLevel(default)
+    for name, module_level in modules.items():
+        logging.getLogger(f"{ROOT_LOGGER}.{name}").setLevel(module_level)
+
+    handler = StdoutHandler()
+    if (log_format or os.environ.get('SUBTITLE_LOG_FORMAT', '')).lower() == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        # これまでの print と同じ見た目（メッセージのみ）
+        handler.setFormatter(logging.Formatter('%(message)s'))
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.propagate = False
+    _configured = True
+
+def get_logger(name):
+    """モジュールごとのロガー（subtitle.<name>）
+
+        log = get_logger('process_markers')
+        log.debug("  🎯 マーカー: %r", text)   # debug が無効なら文字列を作らない
+    """
+    if not _configured:
+        configure_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+def log_counts(logger, message, counts, level=logging.INFO):
+    """集計値をまとめて1行で出力（JSON形式では counts をフィールドとして出す）"""
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={'fields': dict(counts)})
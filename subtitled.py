@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""字幕付き動画作成の統合コマンド（サブコマンドごとに必要なモジュールだけを読み込む）
+
+各サブコマンドはこれまでのスクリプトをそのまま実行する（引数もそのまま渡す）。
+起動時にはどのスクリプトも読み込まないので、whisper（torch）などの重い依存は
+generate のように実際に使うサブコマンドでしか読み込まれない。
+
+    python3 subtitled.py generate --model small --format both
+    python3 subtitled.py process ./output ./marker_output --size 32 --color yellow
+    python3 subtitled.py apply --video-dir ./videos --subtitle-dir ./marker_output --preset youtube,news
+    python3 subtitled.py split ./videos/long.mp4 600
+    python3 subtitled.py combine long_video --format both
+    python3 subtitled.py convert ./subtitles --check
+    python3 subtitled.py bench startup              # 起動時間の確認（benchmarks/bench_startup.py）
+    python3 subtitled.py <サブコマンド> --help
+"""
+
+import os
+import sys
+
+# サブコマンド → (実行するモジュール, 説明)
+COMMANDS = {
+    'generate': ('video_to_text_with_custom_styles', '動画から字幕を生成（Whisper）'),
+    'process': ('process_markers', 'マーカーを処理してスタイル付きASSに変換'),
+    'apply': ('apply_subtitles', '字幕を動画に合成'),
+    'split': ('split_video', '長い動画をキーフレームで分割'),
+    'combine': ('combine_split', '分割パートの字幕を1つに統合'),
+    'convert': ('subtitle_encoding', '字幕のエンコーディングを判定してUTF-8に変換'),
+    'bench': (None, 'ベンチマークを実行（benchmarks/bench_<名前>.py）'),
+}
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks')
+
+def print_usage():
+    """サブコマンドの一覧を表示"""
+    print("使用方法: subtitled.py <サブコマンド> [引数...]")
+    print("")
+    print("サブコマンド:")
+    for name, (_, description) in COMMANDS.items():
+        print(f"  {name:<10} {description}")
+    print("")
+    print("各サブコマンドの引数: subtitled.py <サブコマンド> --help")
+
+def list_benchmarks():
+    """benchmarks/ にあるベンチマーク名（bench_<名前>.py の <名前>）"""
+    names = sorted(os.listdir(BENCHMARK_DIR))
+    return [name[len('bench_'):-len('.py')] for name in names if name.startswith('bench_') and name.endswith('.py')]
+
+def run_benchmark(args):
+    """benchmarks/bench_<名前>.py を実行"""
+    import runpy
+
+    if not args or args[0] in ('-h', '--help'):
+        print("使用方法: subtitled.py bench <名前> [引数...]")
+        print(f"ベンチマーク: {', '.join(list_benchmarks())}")
+        return 0 if args else 1
+    name = args[0]
+    path = os.path.join(BENCHMARK_DIR, f"bench_{name}.py")
+    if not os.path.exists(path):
+        print(f"❌ 不明なベンチマーク: {name} (選択肢: {', '.join(list_benchmarks())})")
+        return 1
+
+    # ベンチマークは benchmarks/ の fixtures を import するので、直接実行したときと同じ sys.path にする
+    sys.path.insert(0, BENCHMARK_DIR)
+    sys.argv = [path] + args[1:]
+    runpy.run_path(path, run_name='__main__')
+    return 0
+
+def run_command(name, args):
+    """サブコマンドのスクリプトを __main__ として実行（sys.argv はスクリプトを直接実行したときと同じ形にする）"""
+    import runpy
+
+    module, _ = COMMANDS[name]
+    sys.argv = [f"subtitled.py {name}"] + args
+    runpy.run_module(module, run_name='__main__')
+    return 0
+
+def main(argv=None):
+    """メイン処理"""
+    args = sys.argv[1:] if argv is None else argv
+    if not args or args[0] in ('-h', '--help'):
+        print_usage()
+        return 0 if args else 1
+
+    name, rest = args[0], args[1:]
+    if name not in COMMANDS:
+        print(f"❌ 不明なサブコマンド: {name}")
+        print_usage()
+        return 1
+    if name == 'bench':
+        return run_benchmark(rest)
+    return run_command(name, rest)
+
+if __name__ == "__main__":
+    sys.exit(main())
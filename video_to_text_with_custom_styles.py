@@ -2,15 +2,20 @@ import os
 import sys
 import argparse
 import subprocess
-import whisper
-import jaconv
-import mojimoji
-import neologdn
 import re
 
-def parse_arguments():
-    """引数解析"""
-    parser = argparse.ArgumentParser(description='動画からカスタムスタイル字幕を生成（日本語最適化版）')
+from run_report import run_report, stage, probe_media_seconds
+from profiling import add_profile_arguments
+from subtitle_logging import get_logger, log_counts
+from streaming_audio import STREAMING_MODE, streaming_enabled, transcribe_streaming
+from subtitle_index import safe_base_name
+from style_presets import get_preset, preset_names
+
+log = get_logger('video_to_text')
+
+def build_parser(add_help=True):
+    """引数パーサーを作成（full_pipeline.py でも共通で使う）"""
+    parser = argparse.ArgumentParser(description='動画からカスタムスタイル字幕を生成（日本語最適化版）', add_help=add_help)
     
     parser.add_argument('--input-dir', default='/input_videos', help='入力動画ディレクトリ')
     parser.add_argument('--output-dir', default='/output', help='出力ディレクトリ')
@@ -24,47 +29,30 @@ def parse_arguments():
     parser.add_argument('--bold', action='store_true')
     parser.add_argument('--italic', action='store_true')
     parser.add_argument('--background', action='store_true')
+    parser.add_argument('--preset', choices=preset_names(), help='style_config.py のスタイルプリセット（ASSのスタイル）')
     parser.add_argument('--format', choices=['ass', 'srt', 'both'], default='both')
     parser.add_argument('--preview', action='store_true')
     parser.add_argument('--model', default='base', choices=['tiny', 'base', 'small', 'medium', 'large', 'large-v2', 'large-v3'], 
                        help='Whisperモデルサイズ（日本語にはlarge-v3推奨）')
     parser.add_argument('--normalize', action='store_true', default=True,
                        help='日本語テキスト正規化を有効にする')
+    add_profile_arguments(parser)
     
-    return parser.parse_args()
+    return parser
 
-def is_safe_character(char):
-    """安全な文字かどうか判定（日本語対応）"""
-    # ASCII英数字、ハイフン、アンダースコア
-    if char.isalnum() or char in ('-', '_'):
-        return True
-    
-    # 日本語文字範囲
-    char_code = ord(char)
-    
-    # ひらがな (U+3040-U+309F)
-    if 0x3040 <= char_code <= 0x309F:
-        return True
-    
-    # カタカナ (U+30A0-U+30FF)
-    if 0x30A0 <= char_code <= 0x30FF:
-        return True
-    
-    # 漢字 (U+4E00-U+9FAF)
-    if 0x4E00 <= char_code <= 0x9FAF:
-        return True
-    
-    # 全角英数字 (U+FF00-U+FFEF)
-    if 0xFF00 <= char_code <= 0xFFEF:
-        return True
-    
-    return False
+def parse_arguments(argv=None):
+    """引数解析（argv省略時はsys.argvを使用）"""
+    return build_parser().parse_args(argv)
 
 def normalize_japanese_text(text, enable_normalize=True):
     """日本語テキストの正規化処理"""
     if not enable_normalize:
         return text
     
+    # 正規化ライブラリは使うときだけ読み込む（--preview などで起動を遅くしない）
+    import mojimoji
+    import neologdn
+    
     try:
         # 1. 基本的な正規化
         text = neologdn.normalize(text)
@@ -80,9 +68,181 @@ def normalize_japanese_text(text, enable_normalize=True):
         
         return text
     except Exception as e:
-        print(f"  ⚠️ テキスト正規化エラー: {e}")
+        log.warning(f"  ⚠️ テキスト正規化エラー: {e}")
         return text
 
+def load_model(model_name):
+    """Whisperモデルを読み込み（失敗時はbaseにフォールバック）"""
+    print(f"\n🤖 Whisperモデル読み込み中... ({model_name})")
+    print("📝 日本語認識に最適化されたモデルを使用")
+    
+    # whisper（torch）の読み込みは重いので、モデルを使うときだけ
+    import whisper
+    
+    try:
+        model = whisper.load_model(model_name)
+        print(f"✅ モデル読み込み完了: {model_name}")
+    except Exception as e:
+        print(f"❌ モデル読み込みエラー: {e}")
+        print("📄 baseモデルにフォールバック")
+        model = whisper.load_model("base")
+    return model
+
+def probe_audio_duration(video_path):
+    """入力の長さ（秒、取得できなければ None）"""
+    from ffmpeg_runner import probe_duration
+    try:
+        return probe_duration(video_path)
+    except (RuntimeError, ValueError, OSError):
+        return None
+
+def transcribe_video(model, video_path, normalize=True):
+    """動画を音声認識し、キューのリストを返す
+
+    キューは {'start': 秒, 'end': 秒, 'text': 文字列} の辞書（正規化済み）。
+    """
+    # 長い入力は音声を一定の長さずつ読み込む（メモリを入力の長さに比例させない）
+    duration = probe_audio_duration(video_path) if STREAMING_MODE == 'auto' else None
+    streaming = streaming_enabled(duration)
+    
+    # 音声認識（日本語最適化設定）
+    options = dict(
+        language="ja",
+        task="transcribe",
+        verbose=False,
+        word_timestamps=True,
+        # 日本語に最適化された設定
+        temperature=0.0,
+        compression_ratio_threshold=2.4,
+        logprob_threshold=-1.0,
+        no_speech_threshold=0.6
+    )
+    if streaming:
+        print("  🎤 音声認識実行中（日本語最適化・ストリーミング）...")
+        result = transcribe_streaming(model, video_path, duration=duration, **options)
+    else:
+        print("  🎤 音声認識実行中（日本語最適化）...")
+        result = model.transcribe(video_path, **options)
+    
+    print(f"  📊 認識された字幕数: {len(result['segments'])}")
+    
+    # テキストの正規化処理
+    if normalize:
+        print("  🔧 日本語テキスト正規化中...")
+        changed = 0
+        for segment in result["segments"]:
+            original_text = segment["text"]
+            normalized_text = normalize_japanese_text(original_text, normalize)
+            segment["text"] = normalized_text
+            
+            if original_text != normalized_text:
+                changed += 1
+                log.debug("    📝 正規化: '%s' -> '%s'", original_text, normalized_text)
+        log_counts(log, f"  📝 正規化で変更: {changed}/{len(result['segments'])}件",
+                   {'normalized': changed, 'segments': len(result['segments'])})
+    
+    return [{'start': segment["start"], 'end': segment["end"], 'text': segment["text"]}
+            for segment in result["segments"]]
+
+def build_srt_content(cues):
+    """キューからSRTの内容を作成"""
+    lines = []
+    for i, cue in enumerate(cues):
+        lines.append(f"{i + 1}\n")
+        lines.append(f"{seconds_to_srt_time(cue['start'])} --> {seconds_to_srt_time(cue['end'])}\n")
+        lines.append(f"{cue['text'].strip()}\n\n")
+    return "".join(lines)
+
+def build_ass_content(cues, args, title):
+    """キューからスタイル付きASSの内容を作成"""
+    if getattr(args, 'preset', None):
+        style_line = get_preset(args.preset).style_line()
+    else:
+        style_line = (f"Style: Default,{args.font},{args.size},&H00FFFFFF,&H000000FF,&H00000000,&H80000000,"
+                      f"{1 if args.bold else 0},{1 if args.italic else 0},0,0,100,100,0,0,1,{args.outline_width},2,2,"
+                      f"30,30,{args.margin},1")
+    
+    # 日本語に最適化されたASSヘッダー
+    ass_content = f"""[Script Info]
+Title: {title}
+ScriptType: v4.00+
+PlayResX: 1920
+PlayResY: 1080
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+{style_line}
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+    
+    for cue in cues:
+        start_time = seconds_to_ass_time(cue['start'])
+        end_time = seconds_to_ass_time(cue['end'])
+        text = cue['text'].strip()
+        
+        dialogue_line = f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{text}"
+        ass_content += dialogue_line + "\n"
+    
+    return ass_content
+
+def write_outputs(cues, base_name, args, output_dir=None):
+    """キューからSRT・ASS・テキストファイルを書き出す
+
+    戻り値: {'srt': パス, 'ass': パス, 'txt': パス}（作成したものだけ）
+    """
+    output_dir = output_dir or args.output_dir
+    paths = {}
+    
+    # SRTファイル作成を強制実行
+    print(f"  📄 SRTファイル作成中...")
+    srt_path = os.path.join(output_dir, f"{base_name}_editable.srt")
+    with open(srt_path, 'w', encoding='utf-8') as f:
+        f.write(build_srt_content(cues))
+    
+    srt_size = os.path.getsize(srt_path)
+    print(f"  ✅ SRTファイル作成: {base_name}_editable.srt ({srt_size} bytes)")
+    paths['srt'] = srt_path
+    
+    # ASSファイル作成
+    if args.format in ['ass', 'both']:
+        print(f"  ✨ ASSファイル作成中...")
+        ass_path = os.path.join(output_dir, f"{base_name}_styled.ass")
+        with open(ass_path, 'w', encoding='utf-8') as f:
+            f.write(build_ass_content(cues, args, base_name))
+        
+        ass_size = os.path.getsize(ass_path)
+        print(f"  ✅ ASSファイル作成: {base_name}_styled.ass ({ass_size} bytes)")
+        paths['ass'] = ass_path
+    
+    # テキストファイル作成
+    txt_path = os.path.join(output_dir, f"{base_name}.txt")
+    with open(txt_path, 'w', encoding='utf-8') as f:
+        # 正規化されたテキストを使用
+        full_text = " ".join([cue['text'] for cue in cues])
+        f.write(full_text)
+    
+    txt_size = os.path.getsize(txt_path)
+    print(f"  ✅ テキストファイル作成: {base_name}.txt ({txt_size} bytes)")
+    paths['txt'] = txt_path
+    
+    return paths
+
+def find_video_files(input_dir):
+    """入力ディレクトリ内の動画ファイル名を列挙"""
+    video_extensions = ['.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.m4v']
+    video_files = []
+    
+    print(f"\n📁 動画ファイル検索中: {input_dir}")
+    for item in os.listdir(input_dir):
+        if any(item.lower().endswith(ext) for ext in video_extensions):
+            video_files.append(item)
+            print(f"  📹 {item}")
+    
+    return video_files
+
 def main():
     """メイン処理"""
     
@@ -118,26 +278,11 @@ def main():
         return
     
     # Whisperモデル読み込み
-    print(f"\n🤖 Whisperモデル読み込み中... ({args.model})")
-    print("📝 日本語認識に最適化されたモデルを使用")
-    
-    try:
-        model = whisper.load_model(args.model)
-        print(f"✅ モデル読み込み完了: {args.model}")
-    except Exception as e:
-        print(f"❌ モデル読み込みエラー: {e}")
-        print("📄 baseモデルにフォールバック")
-        model = whisper.load_model("base")
+    with stage('model_load', model=args.model):
+        model = load_model(args.model)
     
     # 動画ファイル検索
-    video_extensions = ['.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.m4v']
-    video_files = []
-    
-    print(f"\n📁 動画ファイル検索中: {args.input_dir}")
-    for item in os.listdir(args.input_dir):
-        if any(item.lower().endswith(ext) for ext in video_extensions):
-            video_files.append(item)
-            print(f"  📹 {item}")
+    video_files = find_video_files(args.input_dir)
     
     if not video_files:
         print("❌ 動画ファイルが見つかりません")
@@ -152,107 +297,18 @@ def main():
     total_processed = 0
     for filename in video_files:
         video_path = os.path.join(args.input_dir, filename)
-        base_name = os.path.splitext(filename)[0]
-        
-        # ファイル名の安全化（修正版）
-        safe_base_name = "".join(c for c in base_name if is_safe_character(c))[:50]
-        if not safe_base_name:  # 全て除外された場合のフォールバック
-            safe_base_name = f"video_{hash(base_name) % 10000:04d}"
+        base_name = safe_base_name(os.path.splitext(filename)[0])
         
         print(f"\n🎬 処理中: {filename}")
-        print(f"  📝 安全なベース名: {safe_base_name}")
+        print(f"  📝 安全なベース名: {base_name}")
         
         try:
-            # 音声認識（日本語最適化設定）
-            print("  🎤 音声認識実行中（日本語最適化）...")
-            result = model.transcribe(
-                video_path,
-                language="ja",
-                task="transcribe",
-                verbose=False,
-                word_timestamps=True,
-                # 日本語に最適化された設定
-                temperature=0.0,
-                compression_ratio_threshold=2.4,
-                logprob_threshold=-1.0,
-                no_speech_threshold=0.6
-            )
-            
-            print(f"  📊 認識された字幕数: {len(result['segments'])}")
-            
-            # テキストの正規化処理
-            if args.normalize:
-                print("  🔧 日本語テキスト正規化中...")
-                for segment in result["segments"]:
-                    original_text = segment["text"]
-                    normalized_text = normalize_japanese_text(original_text, args.normalize)
-                    segment["text"] = normalized_text
-                    
-                    if original_text != normalized_text:
-                        print(f"    📝 正規化: '{original_text}' -> '{normalized_text}'")
-            
-            # SRTファイル作成を強制実行
-            print(f"  📄 SRTファイル作成中...")
-            srt_path = os.path.join(args.output_dir, f"{safe_base_name}_editable.srt")
-            
-            with open(srt_path, 'w', encoding='utf-8') as f:
-                for i, segment in enumerate(result["segments"]):
-                    start_time = seconds_to_srt_time(segment["start"])
-                    end_time = seconds_to_srt_time(segment["end"])
-                    text = segment["text"].strip()
-                    
-                    f.write(f"{i + 1}\n")
-                    f.write(f"{start_time} --> {end_time}\n")
-                    f.write(f"{text}\n\n")
-            
-            srt_size = os.path.getsize(srt_path)
-            print(f"  ✅ SRTファイル作成: {safe_base_name}_editable.srt ({srt_size} bytes)")
-            
-            # ASSファイル作成
-            if args.format in ['ass', 'both']:
-                print(f"  ✨ ASSファイル作成中...")
-                ass_path = os.path.join(args.output_dir, f"{safe_base_name}_styled.ass")
-                
-                # 日本語に最適化されたASSヘッダー
-                ass_content = f"""[Script Info]
-Title: {safe_base_name}
-ScriptType: v4.00+
-PlayResX: 1920
-PlayResY: 1080
-ScaledBorderAndShadow: yes
-
-[V4+ Styles]
-Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
-Style: Default,{args.font},{args.size},&H00FFFFFF,&H000000FF,&H00000000,&H80000000,{1 if args.bold else 0},{1 if args.italic else 0},0,0,100,100,0,0,1,{args.outline_width},2,2,30,30,{args.margin},1
-
-[Events]
-Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
-"""
-                
-                for i, segment in enumerate(result["segments"]):
-                    start_time = seconds_to_ass_time(segment["start"])
-                    end_time = seconds_to_ass_time(segment["end"])
-                    text = segment["text"].strip()
-                    
-                    dialogue_line = f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{text}"
-                    ass_content += dialogue_line + "\n"
-                
-                with open(ass_path, 'w', encoding='utf-8') as f:
-                    f.write(ass_content)
-                
-                ass_size = os.path.getsize(ass_path)
-                print(f"  ✅ ASSファイル作成: {safe_base_name}_styled.ass ({ass_size} bytes)")
-            
-            # テキストファイル作成
-            txt_path = os.path.join(args.output_dir, f"{safe_base_name}.txt")
-            with open(txt_path, 'w', encoding='utf-8') as f:
-                # 正規化されたテキストを使用
-                full_text = " ".join([segment["text"] for segment in result["segments"]])
-                f.write(full_text)
-            
-            txt_size = os.path.getsize(txt_path)
-            print(f"  ✅ テキストファイル作成: {safe_base_name}.txt ({txt_size} bytes)")
-            
+            with stage('transcribe', file=filename) as entry:
+                entry['audio_seconds'] = probe_media_seconds(video_path)
+                cues = transcribe_video(model, video_path, args.normalize)
+                entry['cues'] = len(cues)
+            with stage('write', file=filename):
+                write_outputs(cues, base_name, args)
             total_processed += 1
             
         except Exception as e:
@@ -286,4 +342,5 @@ def seconds_to_ass_time(seconds):
     return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
 
 if __name__ == "__main__":
-    main()
+    with run_report('video_to_text'):
+        main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import errno
+import ctypes
+import ctypes.util
+import select
+import signal
+import struct
+import argparse
+import threading
+
+from metrics import add_metrics_arguments, start_metrics_server
+from run_report import run_report
+from build import BuildContext, BuildState, STATE_FILENAME, BUILT, FAILED, add_build_arguments, build_graph, \
+    affected_nodes, run_graph
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.m4v')
+
+# inotify のイベント（linux/inotify.h）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+EVENT_HEADER = struct.Struct('iIII')
+
+class InotifyWatcher:
+    """inotify（ctypes経由）でディレクトリの変更を検知"""
+
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失敗')
+        self._dirs = {}
+        for directory in directories:
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                os.close(self._fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch 失敗: {directory}")
+            self._dirs[wd] = directory
+        self.name = 'inotify'
+
+    def poll(self, timeout):
+        """timeout秒まで待ち、変更されたファイルのパスを返す"""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+
+        paths = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # キューがあふれたら全ファイルを対象にする
+                paths.extend(list_files(self._dirs.values()))
+            elif name and wd in self._dirs:
+                paths.append(os.path.join(self._dirs[wd], os.fsdecode(name)))
+        return paths
+
+class PollingWatcher:
+    """inotify が使えない環境（Docker Desktop のボリュームなど）向けの定期スキャン"""
+
+    def __init__(self, directories, interval=2.0):
+        self._dirs = list(directories)
+        self._interval = interval
+        self._snapshot = self._scan()
+        self._last_scan = time.time()
+        self.name = f"polling ({interval:.0f}秒間隔)"
+
+    def _scan(self):
+        snapshot = {}
+        for path in list_files(self._dirs):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_size, stat.st_mtime)
+        return snapshot
+
+    def poll(self, timeout):
+        wait_time = self._last_scan + self._interval - time.time()
+        if wait_time > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(0.0, wait_time))
+        self._last_scan = time.time()
+        current = self._scan()
+        changed = [path for path, signature in current.items() if self._snapshot.get(path) != signature]
+        self._snapshot = current
+        return changed
+
+def list_files(directories):
+    files = []
+    for directory in directories:
+        for entry in os.scandir(directory):
+            if entry.is_file():
+                files.append(entry.path)
+    return files
+
+def create_watcher(directories, force_polling=False, poll_interval=2.0):
+    """inotify を試し、使えなければポーリングにフォールバック"""
+    if not force_polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directories)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️ inotify が使えないためポーリングで監視します: {e}")
+    return PollingWatcher(directories, poll_interval)
+
+class ChangeTracker:
+    """変更イベントをまとめ、書き込みが終わったファイルだけを取り出す
+
+    最後のイベントから debounce 秒経ち、かつサイズ・更新時刻が settle 秒変わって
+    いないファイルを「書き込み完了」とみなす。
+    """
+
+    def __init__(self, debounce, settle):
+        self.debounce = debounce
+        self.settle = settle
+        self._pending = {}
+
+    def add(self, path, now):
+        signature = file_signature(path)
+        entry = self._pending.get(path)
+        if entry is None or entry['signature'] != signature:
+            self._pending[path] = {'event': now, 'signature': signature, 'stable_since': now}
+        else:
+            entry['event'] = now
+
+    def ready(self, now):
+        """書き込みが終わったファイルのリストを返す（まだのものは保留のまま）"""
+        if not self._pending:
+            return []
+        # バースト中（最後のイベントから debounce 秒経っていない）はまとめて待つ
+        if now - max(entry['event'] for entry in self._pending.values()) < self.debounce:
+            return []
+
+        ready = []
+        for path, entry in list(self._pending.items()):
+            signature = file_signature(path)
+            if signature is None:
+                del self._pending[path]
+            elif signature != entry['signature']:
+                entry['signature'] = signature
+                entry['stable_since'] = now
+            elif now - entry['stable_since'] >= self.settle:
+                ready.append(path)
+                del self._pending[path]
+        return ready
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime)
+
+def is_relevant(path, context):
+    """監視対象のファイルか（videos/ の動画と output/ の編集用SRT）"""
+    directory = os.path.abspath(os.path.dirname(path))
+    name = os.path.basename(path)
+    if name.startswith('.'):
+        return False
+    if directory == os.path.abspath(context.videos_dir):
+        return name.lower().endswith(VIDEO_EXTENSIONS)
+    if directory == os.path.abspath(context.output_dir):
+        return name.endswith('_editable.srt')
+    return False
+
+def process_changes(context, state, paths, jobs):
+    """変更されたファイルに関係するノードだけを実行（実行レポートはまとめて処理するごとに1つ）"""
+    started = time.time()
+    print(f"\n📥 変更を検知: {len(paths)}ファイル")
+    for path in paths:
+        print(f"  - {path}")
+
+    nodes = affected_nodes(build_graph(context), paths)
+    if not nodes:
+        print("  ⏭️ 対象の処理なし")
+        return
+
+    with run_report('watch_folder'):
+        results = run_graph(nodes, state, jobs)
+    built = sum(1 for status in results.values() if status == BUILT)
+    failed = sum(1 for status in results.values() if status == FAILED)
+    print(f"✅ 処理完了 ({time.time() - started:.1f}秒): 実行 {built} / 失敗 {failed}")
+
+def parse_arguments():
+    """引数解析（残りの引数は process / apply 共通のスタイル引数として扱う）"""
+    parser = argparse.ArgumentParser(
+        description='videos/ と output/ を監視し、変更があった段階だけを自動で実行',
+        epilog='その他の引数（--size, --color, --bold ...）は process / apply と同じスタイル引数として渡されます'
+    )
+    add_build_arguments(parser)
+    parser.add_argument('--debounce', type=float, default=2.0, help='最後の変更からまとめて処理するまでの秒数')
+    parser.add_argument('--settle', type=float, default=3.0, help='サイズが変わらなくなってから書き込み完了とみなす秒数')
+    parser.add_argument('--poll', action='store_true', help='inotify を使わずポーリングで監視')
+    parser.add_argument('--poll-interval', type=float, default=2.0, help='ポーリング間隔（秒）')
+    parser.add_argument('--no-preload', action='store_true', help='起動時にWhisperモデルを読み込まない')
+    parser.add_argument('--initial-build', action='store_true', help='起動時に既存ファイルもビルド')
+    add_metrics_arguments(parser)
+    return parser.parse_known_args()
+
+def main():
+    """メイン処理"""
+    args, style_argv = parse_arguments()
+    context = BuildContext(args, style_argv)
+    state = BuildState(os.path.join(args.root, STATE_FILENAME))
+
+    for directory in (context.videos_dir, context.output_dir, context.marker_dir, context.merged_dir):
+        os.makedirs(directory, exist_ok=True)
+
+    print("👀 フォルダ監視")
+    print(f"📁 動画: {context.videos_dir}")
+    print(f"📝 字幕: {context.output_dir}")
+    start_metrics_server(args.metrics_port, args.metrics_host)
+
+    # モデルを常駐させて、最初の動画でも読み込み待ちをなくす
+    if not args.no_preload:
+        with run_report('watch_folder'):
+            context.model()
+
+    watcher = create_watcher([context.videos_dir, context.output_dir], args.poll, args.poll_interval)
+    print(f"🔍 監視方式: {watcher.name}")
+
+    tracker = ChangeTracker(args.debounce, args.settle)
+    worker = None
+    if args.initial_build:
+        for path in list_files([context.videos_dir, context.output_dir]):
+            if is_relevant(path, context):
+                tracker.add(path, 0.0)
+
+    # docker stop などの SIGTERM も Ctrl+C と同じく実行中の処理を待ってから終了する
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        while True:
+            for path in watcher.poll(timeout=0.5):
+                if is_relevant(path, context):
+                    tracker.add(path, time.time())
+
+            # 処理中に来た変更は保留しておき、終わってからまとめて処理
+            if worker and worker.is_alive():
+                continue
+            ready = tracker.ready(time.time())
+            if ready:
+                worker = threading.Thread(target=process_changes, args=(context, state, ready, args.jobs), daemon=True)
+                worker.start()
+    except KeyboardInterrupt:
+        print("\n👋 監視を終了します")
+        if worker and worker.is_alive():
+            print("⏳ 実行中の処理の完了を待っています...")
+            worker.join()
+
+if __name__ == "__main__":
+    # 常駐するので全体を1つのレポートにはせず、処理ごとにレポートを保存する
+    main()
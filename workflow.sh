@@ -21,12 +21,17 @@ show_help() {
    echo "  --margin NUM       マージン (デフォルト: 40)"
    echo "  --background COLOR 背景色 (black, white, gray, none)"
    echo "  --background-alpha NUM 背景透明度 (0.0-1.0, デフォルト: 0.8)"
+   echo "  --encoding-profile NAME エンコード設定 (preview, standard, archive)"
+   echo "  --target-time SEC  目標エンコード時間（試しエンコードでpresetを自動選択）"
+   echo "  --target-size MB   目標ファイルサイズ（試しエンコードでCRFを自動選択）"
    echo ""
    echo "例:"
    echo "  ./workflow.sh generate"
    echo "  ./workflow.sh apply --size 32 --color yellow --bold"
    echo "  ./workflow.sh apply --size 28 --color white --background black"
    echo "  ./workflow.sh apply --color white --background black --background-alpha 0.9"
+   echo "  ./workflow.sh apply --encoding-profile preview"
+   echo "  ./workflow.sh apply --target-time 600 --target-size 200"
 }
 
 mkdir -p videos output merged_videos
@@ -82,6 +87,7 @@ case "$1" in
        MARGIN="40"
        BACKGROUND="none"
        BACKGROUND_ALPHA="0.8"
+       ENCODING_ARGS=()
        
        # 引数を処理
        while [[ $# -gt 0 ]]; do
@@ -122,6 +128,10 @@ case "$1" in
                    BACKGROUND_ALPHA="$2"
                    shift 2
                    ;;
+               --encoding-profile|--target-time|--target-size)
+                   ENCODING_ARGS+=("$1" "$2")
+                   shift 2
+                   ;;
                *)
                    echo "❌ 不明なオプション: $1"
                    show_help
@@ -164,7 +174,8 @@ case "$1" in
            --position "$POSITION" \
            --margin "$MARGIN" \
            --background "$BACKGROUND" \
-           --background-alpha "$BACKGROUND_ALPHA"
+           --background-alpha "$BACKGROUND_ALPHA" \
+           "${ENCODING_ARGS[@]}"
        
        echo "✅ Step 2 完了"
        echo "🎉 merged_videos/ を確認してください"
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import secrets
+import tempfile
+from contextlib import contextmanager
+
+# 作業ディレクトリの場所（環境変数で上書き可能）
+# SUBTITLE_WORK_DIR: 作業ディレクトリを作る親ディレクトリ（省略時はシステムの一時ディレクトリ）
+# SUBTITLE_WORK_TMPFS=1: /dev/shm（tmpfs）に作る（字幕などの小さな一時ファイル向け）
+WORK_ROOT = os.environ.get('SUBTITLE_WORK_DIR')
+TMPFS_ROOT = '/dev/shm'
+
+def tmpfs_enabled():
+    return os.environ.get('SUBTITLE_WORK_TMPFS', '').lower() in ('1', 'true', 'yes')
+
+def scratch_root():
+    """作業ディレクトリを作る場所（None はシステムの一時ディレクトリ）"""
+    if tmpfs_enabled() and os.path.isdir(TMPFS_ROOT) and os.access(TMPFS_ROOT, os.W_OK):
+        return TMPFS_ROOT
+    if WORK_ROOT:
+        os.makedirs(WORK_ROOT, exist_ok=True)
+    return WORK_ROOT
+
+def make_work_dir(prefix):
+    """ジョブごとの作業ディレクトリを作成（同時実行しても衝突しない）
+
+    削除は呼び出し側で shutil.rmtree(work_dir, ignore_errors=True) する。
+    """
+    return tempfile.mkdtemp(prefix=prefix, dir=scratch_root())
+
+def work_file(work_dir, prefix, suffix):
+    """作業ディレクトリ内に重複しないASCII名の一時ファイルを作ってパスを返す
+
+    FFmpegのフィルタに渡すパスで日本語や記号のエスケープを避けるため。
+    """
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=work_dir)
+    os.close(fd)
+    return path
+
+def partial_path(output_path):
+    """出力と同じディレクトリの一時ファイル名（拡張子を残してFFmpegが形式を判定できるように）"""
+    directory, filename = os.path.split(output_path)
+    name, ext = os.path.splitext(filename)
+    return os.path.join(directory, f".{name}.{os.getpid()}_{secrets.token_hex(4)}.partial{ext}")
+
+class AtomicOutput:
+    """一時ファイルに書き込み、commit() で出力先へ os.replace する"""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        # FFmpegを cwd 付きで実行しても場所が変わらないよう絶対パスにする
+        self.path = partial_path(os.path.abspath(output_path))
+        self.committed = False
+
+    def commit(self):
+        os.replace(self.path, self.output_path)
+        self.committed = True
+
+    def discard(self):
+        if not self.committed and os.path.lexists(self.path):
+            os.remove(self.path)
+
+@contextmanager
+def atomic_output(output_path):
+    """書き込み途中のファイルを出力先に見せないためのコンテキストマネージャ
+
+        with atomic_output(output_path) as output:
+            run_ffmpeg([..., output.path])
+            if 成功:
+                output.commit()
+
+    commit() しなかった場合（失敗・例外）は一時ファイルを削除する。
+    置き換えなので、出力先がキャッシュとハードリンクされていてもキャッシュ側は変わらない。
+    """
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    output = AtomicOutput(output_path)
+    try:
+        yield output
+    finally:
+        output.discard()
+
+def input_path(path):
+    """FFmpegの -i にそのまま渡せる入力パス
+
+    「:」を含む名前がプロトコル指定と解釈されないよう file: を付ける。
+    日本語や空白・記号を含む動画でもコピーせずに元のファイルを読ませるため。
+    """
+    return 'file:' + os.path.abspath(path)
+
+def escape_filter_path(path):
+    """フィルタ引数（ass=... / subtitles=...）に埋め込めるようパスをエスケープ
+
+    FFmpegはフィルタ引数を2段階で解釈する（オプション値 → フィルタグラフ）ので、
+    それぞれの特殊文字をバックスラッシュでエスケープする。
+    """
+    value = os.path.abspath(path)
+    # 1段目: オプション値（\ ' :）
+    for char in ('\\', "'", ':'):
+        value = value.replace(char, '\\' + char)
+    # 2段目: フィルタグラフ（\ ' [ ] , ;）
+    for char in ('\\', "'", '[', ']', ',', ';'):
+        value = value.replace(char, '\\' + char)
+    return value